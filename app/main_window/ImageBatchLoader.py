@@ -0,0 +1,88 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import *
+from tkinter import ttk
+
+from app.paint_window.ImageCache import ImageCache
+
+
+class ImageBatchLoader:
+    """Decodes several image files on a bounded thread pool with a progress dialog.
+
+    Pillow releases the GIL while decoding, so the workers run in parallel.
+    Images come from the shared ImageCache and must not be modified.
+    on_image(path, image) is called on the Tk thread as each file finishes
+    (in completion order, not selection order); on_finish(loaded, errors,
+    cancelled) once at the end, with errors as a list of (path, message).
+    """
+    MAX_WORKERS = 4
+
+    def __init__(self, root, paths, on_image, on_finish=None, workers=None):
+        self.root = root
+        self.paths = list(paths)
+        self.on_image = on_image
+        self.on_finish = on_finish
+        self.loaded = 0
+        self.errors = []
+        self.cancelled = False
+        self._remaining = len(self.paths)
+        workers = workers or min(self.MAX_WORKERS, os.cpu_count() or 1, max(1, len(self.paths)))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-batch')
+        self.__create_dialog()
+        cache = ImageCache.shared()
+        for path in self.paths:
+            future = self._pool.submit(cache.get, path)
+            future.add_done_callback(lambda f, p=path: self._from_thread(lambda: self._done(p, f)))
+        self._pool.shutdown(wait=False)
+
+    def __create_dialog(self):
+        self.dialog = Toplevel(self.root)
+        self.dialog.title('Opening files')
+        self.dialog.resizable(False, False)
+        self.dialog.protocol('WM_DELETE_WINDOW', self.cancel)
+        self.label = Label(self.dialog, text=f'0 / {len(self.paths)}', anchor='w')
+        self.label.pack(fill=X, padx=10, pady=(10, 4))
+        self.progress = ttk.Progressbar(self.dialog, length=320, maximum=max(1, len(self.paths)))
+        self.progress.pack(padx=10, pady=4)
+        Button(self.dialog, text='Cancel', command=self.cancel).pack(pady=(4, 10))
+
+    def _from_thread(self, fn):
+        try:
+            self.root.after(0, fn)
+        except Exception:
+            pass
+
+    def cancel(self):
+        """Drop the files not started yet; decodes already running finish but are discarded."""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._finish()
+
+    def _done(self, path, future):
+        self._remaining -= 1
+        if self.cancelled:
+            return
+        try:
+            image = future.result()
+            self.on_image(path, image)
+            self.loaded += 1
+        except Exception as e:
+            self.errors.append((path, str(e)))
+        done = len(self.paths) - self._remaining
+        try:
+            self.progress['value'] = done
+            self.label.configure(text=f'{done} / {len(self.paths)}  {os.path.basename(path)}')
+        except Exception:
+            pass
+        if self._remaining == 0:
+            self._finish()
+
+    def _finish(self):
+        try:
+            self.dialog.destroy()
+        except Exception:
+            pass
+        if self.on_finish is not None:
+            self.on_finish(self.loaded, self.errors, self.cancelled)
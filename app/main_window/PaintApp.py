@@ -1,9 +1,13 @@
 from tkinter import *
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 from tkinter import ttk
-import os, json, importlib, importlib.util
+import os, json
 
 from app.paint_window.PaintWindow import PaintWindow
+from app.paint_window.Autosave import Autosave
+from app.paint_window.ProjectFile import ProjectFile
+from app.paint_window.PluginRegistry import PluginRegistry
+from app.main_window.ImageBatchLoader import ImageBatchLoader
 from app.ButtonDescription import ButtonDescription
 
 
@@ -33,11 +37,16 @@ class PaintApp:
         self.root.protocol("WM_DELETE_WINDOW", self.__exit_app)
         
         self.root.bind_all("<Control-n>", lambda e: self.create_new_tab())
+        self.root.bind_all("<Control-o>", self.open_files)
         self.root.bind_all("<Control-q>", lambda e: self.__exit_app())
         self.root.bind_all("<Control-s>", self._dispatch_save)
         self.root.bind_all("<Control-x>", self._dispatch_save_as)
         self.root.bind_all("<Control-w>", self._dispatch_close_active)
         self.root.bind_all("<Control-equal>", self._dispatch_zoom)
+        self.root.bind_all("<Control-z>", self._dispatch_undo)
+        self.root.bind_all("<Control-y>", self._dispatch_redo)
+
+        self.root.after(200, self._offer_recovery)
         
         self.root.mainloop()
     
@@ -50,6 +59,7 @@ class PaintApp:
         self.tab_to_pw[new_tab] = pw
 
         self.notebook.select(new_tab)
+        return pw
 
     def create_new_window_from_image(self, image=None, file_path=None, is_saved=False, is_updated=False, changes=False):
         top = Toplevel(self.root)
@@ -57,6 +67,24 @@ class PaintApp:
         self.windows.append(pw)
         return pw
 
+    def open_files(self, event=None):
+        """Открывает несколько изображений, каждое в новой вкладке"""
+        paths = filedialog.askopenfilenames(filetypes=[('Image files', '*.png *.jpg *.jpeg *.bmp *.gif *.webp *.tif *.tiff'),
+                                                       ('All files', '*.*')])
+        if not paths:
+            return
+
+        def on_image(path, image):
+            self.create_new_tab().open_image_file(path, image)
+
+        def on_finish(loaded, errors, cancelled):
+            if errors:
+                lines = '\n'.join(f'{os.path.basename(p)}: {msg}' for p, msg in errors[:10])
+                more = f'\n... and {len(errors) - 10} more' if len(errors) > 10 else ''
+                messagebox.showerror('Open files', f'Could not open {len(errors)} file(s):\n{lines}{more}')
+
+        ImageBatchLoader(self.root, paths, on_image, on_finish)
+
     def detach_tab(self, paintwindow):
         try:
             tab = paintwindow.window
@@ -120,7 +148,76 @@ class PaintApp:
                 pw.zoom(1.25)
             except Exception:
                 pass
+
+    def _dispatch_undo(self, event=None):
+        pw = self._get_active_paintwindow()
+        if pw:
+            try:
+                pw.undo()
+            except Exception:
+                pass
+
+    def _dispatch_redo(self, event=None):
+        pw = self._get_active_paintwindow()
+        if pw:
+            try:
+                pw.redo()
+            except Exception:
+                pass
     
+    def _offer_recovery(self):
+        """Предлагает восстановить документы, оставшиеся после аварийного завершения"""
+        directory = Autosave.recovery_dir()
+        try:
+            # project files written by an earlier recovery, unless the window reading them is still open
+            for name in os.listdir(directory):
+                if name.endswith(ProjectFile.EXTENSION):
+                    path = os.path.join(directory, name)
+                    claim = Autosave.claim(path)
+                    if claim is None:
+                        continue
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                    Autosave.release(claim, path)
+        except OSError:
+            pass
+        # journals of windows still open in another instance stay locked and are left alone
+        journals = []
+        for path in Autosave.find_journals():
+            claim = Autosave.claim(path)
+            if claim is not None:
+                journals.append((path, claim))
+        if not journals:
+            return
+        restore = messagebox.askyesno('Recover documents',
+                                      f'{len(journals)} unsaved document(s) from a previous session can be recovered.\n\nRestore them?')
+        for path, claim in journals:
+            try:
+                if restore:
+                    try:
+                        doc = Autosave.replay(path)
+                        if doc is not None:
+                            header = doc.pop('header')
+                            pw = self.create_new_tab()
+                            # named after the new window's journal, whose lock keeps the file alive while it is read
+                            base = pw.autosave.path if pw.autosave is not None else path
+                            project_path = Autosave.sibling(base, ProjectFile.EXTENSION)
+                            with open(project_path, 'wb') as fh:
+                                ProjectFile.write(fh, **doc)
+                            pw.open_project(project_path)
+                            pw.file_path = header.get('file_path')
+                            pw.is_updated = True
+                    except Exception:
+                        continue  # keep the journal, maybe the next start can read it
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            finally:
+                Autosave.release(claim, path)
+
     def __exit_app(self, event=None):
         """Закрывает приложение"""
         for window in self.windows:
@@ -152,20 +249,12 @@ class PaintApp:
                 cfg = None
 
             # Получить список всех файлов плагинов
-            files = sorted([f for f in os.listdir(plugins_dir) if f.endswith('.py') and not f.startswith('__')])
+            registry = PluginRegistry.shared()
+            files = registry.files(plugins_dir)
 
-            # Helper для получения PLUGIN_NAME
+            # PLUGIN_NAME читается из исходника, без выполнения плагина
             def get_plugin_display_name(fname):
-                try:
-                    fpath = os.path.join(plugins_dir, fname)
-                    spec = importlib.util.spec_from_file_location(f'temp_{fname[:-3]}', fpath)
-                    if spec and spec.loader:
-                        module = importlib.util.module_from_spec(spec)
-                        spec.loader.exec_module(module)
-                        return getattr(module, 'PLUGIN_NAME', None) or os.path.splitext(fname)[0]
-                except Exception:
-                    pass
-                return os.path.splitext(fname)[0]
+                return registry.display_name(os.path.join(plugins_dir, fname))
 
             # Создать окно селектора
             win = Toplevel(self.root)
@@ -240,6 +329,14 @@ class PaintApp:
                                  padx=20, pady=10)
         new_paint_button.pack(pady=10)
         ButtonDescription(new_paint_button, "Создание нового окна для рисования")
+
+        open_files_button = Button(self.root,
+                                   text="Open Files...",
+                                   command=self.open_files,
+                                   font=("Arial", 12),
+                                   padx=20, pady=10)
+        open_files_button.pack(pady=10)
+        ButtonDescription(open_files_button, "Открыть несколько изображений во вкладках")
         
         about_button = Button(self.root, 
                               text="About", 
@@ -0,0 +1,330 @@
+import atexit
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from PIL import Image
+from .StrokeStore import Stroke
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class Autosave:
+    """Crash-recovery journal for one window, written incrementally in the background.
+
+    Every checkpoint appends only what changed since the previous one: the
+    tiles the buffer reports on its 'autosave' dirty channel, strokes added
+    or removed from the StrokeStore and the window state. Records are
+    `type, length, payload`; a CHECKPOINT record closes each batch, so a
+    journal cut short by a crash is replayed up to its last checkpoint.
+
+    The Tk thread only diffs the stroke list (`checkpoint`). Tile pixels are
+    copied by a job on the raster queue, and compression, writing and
+    compaction happen on the autosave thread. When the journal grows past
+    COMPACT_RATIO times its live data it is rewritten with only the latest
+    record of every tile and the strokes still alive.
+
+    Each journal has a LOCK_EXT file next to it that its process keeps
+    locked, so a starting instance only recovers journals whose owner is
+    gone (the OS drops the lock with the process).
+    """
+    INTERVAL_MS = 5000
+    JOURNAL_EXT = '.pmdj'
+    LOCK_EXT = '.lock'
+    COMPACT_RATIO = 3
+    COMPACT_MIN_BYTES = 4 * 1024 * 1024
+    HEADER, STATE, TILE, STROKE_ADD, STROKE_DEL, CHECKPOINT = range(1, 7)
+    _RECORD = struct.Struct('<BI')
+    _closing = set()  # threads of discarded journals still deleting them
+
+    def __init__(self, directory=None):
+        self.directory = directory or self.recovery_dir()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, uuid.uuid4().hex + self.JOURNAL_EXT)
+        self._lock = self._try_lock(self.sibling(self.path, self.LOCK_EXT))
+        # Tk thread side
+        self._ids = {}  # Stroke -> journal id
+        self._next_id = 1
+        self._buffer = None
+        self._size = None
+        self._state = None
+        # autosave thread side
+        self._fh = None
+        self._tiles = {}  # tile -> (offset, length) of its latest record
+        self._strokes = {}  # journal id -> (offset, length) of its ADD record
+        self._fixed = []  # (offset, length) of the header and latest state records
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='autosave', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def recovery_dir():
+        return os.path.join(os.path.expanduser('~'), '.paint_mdi', 'recovery')
+
+    @staticmethod
+    def sibling(path, ext):
+        """path of the file that belongs with the journal (or sibling) at path, with extension ext."""
+        return os.path.splitext(path)[0] + ext
+
+    @staticmethod
+    def _try_lock(lock_path):
+        """Open and lock lock_path; None if another process (or handle) holds it."""
+        try:
+            fh = open(lock_path, 'a+b')
+        except OSError:
+            return None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+            return fh
+        except OSError:
+            fh.close()
+            return None
+
+    @staticmethod
+    def _release(lock, lock_path):
+        if lock is None:
+            return
+        lock.close()
+        try:
+            os.unlink(lock_path)
+        except OSError:
+            pass
+
+    @classmethod
+    def _wait_closing(cls):
+        for thread in list(cls._closing):
+            thread.join(timeout=5)
+
+    # --- Tk thread ---
+
+    def checkpoint(self, buffer, strokes, state, header, rasterizer):
+        """Queue a checkpoint of the window. state/header: JSON-able dicts."""
+        size = buffer.size
+        full = buffer is not self._buffer or size != self._size
+        current = list(strokes)
+        if full:
+            self._ids = {}
+            added, removed = current, []
+        else:
+            alive = set(current)
+            added = [s for s in current if s not in self._ids]
+            removed = [self._ids.pop(s) for s in list(self._ids) if s not in alive]
+        packed = []
+        for s in added:
+            self._ids[s] = self._next_id
+            packed.append(self._pack_stroke(self._next_id, s))
+            self._next_id += 1
+        state_changed = state != self._state
+        self._buffer, self._size, self._state = buffer, size, state
+        header = dict(header, width=size[0], height=size[1], tile_size=buffer.TILE_SIZE)
+        rasterizer.submit(self._collect, buffer, full, header, state if (full or state_changed) else None,
+                          packed, removed)
+
+    def discard(self):
+        """Stop journaling; the autosave thread deletes the journal (the document was closed on purpose)."""
+        Autosave._closing.add(self._thread)  # waited for at exit, never on the Tk thread
+        self._queue.put(None)
+
+    @staticmethod
+    def _pack_stroke(sid, stroke):
+        meta = json.dumps([stroke.kind, stroke.fill, stroke.outline, stroke.width, stroke.text]).encode('utf-8')
+        coords = array('f', stroke.coords)
+        if sys.byteorder == 'big':
+            coords.byteswap()
+        return struct.pack('<II', sid, len(meta)) + meta + coords.tobytes()
+
+    @staticmethod
+    def _unpack_stroke(payload):
+        meta_len = struct.unpack_from('<I', payload, 4)[0]
+        kind, fill, outline, width, text = json.loads(payload[8:8 + meta_len].decode('utf-8'))
+        coords = array('f', payload[8 + meta_len:])
+        if sys.byteorder == 'big':
+            coords.byteswap()
+        return Stroke(kind, coords, fill=fill, outline=outline, width=width, text=text)
+
+    # --- raster thread ---
+
+    def _collect(self, buffer, full, header, state, strokes, removed):
+        dirty = buffer.take_dirty('autosave')
+        if full:
+            dirty = buffer.all_tiles()
+        if not (full or dirty or state is not None or strokes or removed):
+            return
+        tiles = buffer.copy_tiles(dirty)
+        self._queue.put((full, header, state, tiles, strokes, removed))
+
+    # --- autosave thread ---
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                break
+            try:
+                self._write_batch(*batch)
+            except Exception:
+                pass
+        if self._fh is not None:
+            self._fh.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        self._release(self._lock, self.sibling(self.path, self.LOCK_EXT))
+        Autosave._closing.discard(threading.current_thread())
+
+    def _append(self, rtype, payload):
+        offset = self._fh.tell()
+        self._fh.write(self._RECORD.pack(rtype, len(payload)))
+        self._fh.write(payload)
+        return (offset, self._RECORD.size + len(payload))
+
+    @staticmethod
+    def _tile_payload(key, tile):
+        data = b'' if tile is None else zlib.compress(tile.tobytes(), 1)  # empty: plain paper
+        return struct.pack('<II', key[0], key[1]) + data
+
+    def _write_batch(self, full, header, state, tiles, strokes, removed):
+        if full or self._fh is None:
+            if self._fh is not None:
+                self._fh.close()
+            self._fh = open(self.path, 'w+b')
+            self._tiles, self._strokes, self._fixed = {}, {}, []
+            self._fixed.append(self._append(self.HEADER, json.dumps(header).encode('utf-8')))
+        if state is not None:
+            rec = self._append(self.STATE, json.dumps(state).encode('utf-8'))
+            self._fixed = self._fixed[:1] + [rec]
+        for key, tile in tiles.items():
+            self._tiles[key] = self._append(self.TILE, self._tile_payload(key, tile))
+        for payload in strokes:
+            self._strokes[struct.unpack_from('<I', payload)[0]] = self._append(self.STROKE_ADD, payload)
+        if removed:
+            self._append(self.STROKE_DEL, struct.pack('<%dI' % len(removed), *removed))
+            for sid in removed:
+                self._strokes.pop(sid, None)
+        self._append(self.CHECKPOINT, struct.pack('<d', time.time()))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        live = sum(n for _, n in self._fixed) + sum(n for _, n in self._tiles.values()) + \
+            sum(n for _, n in self._strokes.values())
+        if self._fh.tell() > max(self.COMPACT_MIN_BYTES, self.COMPACT_RATIO * live):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only its live records, then swap it in."""
+        tmp = self.path + '.tmp'
+        src = self._fh
+        tiles, strokes, fixed = {}, {}, []
+        with open(tmp, 'wb') as out:
+            def copy(rec):
+                src.seek(rec[0])
+                data = src.read(rec[1])
+                offset = out.tell()
+                out.write(data)
+                return (offset, len(data))
+            fixed = [copy(rec) for rec in self._fixed]
+            for key, rec in self._tiles.items():
+                tiles[key] = copy(rec)
+            for sid, rec in self._strokes.items():
+                strokes[sid] = copy(rec)
+            out.write(self._RECORD.pack(self.CHECKPOINT, 8) + struct.pack('<d', time.time()))
+            out.flush()
+            os.fsync(out.fileno())
+        src.close()
+        os.replace(tmp, self.path)
+        self._fh = open(self.path, 'r+b')
+        self._fh.seek(0, 2)
+        self._tiles, self._strokes, self._fixed = tiles, strokes, fixed
+
+    # --- recovery ---
+
+    @classmethod
+    def claim(cls, path):
+        """Lock the journal at path for recovery.
+
+        Returns a handle for release(), or None while the window writing
+        it, or another instance recovering it, is still running.
+        """
+        return cls._try_lock(cls.sibling(path, cls.LOCK_EXT))
+
+    @classmethod
+    def release(cls, claim, path):
+        """Drop a claim() on the journal at path."""
+        cls._release(claim, cls.sibling(path, cls.LOCK_EXT))
+
+    @classmethod
+    def find_journals(cls, directory=None):
+        directory = directory or cls.recovery_dir()
+        try:
+            names = [n for n in os.listdir(directory) if n.endswith(cls.JOURNAL_EXT)]
+        except OSError:
+            return []
+        paths = [os.path.join(directory, n) for n in names]
+        return sorted(paths, key=os.path.getmtime)
+
+    @classmethod
+    def replay(cls, path):
+        """Rebuild a journal's document up to its last checkpoint.
+
+        Returns a dict with the ProjectFile.write() arguments plus the
+        journal header ('header'), or None if nothing was checkpointed.
+        """
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        # first pass: find where the last complete batch ends
+        pos, end = 0, 0
+        while pos + cls._RECORD.size <= len(data):
+            rtype, length = cls._RECORD.unpack_from(data, pos)
+            nxt = pos + cls._RECORD.size + length
+            if nxt > len(data):
+                break
+            if rtype == cls.CHECKPOINT:
+                end = nxt
+            pos = nxt
+        header, state, tiles, strokes = None, {}, {}, {}
+        pos = 0
+        while pos < end:
+            rtype, length = cls._RECORD.unpack_from(data, pos)
+            payload = data[pos + cls._RECORD.size:pos + cls._RECORD.size + length]
+            pos += cls._RECORD.size + length
+            if rtype == cls.HEADER:
+                header, tiles, strokes = json.loads(payload.decode('utf-8')), {}, {}
+            elif rtype == cls.STATE:
+                state = json.loads(payload.decode('utf-8'))
+            elif rtype == cls.TILE:
+                tiles[struct.unpack_from('<II', payload)] = payload[8:]
+            elif rtype == cls.STROKE_ADD:
+                strokes[struct.unpack_from('<I', payload)[0]] = payload
+            elif rtype == cls.STROKE_DEL:
+                for sid in struct.unpack('<%dI' % (len(payload) // 4), payload):
+                    strokes.pop(sid, None)
+        if header is None:
+            return None
+
+        w, h, ts = header['width'], header['height'], header['tile_size']
+        images = {}
+        for (tx, ty), raw in tiles.items():
+            if raw:
+                size = (min(w, (tx + 1) * ts) - tx * ts, min(h, (ty + 1) * ts) - ty * ts)
+                images[(tx, ty)] = Image.frombytes('RGB', size, zlib.decompress(raw))
+        stroke_list = [cls._unpack_stroke(strokes[sid]) for sid in sorted(strokes)]
+        return {'header': header, 'size': (w, h), 'tile_size': ts,
+                'paper_fill': state.get('paper_fill', header.get('paper_fill', 'white')),
+                'tiles': images, 'strokes': stroke_list, 'settings': state.get('settings', {})}
+
+
+atexit.register(Autosave._wait_closing)
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+import math
+from PIL import Image, ImageChops, ImageColor
+
+
+class BrushEngine:
+    """Soft / anti-aliased brush that stamps cached dab masks along a stroke.
+
+    Dab masks are built once per (size, hardness, opacity) and kept in a
+    small LRU cache. During a stroke the engine keeps a coverage mask and a
+    copy of the original pixels for each tile the stroke has touched, so
+    overlapping dabs never build up past the brush opacity and every
+    segment only recomposites the region under its own dabs.
+    """
+    CACHE_SIZE = 32
+
+    def __init__(self, spacing=0.25):
+        self.spacing = spacing  # distance between dabs, as a fraction of the brush size
+        self._dabs = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._coverage = {}  # tile -> L mask of the current stroke
+        self._backup = {}  # tile -> RGB pixels before the stroke
+        self._carry = 0.0  # distance left over from the previous segment
+
+    def dab(self, size, hardness, opacity):
+        """L-mode mask of one dab, from the LRU cache."""
+        d = max(1, int(round(size)))
+        key = (d, round(float(hardness), 2), round(float(opacity), 2))
+        mask = self._dabs.get(key)
+        if mask is not None:
+            self._dabs.move_to_end(key)
+            self.cache_hits += 1
+            return mask
+        self.cache_misses += 1
+        mask = self._make_dab(*key)
+        self._dabs[key] = mask
+        if len(self._dabs) > self.CACHE_SIZE:
+            self._dabs.popitem(last=False)
+        return mask
+
+    @staticmethod
+    def _make_dab(d, hardness, opacity):
+        r = d / 2.0
+        # at least one pixel of falloff keeps even a hard brush anti-aliased
+        inner = min(max(0.0, hardness), 1.0 - 1.0 / max(1.0, r))
+        peak = 255.0 * max(0.0, min(1.0, opacity))
+        lut = []
+        for v in range(256):
+            t = v / 181.0  # radial_gradient reaches 181 at the edge of the inscribed circle
+            if t <= inner:
+                a = 1.0
+            elif t >= 1.0:
+                a = 0.0
+            else:
+                a = (1.0 - t) / (1.0 - inner)
+                a = a * a * (3 - 2 * a)  # smoothstep
+            lut.append(int(round(peak * a)))
+        return Image.radial_gradient('L').resize((d, d), Image.BILINEAR).point(lut)
+
+    def begin_stroke(self):
+        self._coverage.clear()
+        self._backup.clear()
+        self._carry = 0.0
+
+    def end_stroke(self):
+        self.begin_stroke()
+
+    def stamp_segment(self, buffer, x0, y0, x1, y1, color, size, hardness=0.5, opacity=1.0):
+        """Stamp dabs from (x0, y0) to (x1, y1) into buffer; returns the touched bbox or None."""
+        mask = self.dab(size, hardness, opacity)
+        d = mask.width
+        step = max(1.0, d * self.spacing)
+        length = math.hypot(x1 - x0, y1 - y0)
+        if length == 0:
+            points = [(x0, y0)]
+        else:
+            points = []
+            t = self._carry
+            while t <= length:
+                points.append((x0 + (x1 - x0) * t / length, y0 + (y1 - y0) * t / length))
+                t += step
+            self._carry = t - length
+        if not points:
+            return None
+
+        half = d // 2
+        ox = int(min(p[0] for p in points)) - half
+        oy = int(min(p[1] for p in points)) - half
+        bbox = (ox, oy, int(max(p[0] for p in points)) - half + d, int(max(p[1] for p in points)) - half + d)
+        dabs = Image.new('L', (bbox[2] - bbox[0], bbox[3] - bbox[1]), 0)
+        for px, py in points:
+            at = (int(px) - half - ox, int(py) - half - oy)
+            box = (at[0], at[1], at[0] + d, at[1] + d)
+            dabs.paste(ImageChops.lighter(dabs.crop(box), mask), at)
+
+        if isinstance(color, str):
+            color = ImageColor.getrgb(color)
+        w, h = buffer.size
+        for key in buffer.tiles_in((bbox[0], bbox[1], bbox[2] - 1, bbox[3] - 1)):
+            tx0, ty0, tx1, ty1 = buffer.tile_bbox(key)
+            gx0, gy0 = max(tx0, bbox[0]), max(ty0, bbox[1])
+            gx1, gy1 = min(tx1, bbox[2], w), min(ty1, bbox[3], h)
+            if gx0 >= gx1 or gy0 >= gy1:
+                continue
+            if key not in self._backup:
+                self._backup[key] = buffer.get_tile(key)
+                self._coverage[key] = Image.new('L', self._backup[key].size, 0)
+            local = (gx0 - tx0, gy0 - ty0, gx1 - tx0, gy1 - ty0)
+            coverage = self._coverage[key]
+            covered = ImageChops.lighter(coverage.crop(local),
+                                         dabs.crop((gx0 - bbox[0], gy0 - bbox[1], gx1 - bbox[0], gy1 - bbox[1])))
+            coverage.paste(covered, local[:2])
+            solid = Image.new('RGB', covered.size, color)
+            buffer.paste_region(Image.composite(solid, self._backup[key].crop(local), covered), (gx0, gy0))
+        return bbox
+
+    def cache_info(self):
+        return {'entries': len(self._dabs), 'hits': self.cache_hits, 'misses': self.cache_misses}
@@ -0,0 +1,183 @@
+from PIL import Image, ImageFilter, ImageMath
+
+try:
+    import numpy as np
+except ImportError:  # optional: the Pillow paths below cover every kernel
+    np = None
+
+# Pillow >= 10.3 renamed eval(); the expressions passed here are fixed strings
+_image_eval = getattr(ImageMath, 'unsafe_eval', None) or ImageMath.eval
+
+
+class Convolution:
+    """Convolution of an image with an arbitrary odd NxN kernel.
+
+    result = sum(kernel * neighbourhood) / scale + offset, per band, like
+    ImageFilter.Kernel (scale defaults to the kernel sum, or 1 if that is
+    0). The kernel is applied as written (correlation), centred on each
+    pixel. Pixels outside the image come from the edge mode:
+
+        'extend'    repeat the edge pixel
+        'reflect'   mirror the image at its edge (the edge pixel included)
+        'wrap'      continue from the opposite edge
+        'constant'  black
+
+    3x3 and 5x5 kernels run in one ImageFilter.Kernel pass. Bigger kernels
+    run in floating point, with NumPy if it is installed and ImageMath
+    otherwise. A separable (rank-1) kernel takes two 1-D passes, 2N taps
+    per pixel instead of N*N.
+    """
+    EDGE_MODES = ('extend', 'reflect', 'wrap', 'constant')
+
+    def __init__(self, kernel, scale=None, offset=0, edge='extend'):
+        rows = [[float(v) for v in row] for row in kernel]
+        n = len(rows)
+        if n % 2 == 0 or any(len(row) != n for row in rows):
+            raise ValueError('kernel must be square with an odd size')
+        if edge not in self.EDGE_MODES:
+            raise ValueError(f'unknown edge mode {edge!r}, expected one of {self.EDGE_MODES}')
+        self.kernel = rows
+        self.size = n
+        self.radius = n // 2
+        total = sum(sum(row) for row in rows)
+        self.scale = float(scale) if scale else (total or 1.0)
+        self.offset = float(offset)
+        self.edge = edge
+        self.factors = self._separate(rows)
+
+    @classmethod
+    def filter(cls, image, kernel, **options):
+        return cls(kernel, **options).apply(image)
+
+    @staticmethod
+    def _separate(rows, eps=1e-6):
+        """(column, row) vectors with kernel == outer(column, row), or None if the kernel is not rank 1."""
+        n = len(rows)
+        pivot = max(((abs(rows[i][j]), i, j) for i in range(n) for j in range(n)))
+        if pivot[0] == 0:
+            return None
+        _, pi, pj = pivot
+        column = [rows[i][pj] for i in range(n)]
+        row = [rows[pi][j] / rows[pi][pj] for j in range(n)]
+        tol = eps * pivot[0]
+        for i in range(n):
+            for j in range(n):
+                if abs(column[i] * row[j] - rows[i][j]) > tol:
+                    return None
+        return column, row
+
+    # --- padding ---
+
+    def pad(self, image):
+        """image grown by the kernel radius on every side, filled per the edge mode."""
+        r = self.radius
+        if r == 0:
+            return image
+        padded = self._pad_x(image, r)
+        return self._pad_x(padded.transpose(Image.Transpose.TRANSPOSE), r).transpose(Image.Transpose.TRANSPOSE)
+
+    def _pad_x(self, img, r):
+        w, h = img.size
+        out = Image.new(img.mode, (w + 2 * r, h))
+        out.paste(img, (r, 0))
+        edge = self.edge
+        if edge in ('reflect', 'wrap') and r > w:
+            edge = 'extend'  # image narrower than the kernel: nothing to mirror
+        if edge == 'extend':
+            left = img.crop((0, 0, 1, h)).resize((r, h), Image.Resampling.NEAREST)
+            right = img.crop((w - 1, 0, w, h)).resize((r, h), Image.Resampling.NEAREST)
+        elif edge == 'reflect':
+            left = img.crop((0, 0, r, h)).transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+            right = img.crop((w - r, 0, w, h)).transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        elif edge == 'wrap':
+            left, right = img.crop((w - r, 0, w, h)), img.crop((0, 0, r, h))
+        else:
+            return out
+        out.paste(left, (0, 0))
+        out.paste(right, (r + w, 0))
+        return out
+
+    # --- application ---
+
+    def apply(self, image):
+        """Convolved copy of image (L or RGB; other modes are converted to RGB)."""
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        padded = self.pad(image)
+        if self.size == 1:
+            return self._finish_float([band.convert('F') for band in padded.split()], image.mode,
+                                      self.kernel[0][0])
+        if self.size in (3, 5):
+            # ImageFilter.Kernel takes its rows bottom-up: flip them so the kernel is applied as written
+            flat = [v for row in reversed(self.kernel) for v in row]
+            result = padded.filter(ImageFilter.Kernel((self.size, self.size), flat, self.scale, self.offset))
+            r = self.radius
+            return result.crop((r, r, r + image.width, r + image.height))
+        if np is not None:
+            return self._apply_numpy(padded, image.size, image.mode)
+        return self._apply_imagemath(padded, image.size, image.mode)
+
+    def _finish_float(self, bands, mode, weight=1.0):
+        # F -> L truncates, so add 0.5 to round; values are clipped to 0..255 by the conversion
+        out = [_image_eval('b * w / s + o', b=b, w=weight, s=self.scale, o=self.offset + 0.5).convert('L')
+               for b in bands]
+        return out[0] if mode == 'L' else Image.merge(mode, out)
+
+    def _taps(self, band, weights, size, vertical):
+        """Sum of band shifted by each weighted tap, cropped to size (1-D pass)."""
+        w, h = size
+        acc = None
+        for i, weight in enumerate(weights):
+            if weight == 0:
+                continue
+            shifted = band.crop((0, i, w, i + h) if vertical else (i, 0, i + w, h))
+            if acc is None:
+                acc = _image_eval('b * k', b=shifted, k=weight)
+            else:
+                acc = _image_eval('a + b * k', a=acc, b=shifted, k=weight)
+        return acc if acc is not None else Image.new('F', size, 0.0)
+
+    def _apply_imagemath(self, padded, size, mode):
+        w, h = size
+        n = self.size
+        bands = []
+        for band in padded.split():
+            band = band.convert('F')
+            if self.factors is not None:
+                column, row = self.factors
+                band = self._taps(band, row, (w, h + n - 1), vertical=False)
+                band = self._taps(band, column, (w, h), vertical=True)
+            else:
+                acc = None
+                for dy in range(n):
+                    line = self._taps(band.crop((0, dy, w + n - 1, dy + h)), self.kernel[dy], (w, h), vertical=False)
+                    acc = line if acc is None else _image_eval('a + b', a=acc, b=line)
+                band = acc
+            bands.append(band)
+        return self._finish_float(bands, mode)
+
+    def _apply_numpy(self, padded, size, mode):
+        w, h = size
+        n = self.size
+        src = np.asarray(padded, dtype=np.float32)
+        if src.ndim == 2:
+            src = src[:, :, None]
+        if self.factors is not None:
+            column, row = self.factors
+            tmp = np.zeros((h + n - 1, w, src.shape[2]), np.float32)
+            for j, weight in enumerate(row):
+                if weight:
+                    tmp += src[:, j:j + w] * np.float32(weight)
+            acc = np.zeros((h, w, src.shape[2]), np.float32)
+            for i, weight in enumerate(column):
+                if weight:
+                    acc += tmp[i:i + h] * np.float32(weight)
+        else:
+            acc = np.zeros((h, w, src.shape[2]), np.float32)
+            for i in range(n):
+                for j in range(n):
+                    weight = self.kernel[i][j]
+                    if weight:
+                        acc += src[i:i + h, j:j + w] * np.float32(weight)
+        out = np.clip(acc / np.float32(self.scale) + np.float32(self.offset) + np.float32(0.5), 0, 255).astype(np.uint8)
+        return Image.fromarray(out[:, :, 0] if mode == 'L' else out)
@@ -0,0 +1,120 @@
+from PIL import Image, ImageChops, ImageColor, ImageFilter
+
+
+class FloodFill:
+    """Scanline flood fill working on whole spans of a row at a time.
+
+    The "similar colour" test is done once for the whole image in C
+    (ImageChops), the connected region is then walked span by span over a
+    flat bytearray, so Python only runs once per span and never per pixel.
+    """
+    def __init__(self, tolerance=0, connectivity=4, antialias=False):
+        self.tolerance = max(0, min(255, int(tolerance)))
+        self.connectivity = 8 if int(connectivity) == 8 else 4
+        self.antialias = bool(antialias)
+
+    def _candidate_mask(self, image, target):
+        """L-mode mask: 255 where the pixel is within tolerance of target."""
+        solid = Image.new(image.mode, image.size, target)
+        diff = ImageChops.difference(image, solid)
+        bands = diff.split()
+        dist = bands[0]
+        for band in bands[1:]:
+            dist = ImageChops.lighter(dist, band)
+        tol = self.tolerance
+        return dist.point(lambda v: 255 if v <= tol else 0)
+
+    def region(self, image, x, y):
+        """Return (mask, bbox) of the region connected to (x, y), or (None, None)."""
+        w, h = image.size
+        x = max(0, min(w - 1, int(x)))
+        y = max(0, min(h - 1, int(y)))
+        avail = bytearray(self._candidate_mask(image, image.getpixel((x, y))).tobytes())
+        region = bytearray(w * h)
+        reach = 1 if self.connectivity == 8 else 0
+
+        min_x, min_y, max_x, max_y = w, h, -1, -1
+        stack = [(x, y)]
+        while stack:
+            sx, sy = stack.pop()
+            row = sy * w
+            if not avail[row + sx]:
+                continue
+            # grow the seed pixel into the widest span of available pixels
+            left = avail.rfind(b'\x00', row, row + sx) + 1
+            if left == 0:
+                left = row
+            right = avail.find(b'\x00', row + sx, row + w)
+            if right < 0:
+                right = row + w
+            n = right - left
+            avail[left:right] = bytes(n)
+            region[left:right] = b'\xff' * n
+            l, r = left - row, right - row
+            if l < min_x:
+                min_x = l
+            if r - 1 > max_x:
+                max_x = r - 1
+            if sy < min_y:
+                min_y = sy
+            if sy > max_y:
+                max_y = sy
+            # queue one seed per available span in the rows above and below
+            lo, hi = max(0, l - reach), min(w, r + reach)
+            for ny in (sy - 1, sy + 1):
+                if ny < 0 or ny >= h:
+                    continue
+                nrow = ny * w
+                i = avail.find(b'\xff', nrow + lo, nrow + hi)
+                while i >= 0:
+                    stack.append((i - nrow, ny))
+                    j = avail.find(b'\x00', i, nrow + w)
+                    if j < 0 or j >= nrow + hi:
+                        break
+                    i = avail.find(b'\xff', j, nrow + hi)
+
+        if max_x < 0:
+            return None, None
+        mask = Image.frombytes('L', (w, h), bytes(region))
+        return mask, (min_x, min_y, max_x + 1, max_y + 1)
+
+    def fill(self, image, x, y, fill_color):
+        """Fill in place and return the touched bbox (or None if nothing changed)."""
+        if self.tolerance == 0 and self._same_color(image, x, y, fill_color):
+            return None
+        mask, bbox = self.region(image, x, y)
+        if mask is None:
+            return None
+        return self.paint(image, mask, bbox, fill_color)
+
+    def _same_color(self, image, x, y, fill_color):
+        w, h = image.size
+        px, py = max(0, min(w - 1, int(x))), max(0, min(h - 1, int(y)))
+        return image.getpixel((px, py)) == self._color(image, fill_color)
+
+    @staticmethod
+    def _color(image, fill_color):
+        if isinstance(fill_color, str):
+            return ImageColor.getcolor(fill_color, image.mode)
+        return tuple(fill_color)
+
+    def paint_bbox(self, image, bbox):
+        """Area paint() will touch for a region bbox (grown by the smooth edge)."""
+        if not self.antialias:
+            return bbox
+        w, h = image.size
+        return (max(0, bbox[0] - 2), max(0, bbox[1] - 2), min(w, bbox[2] + 2), min(h, bbox[3] + 2))
+
+    def paint(self, image, mask, bbox, fill_color):
+        """Paint fill_color through a region mask from region(); returns the touched bbox."""
+        fill = self._color(image, fill_color)
+        if self.antialias:
+            # one pixel of partial coverage around the region softens the edge
+            bbox = self.paint_bbox(image, bbox)
+            local = mask.crop(bbox)
+            soft = local.filter(ImageFilter.MaxFilter(3)).filter(ImageFilter.BoxBlur(1))
+            local = ImageChops.lighter(local, soft)
+        else:
+            local = mask.crop(bbox)
+        image.paste(fill, bbox, local)
+        return bbox
@@ -0,0 +1,181 @@
+import threading
+import zlib
+from PIL import Image
+
+
+class HistoryEntry:
+    """One undoable action: the pixels it overwrote plus the window state around it."""
+    def __init__(self, label):
+        self.label = label
+        self.tiles = {}  # tile -> packed pixels before the action
+        self.full = None  # packed whole image before the action (size changes)
+        self.redo_tiles = None
+        self.redo_full = None
+        self.state_before = None  # window state dicts, filled in by PaintWindow
+        self.state_after = None
+        self.items_added = []  # canvas content added by the action
+        self.items_removed = []  # canvas content removed by the action
+        self.nbytes = 0
+
+    def state_changed(self):
+        before, after = self.state_before or {}, self.state_after or {}
+        for key in set(before) | set(after):
+            a, b = before.get(key), after.get(key)
+            # identity first: state may hold whole images, never compare their pixels
+            if a is not b and not (isinstance(a, (int, float, str)) and a == b):
+                return True
+        return False
+
+    def is_empty(self):
+        return (not self.tiles and self.full is None and not self.items_added
+                and not self.items_removed and not self.state_changed())
+
+
+class History:
+    """Undo/redo stack that stores only the tiles each action overwrote.
+
+    Pixels are saved copy-on-write: History.record is installed as the
+    buffer's before_write hook and keeps the first version of every tile
+    an open entry touches. Entries older than `hot_entries` are zlib
+    compressed, and the oldest entries are dropped once the stack goes
+    over `budget_bytes`.
+    """
+    def __init__(self, budget_bytes=256 * 1024 * 1024, hot_entries=2):
+        self.budget_bytes = budget_bytes
+        self.hot_entries = hot_entries
+        self._undo = []
+        self._redo = []
+        self._open = None
+        self._applying = False
+        self._lock = threading.RLock()
+
+    # --- packing ---
+
+    @staticmethod
+    def _pack(image):
+        return (image.mode, image.size, image.tobytes(), False)
+
+    @staticmethod
+    def _compress(packed):
+        mode, size, data, compressed = packed
+        if compressed:
+            return packed
+        return (mode, size, zlib.compress(data, 1), True)
+
+    @staticmethod
+    def _unpack(packed):
+        mode, size, data, compressed = packed
+        return Image.frombytes(mode, size, zlib.decompress(data) if compressed else data)
+
+    @staticmethod
+    def _packed_size(packed):
+        return len(packed[2]) if packed else 0
+
+    def _entry_size(self, entry):
+        n = sum(len(p[2]) for p in entry.tiles.values()) + self._packed_size(entry.full)
+        if entry.redo_tiles:
+            n += sum(len(p[2]) for p in entry.redo_tiles.values())
+        return n + self._packed_size(entry.redo_full)
+
+    # --- recording ---
+
+    def open(self, entry):
+        with self._lock:
+            self._open = entry
+
+    def close(self, entry):
+        with self._lock:
+            if self._open is entry:
+                self._open = None
+            if entry.is_empty():
+                return
+            self._redo.clear()
+            entry.nbytes = self._entry_size(entry)
+            self._undo.append(entry)
+            # older entries are rarely undone: trade a little CPU for memory
+            for old in self._undo[:-self.hot_entries] if self.hot_entries else self._undo:
+                if old.tiles and not next(iter(old.tiles.values()))[3]:
+                    old.tiles = {k: self._compress(v) for k, v in old.tiles.items()}
+                if old.full is not None:
+                    old.full = self._compress(old.full)
+                old.nbytes = self._entry_size(old)
+            while len(self._undo) > 1 and self.memory_bytes() > self.budget_bytes:
+                self._undo.pop(0)
+
+    def record(self, buffer, tiles):
+        """before_write hook: keep the pixels of tiles the open entry is about to change."""
+        with self._lock:
+            entry = self._open
+            if entry is None or self._applying or entry.full is not None:
+                return
+            if tiles is None:
+                # size change / replacement: rebuild the pre-action image once
+                before = buffer.get_image().copy()
+                for key, packed in entry.tiles.items():
+                    before.paste(self._unpack(packed), buffer.tile_bbox(key)[:2])
+                entry.full = self._pack(before)
+                entry.tiles = {}
+                return
+            for key in tiles:
+                if key not in entry.tiles:
+                    entry.tiles[key] = self._pack(buffer.get_tile(key))
+
+    # --- undo / redo ---
+
+    def can_undo(self):
+        return bool(self._undo)
+
+    def can_redo(self):
+        return bool(self._redo)
+
+    def undo(self, buffer, restore_full):
+        """Put back the pixels of the newest entry and return it (None if nothing to undo).
+
+        restore_full(image) is used when the entry replaced the whole image.
+        """
+        with self._lock:
+            if not self._undo:
+                return None
+            entry = self._undo.pop()
+            self._applying = True
+            try:
+                if entry.full is not None:
+                    entry.redo_full = self._pack(buffer.get_image())
+                    restore_full(self._unpack(entry.full))
+                else:
+                    entry.redo_tiles = {k: self._pack(buffer.get_tile(k)) for k in entry.tiles}
+                    for key, packed in entry.tiles.items():
+                        buffer.put_tile(key, self._unpack(packed))
+            finally:
+                self._applying = False
+            entry.nbytes = self._entry_size(entry)
+            self._redo.append(entry)
+            return entry
+
+    def redo(self, buffer, restore_full):
+        with self._lock:
+            if not self._redo:
+                return None
+            entry = self._redo.pop()
+            self._applying = True
+            try:
+                if entry.redo_full is not None:
+                    restore_full(self._unpack(entry.redo_full))
+                elif entry.redo_tiles:
+                    for key, packed in entry.redo_tiles.items():
+                        buffer.put_tile(key, self._unpack(packed))
+            finally:
+                self._applying = False
+            entry.redo_tiles = None
+            entry.redo_full = None
+            entry.nbytes = self._entry_size(entry)
+            self._undo.append(entry)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._undo.clear()
+            self._redo.clear()
+
+    def memory_bytes(self):
+        return sum(e.nbytes for e in self._undo) + sum(e.nbytes for e in self._redo)
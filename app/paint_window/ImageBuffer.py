@@ -1,51 +1,196 @@
 from PIL import Image, ImageDraw
+from .FloodFill import FloodFill
 
 
 class ImageBuffer:
-    """Wrapper around a PIL Image and ImageDraw to centralize raster ops."""
+    """Wrapper around a PIL Image and ImageDraw to centralize raster ops.
+
+    Every drawing call records the tiles it touched. Consumers (display,
+    undo, autosave...) each read their own set of dirty tiles through
+    `take_dirty(channel)` so they only have to look at what changed.
+    `before_write`, when set, is called as before_write(buffer, tiles) just
+    before tiles are modified (tiles=None: the whole image is replaced),
+    which is what the undo history uses to copy pixels on write.
+    An image adopted with borrowed=True is shared with its owner (e.g. the
+    ImageCache) and only copied on the first write.
+    """
+    TILE_SIZE = 256
+
     def __init__(self, width: int, height: int, color="white"):
+        self.color = color
         self.image = Image.new("RGB", (max(1, int(width)), max(1, int(height))), color)
         self.draw = ImageDraw.Draw(self.image)
+        self._dirty = {}  # channel -> set of (tx, ty)
+        self.before_write = None
+        self._borrowed = False  # self.image belongs to someone else: copy before writing
+
+    @property
+    def size(self):
+        return self.image.size
+
+    # --- dirty tile tracking ---
+
+    def track_dirty(self, channel):
+        """Start collecting dirty tiles for `channel` (everything counts as dirty at first)."""
+        if channel not in self._dirty:
+            self._dirty[channel] = set(self.all_tiles())
+
+    def take_dirty(self, channel):
+        """Return the tiles changed since the last call for `channel` and reset them."""
+        tiles = self._dirty.get(channel)
+        if tiles is None:
+            self.track_dirty(channel)
+            tiles = self._dirty[channel]
+        self._dirty[channel] = set()
+        return tiles
+
+    def all_tiles(self):
+        w, h = self.size
+        ts = self.TILE_SIZE
+        return [(tx, ty) for ty in range((h + ts - 1) // ts) for tx in range((w + ts - 1) // ts)]
+
+    def tiles_in(self, bbox):
+        """Tile keys overlapping the pixel bbox (x0, y0, x1, y1), clipped to the image."""
+        w, h = self.size
+        ts = self.TILE_SIZE
+        x0, y0 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+        x1, y1 = min(w, int(bbox[2]) + 1), min(h, int(bbox[3]) + 1)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        return [(tx, ty) for ty in range(y0 // ts, (y1 - 1) // ts + 1)
+                for tx in range(x0 // ts, (x1 - 1) // ts + 1)]
+
+    def tile_bbox(self, tile):
+        w, h = self.size
+        ts = self.TILE_SIZE
+        x0, y0 = tile[0] * ts, tile[1] * ts
+        return (x0, y0, min(w, x0 + ts), min(h, y0 + ts))
+
+    def get_tile(self, tile):
+        """Copy of one tile's pixels."""
+        return self.image.crop(self.tile_bbox(tile))
+
+    def snapshot_tiles(self):
+        """{tile: copy of its pixels} for the whole image."""
+        return {key: self.get_tile(key) for key in self.all_tiles()}
+
+    def copy_tiles(self, keys):
+        """{tile: copy of its pixels, or None if it is plain paper that was never drawn on}."""
+        return {key: self.get_tile(key) for key in keys}
+
+    def put_tile(self, tile, tile_image):
+        self._will_write(self.tile_bbox(tile))
+        self.image.paste(tile_image, self.tile_bbox(tile)[:2])
+        self.mark_dirty(self.tile_bbox(tile))
+
+    def paste_region(self, region_image, xy):
+        """Paste a small image at xy (top-left) and mark only that area dirty."""
+        x, y = int(xy[0]), int(xy[1])
+        bbox = (x, y, x + region_image.width - 1, y + region_image.height - 1)
+        self._will_write(bbox)
+        self.image.paste(region_image, (x, y))
+        self.mark_dirty(bbox)
+
+    def _will_write(self, bbox=None, replace=False):
+        """Announce a write inside bbox (None: everywhere; replace: new image/size)."""
+        if not replace:
+            self._own_image()
+        if self.before_write is not None:
+            if replace:
+                self.before_write(self, None)
+            else:
+                self.before_write(self, self.all_tiles() if bbox is None else self.tiles_in(bbox))
+
+    def _own_image(self):
+        if self._borrowed:
+            self.image = self.image.copy()
+            self.draw = ImageDraw.Draw(self.image)
+            self._borrowed = False
+
+    def mark_dirty(self, bbox=None):
+        """Record a change inside bbox (None means the whole image)."""
+        if not self._dirty:
+            return
+        tiles = self.all_tiles() if bbox is None else self.tiles_in(bbox)
+        for channel in self._dirty.values():
+            channel.update(tiles)
+
+    def _mark_whole_image(self):
+        # after a size change old tile keys are meaningless: reset every channel
+        for channel in self._dirty:
+            self._dirty[channel] = set(self.all_tiles())
+
+    @staticmethod
+    def _coords_bbox(coords, pad=0):
+        flat = []
+        for c in coords:
+            if isinstance(c, (tuple, list)):
+                flat.extend(c)
+            else:
+                flat.append(c)
+        xs, ys = flat[0::2], flat[1::2]
+        return (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+
+    # --- raster operations ---
+
+    def set_image(self, pil_image, borrowed=False):
+        """Replace the whole buffer with pil_image (converted to RGB).
+
+        An RGB image is adopted as-is, not copied: pass a copy if the caller
+        keeps using it, or borrowed=True to have it copied on the first write.
+        """
+        self._will_write(replace=True)
+        self._borrowed = borrowed and pil_image.mode == "RGB"
+        self.image = pil_image if pil_image.mode == "RGB" else pil_image.convert("RGB")
+        self.draw = ImageDraw.Draw(self.image)
+        self._mark_whole_image()
 
     def resize(self, width: int, height: int, resample=None):
         w, h = max(1, int(width)), max(1, int(height))
+        self._will_write(replace=True)
         try:
             if resample is None:
                 resample = Image.LANCZOS
             self.image = self.image.resize((w, h), resample)
         except Exception:
             self.image = self.image.resize((w, h))
+        self._borrowed = False
         self.draw = ImageDraw.Draw(self.image)
+        self._mark_whole_image()
 
-    def paste_image(self, pil_image):
+    def paste_image(self, pil_image, borrowed=False):
         try:
             # If the incoming image has a different size, replace the buffer
             # with the image itself so the opened photo keeps its native size.
             if pil_image.size != self.image.size:
-                self.image = pil_image.convert("RGB")
-                self.draw = ImageDraw.Draw(self.image)
+                self.set_image(pil_image, borrowed)
             else:
                 # Same size: paste into existing buffer
+                self._will_write()
                 self.image.paste(pil_image)
                 self.draw = ImageDraw.Draw(self.image)
+                self.mark_dirty()
         except Exception:
             try:
                 # Fallback: ensure we at least store the image (resized if needed)
-                self.image = pil_image.convert("RGB")
-                self.draw = ImageDraw.Draw(self.image)
+                self.set_image(pil_image, borrowed)
             except Exception:
                 pass
 
-    def get_image(self):
+    def get_image(self, load_pending=True):
         return self.image
 
     def draw_line(self, coords, fill, width=1):
+        bbox = self._coords_bbox(coords, int(width) // 2 + 1)
+        self._will_write(bbox)
         try:
             self.draw.line(coords, fill=fill, width=width)
         except Exception:
             self.draw.line(coords, fill=fill, width=int(width))
+        self.mark_dirty(bbox)
 
     def draw_ellipse(self, bbox, fill=None, outline=None, width=1):
+        self._will_write(self._coords_bbox(bbox, 1))
         try:
             if fill is not None and outline is not None:
                 # Pillow supports both
@@ -66,8 +211,10 @@ class ImageBuffer:
                 self.draw.ellipse(bbox)
             except Exception:
                 pass
+        self.mark_dirty(self._coords_bbox(bbox, 1))
 
     def fill_rect(self, bbox, fill="white"):
+        self._will_write(self._coords_bbox(bbox))
         try:
             self.draw.rectangle(bbox, fill=fill)
         except Exception:
@@ -78,8 +225,19 @@ class ImageBuffer:
                 self.draw = ImageDraw.Draw(self.image)
             except Exception:
                 pass
+        self.mark_dirty(self._coords_bbox(bbox))
+
+    def text_bbox(self, position, text, font=None):
+        try:
+            if font is None:
+                from PIL import ImageFont
+                font = ImageFont.load_default()
+            return self.draw.textbbox(position, text, font=font)
+        except Exception:
+            return None
 
     def draw_text(self, position, text, fill="black", font=None):
+        self._will_write(self.text_bbox(position, text, font))
         try:
             if font is None:
                 from PIL import ImageFont
@@ -90,36 +248,26 @@ class ImageBuffer:
                 self.draw.text(position, text, fill=fill)
             except Exception:
                 pass
+        self.mark_dirty(self.text_bbox(position, text, font))
 
-    def flood_fill(self, x, y, fill_color):
-        """Simple flood fill (4-way) on the RGB image starting at (x,y)."""
+    def flood_fill(self, x, y, fill_color, tolerance=0, connectivity=4, antialias=False, source=None):
+        """Scanline flood fill starting at (x,y); returns the filled bbox or None.
+
+        The region is found on `source` (same size, e.g. the composited
+        export image) when given, and painted into the buffer.
+        """
         try:
-            px = self.image.load()
-            w, h = self.image.size
-            x = max(0, min(w-1, int(x)))
-            y = max(0, min(h-1, int(y)))
-            target = px[x, y]
-            if isinstance(fill_color, str):
-                from PIL import ImageColor
-                fill = ImageColor.getrgb(fill_color)
-            else:
-                fill = tuple(fill_color)
-            if target == fill:
-                return
-            stack = [(x, y)]
-            while stack:
-                sx, sy = stack.pop()
-                if px[sx, sy] != target:
-                    continue
-                px[sx, sy] = fill
-                if sx > 0:
-                    stack.append((sx-1, sy))
-                if sx < w-1:
-                    stack.append((sx+1, sy))
-                if sy > 0:
-                    stack.append((sx, sy-1))
-                if sy < h-1:
-                    stack.append((sx, sy+1))
+            engine = FloodFill(tolerance, connectivity, antialias)
+            probe = self.image if source is None else source
+            if tolerance == 0 and engine._same_color(probe, x, y, fill_color):
+                return None
+            mask, bbox = engine.region(probe, x, y)
+            if mask is None:
+                return None
+            self._will_write(engine.paint_bbox(self.image, bbox))
+            bbox = engine.paint(self.image, mask, bbox, fill_color)
             self.draw = ImageDraw.Draw(self.image)
+            self.mark_dirty(bbox)
+            return bbox
         except Exception:
-            pass
+            return None
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import OrderedDict
+from .ImageDecoder import ImageDecoder
+
+
+class ImageCache:
+    """Process-wide LRU cache of decoded images, shared by every window.
+
+    Entries are keyed by (absolute path, mtime, file size), so a file that
+    changed on disk is decoded again. Cached images are shared: callers must
+    treat them as read-only and copy before editing. The cache keeps its
+    total size under budget_bytes by dropping the least recently used
+    entries; an image larger than the whole budget is returned but not kept.
+    Concurrent requests for the same file wait for a single decode.
+    """
+    DEFAULT_BUDGET = 512 * 1024 * 1024
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET, decode=ImageDecoder.decode):
+        self.budget_bytes = budget_bytes
+        self._decode = decode
+        self._entries = OrderedDict()  # key -> (image, nbytes), least recently used first
+        self._loading = {}  # key -> Event set when its decode finishes
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def key(path):
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def image_bytes(image):
+        return image.width * image.height * len(image.getbands())
+
+    def peek(self, path):
+        """Cached image for path or None; never decodes."""
+        try:
+            key = self.key(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get(self, path):
+        """Decoded image for path, from the cache or decoded now (on the calling thread)."""
+        key = self.key(path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                pending = self._loading.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._loading[key] = threading.Event()
+                    break
+            pending.wait()  # someone else is decoding it; retry once they are done
+        try:
+            image = self._decode(path)
+            self.put(key, image)
+            return image
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            pending.set()
+
+    def put(self, key, image):
+        nbytes = self.image_bytes(image)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if nbytes > self.budget_bytes:
+                return
+            self._entries[key] = (image, nbytes)
+            self.bytes += nbytes
+            self._evict()
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.budget_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'budget_bytes': self.budget_bytes,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': (self.hits / total) if total else 0.0}
@@ -0,0 +1,57 @@
+import threading
+from PIL import Image
+
+
+class ImageDecoder:
+    """Opens image files for editing: a quick reduced preview, then the full decode.
+
+    JPEG previews use draft mode, so the decoder itself scales by 1/2..1/8
+    and never produces the full-size frame. The full decode produces RGB
+    directly where the format allows it (JPEG draft mode), so the common
+    case allocates the full-resolution image exactly once.
+    """
+    PREVIEW_MAX_SIDE = 2048
+
+    @classmethod
+    def preview(cls, path, max_side=None):
+        """(reduced RGB image or None, full size). None when no cheap preview is possible."""
+        max_side = max_side or cls.PREVIEW_MAX_SIDE
+        with Image.open(path) as im:
+            full = im.size
+            if im.format != 'JPEG' or max(full) <= max_side:
+                return None, full
+            scale = max_side / float(max(full))
+            im.draft('RGB', (max(1, int(full[0] * scale)), max(1, int(full[1] * scale))))
+            im.load()
+            return (im if im.mode == 'RGB' else im.convert('RGB')), full
+
+    @staticmethod
+    def decode(path):
+        """Full-resolution RGB image of path."""
+        im = Image.open(path)
+        if im.format == 'JPEG' and im.mode != 'RGB':
+            # let libjpeg convert YCbCr -> RGB while decoding (no-op for other modes)
+            im.draft('RGB', im.size)
+        im.load()
+        if im.mode == 'RGB':
+            return im
+        try:
+            return im.convert('RGB')
+        finally:
+            im.close()
+
+    @classmethod
+    def decode_async(cls, path, on_done, decode=None):
+        """Decode (with decode(path), default decode()) on a worker thread; on_done(image, error) runs there."""
+        decode = decode or cls.decode
+
+        def run():
+            image = error = None
+            try:
+                image = decode(path)
+            except Exception as e:
+                error = e
+            on_done(image, error)
+        t = threading.Thread(target=run, name='image-decoder', daemon=True)
+        t.start()
+        return t
@@ -0,0 +1,73 @@
+from PIL import Image
+
+
+class ImagePyramid:
+    """Lazily built mip-map levels of an ImageBuffer for zoomed-out display.
+
+    Level k is the document reduced by 2**k. Levels are only built when a
+    zoom needs them and are patched in place from the buffer's dirty tiles
+    ('pyramid' channel) instead of being rebuilt after every edit. The
+    document pixels themselves are never touched.
+    """
+    MAX_LEVEL = 8
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self._levels = {}  # k -> Image, k >= 1 (level 0 is the buffer itself)
+        self._size = buffer.size
+        buffer.track_dirty('pyramid')
+
+    def level_for(self, scale):
+        """Smallest level that is still at least as detailed as `scale` needs."""
+        k = 0
+        while k < self.MAX_LEVEL and scale <= 1.0 / (2 ** (k + 1)):
+            k += 1
+        return k
+
+    def _sync(self):
+        dirty = self.buffer.take_dirty('pyramid')
+        if self.buffer.size != self._size:
+            self._size = self.buffer.size
+            self._levels.clear()
+            return
+        if not dirty or not self._levels:
+            return
+        boxes = [self.buffer.tile_bbox(t) for t in dirty]
+        box = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+               max(b[2] for b in boxes), max(b[3] for b in boxes))
+        for k in sorted(self._levels):
+            # region of level k-1 that feeds the changed area, aligned to 2x2 blocks
+            f = 2 ** (k - 1)
+            src = self._get(k - 1)
+            x0, y0 = (box[0] // f) & ~1, (box[1] // f) & ~1
+            x1, y1 = -(-box[2] // f), -(-box[3] // f)
+            x1, y1 = min(src.width, x1 + (x1 & 1)), min(src.height, y1 + (y1 & 1))
+            if x0 >= x1 or y0 >= y1:
+                continue
+            self._levels[k].paste(src.crop((x0, y0, x1, y1)).reduce(2), (x0 // 2, y0 // 2))
+
+    def _get(self, k):
+        if k == 0:
+            # tiles that arrive later mark themselves dirty, so the levels catch up without a full load here
+            return self.buffer.get_image(load_pending=False)
+        level = self._levels.get(k)
+        if level is None:
+            level = self._get(k - 1).reduce(2)
+            self._levels[k] = level
+        return level
+
+    def render(self, box, scale):
+        """Render document region `box` (x0, y0, x1, y1) at `scale`; returns a PIL image."""
+        self._sync()
+        k = self.level_for(scale)
+        f = 2 ** k
+        level = self._get(k)
+        x0, y0 = box[0] / f, box[1] / f
+        x1, y1 = min(level.width, box[2] / f), min(level.height, box[3] / f)
+        out_w = max(1, int(round((box[2] - box[0]) * scale)))
+        out_h = max(1, int(round((box[3] - box[1]) * scale)))
+        resample = Image.NEAREST if scale >= 1.0 else Image.BILINEAR
+        return level.resize((out_w, out_h), resample, box=(x0, y0, x1, y1))
+
+    def memory_bytes(self):
+        return sum(im.width * im.height * 3 for im in self._levels.values())
@@ -0,0 +1,173 @@
+import io
+import os
+import tempfile
+import threading
+import time
+from PIL import Image
+
+
+class _ProgressFile:
+    """File wrapper that counts the bytes the encoder writes.
+
+    fileno() is deliberately unsupported so Pillow writes through write()
+    instead of handing the OS file descriptor straight to the encoder.
+    """
+    def __init__(self, fh, on_bytes=None, step=1024 * 1024):
+        self._fh = fh
+        self._on_bytes = on_bytes
+        self._step = step
+        self._reported = 0
+        self.written = 0
+
+    def write(self, data):
+        n = self._fh.write(data)
+        self.written += len(data)
+        if self._on_bytes and self.written - self._reported >= self._step:
+            self._reported = self.written
+            self._on_bytes(self.written)
+        return n
+
+    def fileno(self):
+        raise io.UnsupportedOperation('fileno')
+
+    def __getattr__(self, name):
+        return getattr(self._fh, name)
+
+
+class ImageSaver:
+    """Encodes and writes images on a background thread.
+
+    The image is written to a temporary file next to the target and renamed
+    over it only once it is complete, so an interrupted save never leaves a
+    truncated file behind. Saves from one saver run one after another.
+    Callbacks are invoked on the saving thread.
+
+    Encoder settings come from named profiles (PROFILES: profile -> format
+    -> Pillow save() parameters); formats missing from a profile are saved
+    with Pillow defaults.
+    """
+    PROFILES = {
+        'fast': {
+            'PNG': {'compress_level': 1},
+            'JPEG': {'quality': 90},
+            'WEBP': {'quality': 90, 'method': 0},
+            'TIFF': {'compression': 'raw'},
+        },
+        'balanced': {
+            'PNG': {'compress_level': 6},
+            'JPEG': {'quality': 90, 'optimize': True},
+            'WEBP': {'quality': 90, 'method': 4},
+            'TIFF': {'compression': 'tiff_lzw'},
+        },
+        'smallest': {
+            'PNG': {'compress_level': 9, 'optimize': True},
+            'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+            'WEBP': {'quality': 80, 'method': 6},
+            'TIFF': {'compression': 'tiff_adobe_deflate'},
+        },
+    }
+    DEFAULT_PROFILE = 'balanced'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def busy(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        return bool(self._threads)
+
+    def wait(self):
+        """Block until every save started so far has finished."""
+        for t in list(self._threads):
+            t.join()
+        self._threads = []
+
+    @staticmethod
+    def format_for(path):
+        ext = os.path.splitext(path)[1].lower()
+        fmt = Image.registered_extensions().get(ext)
+        if fmt is None:
+            raise ValueError(f'unknown file extension: {ext or path}')
+        return fmt
+
+    @classmethod
+    def params_for(cls, fmt, profile=None):
+        return dict(cls.PROFILES.get(profile or cls.DEFAULT_PROFILE, {}).get(fmt, {}))
+
+    @staticmethod
+    def prepare(image, fmt):
+        """Convert image to a mode the format can store."""
+        if fmt == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+            return image.convert('RGB')
+        return image
+
+    def save(self, image, path, profile=None, on_progress=None, on_done=None):
+        """Start saving image to path.
+
+        on_progress(bytes_written); on_done(path, error_or_None, stats_or_None).
+        """
+        return self.save_with(path, lambda progress: self.write(image, path, profile, progress),
+                              on_progress, on_done)
+
+    def save_with(self, path, job, on_progress=None, on_done=None):
+        """Run job(on_progress) -> stats on the saving thread, with the same callbacks as save()."""
+        # not a daemon: a save started just before closing must still finish
+        t = threading.Thread(target=self._run, args=(path, job, on_progress, on_done), name='image-saver')
+        t.start()
+        self._threads.append(t)
+        return t
+
+    def _run(self, path, job, on_progress, on_done):
+        error = stats = None
+        with self._lock:
+            try:
+                stats = job(on_progress)
+            except Exception as e:
+                error = e
+        if on_done:
+            try:
+                on_done(path, error, stats)
+            except Exception:
+                pass
+
+    def write(self, image, path, profile=None, on_progress=None):
+        """Atomically write image to path (blocking).
+
+        Returns {'format', 'profile', 'seconds', 'bytes'} for the encode.
+        """
+        fmt = self.format_for(path)
+        profile = profile or self.DEFAULT_PROFILE
+        params = self.params_for(fmt, profile)
+        t0 = time.perf_counter()
+        image = self.prepare(image, fmt)
+        written = self.write_atomic(path, lambda out: image.save(out, format=fmt, **params), on_progress)
+        return {'format': fmt, 'profile': profile, 'seconds': time.perf_counter() - t0, 'bytes': written}
+
+    @staticmethod
+    def write_atomic(path, write, on_progress=None):
+        """Call write(file) on a temp file next to path, then move it over path; returns bytes written."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                out = _ProgressFile(fh, on_progress)
+                write(out)
+                fh.flush()
+                os.fsync(fh.fileno())
+            try:
+                mode = os.stat(path).st_mode & 0o777
+            except OSError:
+                umask = os.umask(0)
+                os.umask(umask)
+                mode = 0o666 & ~umask
+            os.chmod(tmp, mode)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        if on_progress:
+            on_progress(out.written)
+        return out.written
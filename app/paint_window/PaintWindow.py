@@ -3,19 +3,37 @@ import time
 from tkinter import *
 import tkinter as tk
 from tkinter.ttk import Combobox, Notebook, Progressbar
-import importlib.util
 import threading
-import traceback
 import json
 from tkinter import colorchooser, messagebox, filedialog, simpledialog
 from .WindowCounter import WindowCounter
 from ..ButtonDescription import ButtonDescription
 from .Painter import Painter
-from PIL import Image, ImageTk, ImageDraw
+from PIL import Image, ImageTk
 from .ImageBuffer import ImageBuffer
+from .TiledImageBuffer import TiledImageBuffer
+from .ImagePyramid import ImagePyramid
+from .RasterWorker import RasterWorker
+from .History import History, HistoryEntry
+from .StrokeStore import Stroke, StrokeStore
+from .ImageSaver import ImageSaver
+from .ImageDecoder import ImageDecoder
+from .ImageCache import ImageCache
+from .PluginProcessPool import PluginProcessPool
+from .TiledPluginRunner import TiledPluginRunner
+from .PluginRunner import PluginRunner
+from .PluginResultCache import PluginResultCache
+from .ProjectFile import ProjectFile
+from .Autosave import Autosave
 from .PluginEditor import PluginEditor
+from .PluginRegistry import PluginRegistry
 
 class PaintWindow:
+    # images at least this large are kept in a TiledImageBuffer
+    TILED_BUFFER_MIN_PIXELS = 4096 * 4096
+    # the live plugin preview runs on at most this many pixels, upscaled to the view
+    PREVIEW_MAX_PIXELS = 1024 * 1024
+
     def __init__(self, parent, app=None, preload_image=None, file_path=None, is_saved=False, is_updated=False, changes=False, allowed_plugins=None):
         self.app = app
         self.window = parent
@@ -27,6 +45,7 @@ class PaintWindow:
         self.is_updated = bool(is_updated)
         self.is_saved = bool(is_saved)
         self.changes = bool(changes)
+        self._edit_generation = 0  # bumped on every edit: a save only clears `changes` if it did not move
         self.file_path = file_path
 
         self.base_paper_width = 800
@@ -35,11 +54,16 @@ class PaintWindow:
         self.paper_height = self.base_paper_height
         self.paper_fill = "white"
 
-        self.image_buffer = ImageBuffer(self.base_paper_width, self.base_paper_height, color=self.paper_fill)
-        self.original_loaded_image = None  # Store original opened image without stretching
+        self.image_buffer = self._new_image_buffer(self.base_paper_width, self.base_paper_height)
+        # undo history: the buffer reports the tiles it is about to overwrite
+        self.history = History()
+        self.image_buffer.before_write = self.history.record
+        self._action = None
+        self._opening = None  # path being decoded in the background; input is ignored meanwhile
         self.bg_loaded = False
         self.bg_image_id = None
-        self.tk_image = None
+        self.tk_image = None  # persistent PhotoImage, patched in place by _refresh_bg_image
+        self._bg_refresh_pending = False
 
         self.canvas = Canvas(self.window, width=self.paper_width, height=self.paper_height, bg='gray90')
         self.canvas.pack(expand=True, fill=BOTH)
@@ -59,6 +83,13 @@ class PaintWindow:
                                                            fill='black', tags=('resizer',))
 
         self.painter = Painter(self.canvas, self.image_buffer, self.paper_fill)
+        self.painter.on_raster_change = self._on_raster_stroke
+        self.rasterizer = RasterWorker(on_drained=self._on_raster_drained)
+        self.painter.rasterizer = self.rasterizer
+        self.painter.on_stroke_end = self._on_stroke_end
+        # vector content lives here; canvas items only mirror it
+        self.strokes = StrokeStore()
+        self.painter.strokes = self.strokes
 
         self.cursor = self.canvas.create_oval(0, 0, 0, 0, outline="black", width=1, tags="cursor")
 
@@ -74,25 +105,31 @@ class PaintWindow:
         self.shape_preview_id = None
         self.shape_start = None
         self.active_resize_mode = None
+        self.fill_tolerance = 0
+        self.fill_connectivity = 4
+        self.fill_antialias = False
 
+        # zoom is a view transform: canvas items live in view coordinates
+        # (document * zoom_level), the buffer always stays in document pixels
         self.zoom_level = 1.0
+        self._pyramid = None
+        self._view_photo = None
+        self._view_box = None  # document region shown by _view_photo
+        self._load_generation = 0  # bumped on every project open; stops stale tile streams
 
         self.__create_toolbar()
         
         if preload_image is not None:
             try:
-                # Store original image for plugins
-                self.original_loaded_image = preload_image.copy().convert('RGB')
-                self.image_buffer.paste_image(preload_image.copy().convert('RGB'))
+                # callers hand over a fresh or cached image and never modify it; the buffer copies it on first write
+                self._adopt_image(preload_image, borrowed=True)
                 self.paper_width, self.paper_height = self.image_buffer.get_image().size
                 self.bg_loaded = True
-                self._refresh_bg_image()
+                self.request_bg_refresh()
                 try:
                     self.canvas.itemconfig(self.paper_bg, fill='')
                 except Exception:
                     pass
-                self.canvas.coords(self.paper_bg, 0, 0, self.paper_width, self.paper_height)
-                self.canvas.coords(self.paper_outline, 0, 0, self.paper_width, self.paper_height)
                 self.update_resizers()
             except Exception:
                 pass
@@ -102,6 +139,8 @@ class PaintWindow:
         self.canvas.bind("<Button-1>", self.on_button_press)
         self.canvas.bind("<Motion>", self.update_oval)
         self.canvas.bind("<Configure>", self.on_canvas_configure)
+        self.canvas.bind("<Button-2>", lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind("<B2-Motion>", self.pan)
 
         if self.is_toplevel:
             try:
@@ -110,8 +149,50 @@ class PaintWindow:
                 self.window.bind("<Control-w>", lambda e: self.close_window())
                 self.window.bind("<Control-s>", lambda e: self.save_image())
                 self.window.bind("<Control-x>", lambda e: self.save_image_as())
+                self.window.bind("<Control-z>", lambda e: self.undo() or "break")
+                self.window.bind("<Control-y>", lambda e: self.redo() or "break")
+            except Exception:
+                pass
+
+        # crash recovery journal, checkpointed when the UI is idle
+        try:
+            self.autosave = Autosave()
+        except Exception:
+            self.autosave = None
+        self._schedule_autosave()
+
+    def _schedule_autosave(self):
+        try:
+            self.window.after(Autosave.INTERVAL_MS, lambda: self.window.after_idle(self._autosave_tick))
+        except Exception:
+            pass
+
+    def _autosave_tick(self):
+        if self.is_closed or self.autosave is None:
+            return
+        # never in the middle of a drag; untouched documents have nothing to recover
+        if self._action is None and (self.is_updated or self.history.can_undo()):
+            try:
+                self.autosave.checkpoint(self.image_buffer, self.strokes,
+                                         {'paper_fill': self.paper_fill, 'settings': self._project_settings()},
+                                         {'file_path': self.file_path, 'paper_fill': self.paper_fill},
+                                         self.rasterizer)
             except Exception:
                 pass
+        self._schedule_autosave()
+
+    def _stop_background(self):
+        """The window is going away: stop the raster thread and drop the recovery journal."""
+        self.is_closed = True
+        try:
+            self.rasterizer.stop()
+        except Exception:
+            pass
+        try:
+            if self.autosave is not None:
+                self.autosave.discard()
+        except Exception:
+            pass
 
     def __create_toolbar(self):
         try:
@@ -130,10 +211,20 @@ class PaintWindow:
         self.size_scale = Scale(brushes_tab, from_=1, to=50, orient=HORIZONTAL, command=self.change_size)
         self.size_scale.set(self.painter.width)
         self.size_scale.pack(side=LEFT, padx=5)
-        self.brush_combo = Combobox(brushes_tab, values=["brush", "eraser"], state="readonly")
+        self.brush_combo = Combobox(brushes_tab, values=["brush", "soft brush", "eraser"], state="readonly")
         self.brush_combo.current(0)
         self.brush_combo.pack(side=LEFT, padx=5)
         self.brush_combo.bind("<<ComboboxSelected>>", lambda e: self.painter.set_tool(self.brush_combo.get()))
+        Label(brushes_tab, text="Hardness").pack(side=LEFT, padx=(10, 0))
+        self.hardness_scale = Scale(brushes_tab, from_=0, to=100, orient=HORIZONTAL,
+                                    command=lambda v: self.painter.set_hardness(int(v) / 100.0))
+        self.hardness_scale.set(int(self.painter.hardness * 100))
+        self.hardness_scale.pack(side=LEFT, padx=5)
+        Label(brushes_tab, text="Opacity").pack(side=LEFT, padx=(10, 0))
+        self.opacity_scale = Scale(brushes_tab, from_=1, to=100, orient=HORIZONTAL,
+                                   command=lambda v: self.painter.set_opacity(int(v) / 100.0))
+        self.opacity_scale.set(int(self.painter.opacity * 100))
+        self.opacity_scale.pack(side=LEFT, padx=5)
 
         shapes_tab = Frame(toolbar_notebook)
         toolbar_notebook.add(shapes_tab, text='Shapes')
@@ -144,6 +235,18 @@ class PaintWindow:
         self.fill_var = tk.BooleanVar(value=False)
         self.fill_check = Checkbutton(shapes_tab, text="Fill", variable=self.fill_var, command=lambda: setattr(self, 'fill_shape', self.fill_var.get()))
         self.fill_check.pack(side=LEFT, padx=5)
+        Label(shapes_tab, text="Fill tolerance").pack(side=LEFT, padx=(10, 0))
+        self.tolerance_scale = Scale(shapes_tab, from_=0, to=255, orient=HORIZONTAL,
+                                     command=lambda v: setattr(self, 'fill_tolerance', int(v)))
+        self.tolerance_scale.set(self.fill_tolerance)
+        self.tolerance_scale.pack(side=LEFT, padx=5)
+        self.connectivity_combo = Combobox(shapes_tab, values=["4-way", "8-way"], state="readonly", width=6)
+        self.connectivity_combo.current(0)
+        self.connectivity_combo.pack(side=LEFT, padx=5)
+        self.connectivity_combo.bind("<<ComboboxSelected>>", lambda e: setattr(self, 'fill_connectivity', 8 if self.connectivity_combo.current() == 1 else 4))
+        self.fill_aa_var = tk.BooleanVar(value=False)
+        self.fill_aa_check = Checkbutton(shapes_tab, text="Smooth fill edge", variable=self.fill_aa_var, command=lambda: setattr(self, 'fill_antialias', self.fill_aa_var.get()))
+        self.fill_aa_check.pack(side=LEFT, padx=5)
 
         tools_tab = Frame(toolbar_notebook)
         toolbar_notebook.add(tools_tab, text='Tools')
@@ -155,6 +258,13 @@ class PaintWindow:
         self.save_button_as.pack(side=LEFT, padx=5)
         self.save_button = Button(tools_tab, text="Save Image", command=self.save_image)
         self.save_button.pack(side=LEFT, padx=5)
+        self.save_profile = ImageSaver.DEFAULT_PROFILE
+        self.last_save_stats = None  # {'format', 'profile', 'seconds', 'bytes'} of the last save
+        profiles = list(ImageSaver.PROFILES)
+        self.save_profile_combo = Combobox(tools_tab, values=profiles, state="readonly", width=9)
+        self.save_profile_combo.current(profiles.index(self.save_profile))
+        self.save_profile_combo.pack(side=LEFT, padx=5)
+        self.save_profile_combo.bind("<<ComboboxSelected>>", lambda e: setattr(self, 'save_profile', self.save_profile_combo.get()))
         self.open_button = Button(tools_tab, text="Open Image", command=self.open_image)
         self.open_button.pack(side=LEFT, padx=5)
         self.dock_button = Button(tools_tab, text=("Dock" if self.is_toplevel else "Undock"), command=self.toggle_dock)
@@ -167,6 +277,17 @@ class PaintWindow:
         self.zoom_out_btn.pack(side=LEFT, padx=5)
         self.zoom_reset_btn = Button(tools_tab, text="Reset Zoom", command=self.reset_zoom)
         self.zoom_reset_btn.pack(side=LEFT, padx=5)
+        self.undo_btn = Button(tools_tab, text="Undo", command=self.undo)
+        self.undo_btn.pack(side=LEFT, padx=5)
+        self.redo_btn = Button(tools_tab, text="Redo", command=self.redo)
+        self.redo_btn.pack(side=LEFT, padx=5)
+        self.items_label = Label(container, text="Items: 0")
+        self.items_label.pack(side=RIGHT, padx=5)
+        # background save status; packed only while there is something to say
+        self.saver = ImageSaver()
+        self.save_status = Label(container, text="")
+        self.save_progress = Progressbar(container, mode='indeterminate', length=80)
+        self._save_status_clear = None
 
         # Plugins: open plugin manager window
         self.plugins = {}  # name -> module
@@ -177,18 +298,23 @@ class PaintWindow:
         self.plugins_btn.pack(side=LEFT, padx=5)
         self.plugins_failed = {}  # filename -> error string
         self.plugin_progress_var = None
+        self.plugin_cache_label = None
         self._plugins_cancel_requested = False
+        # live preview: the selected chain on the visible part of the view, at screen resolution
+        self.plugin_preview = tk.BooleanVar(value=False)
+        self._preview_after = None
+        self._preview_generation = 0
+        self._preview_photo = None
+        # run plugin chains in worker processes so pure-Python plugins cannot stall the UI
+        self.plugins_in_process = tk.BooleanVar(value=True)
         self.plugins_config = None
         self.plugin_file_map = {}
         self.plugin_display_by_file = {}
 
-    def paint(self, event):
-        if self.is_closed:
-            return
-        cx = self.canvas.canvasx(event.x)
-        cy = self.canvas.canvasy(event.y)
-
+    def _mark_changed(self):
+        """Record an edit of the document; a save in flight no longer covers it."""
         self.is_updated = True
+        self._edit_generation += 1
         if not self.changes:
             self.changes = True
             try:
@@ -197,9 +323,18 @@ class PaintWindow:
             except Exception:
                 pass
 
+    def paint(self, event):
+        if self.is_closed or self._opening:
+            return
+        cx = self.canvas.canvasx(event.x)
+        cy = self.canvas.canvasy(event.y)
+        dx, dy = cx / self.zoom_level, cy / self.zoom_level
+
+        self._mark_changed()
+
         try:
             if getattr(self, 'active_resize_mode', None):
-                evt = type('E', (), {'x': int(cx), 'y': int(cy)})()
+                evt = type('E', (), {'x': int(dx), 'y': int(dy)})()
                 self.resize_canvas(evt, mode=self.active_resize_mode, scale_content=False)
                 return
             items = self.canvas.find_overlapping(cx, cy, cx, cy)
@@ -210,7 +345,7 @@ class PaintWindow:
                         mode = 'width'
                     elif it == self.bottom_resizer:
                         mode = 'height'
-                    evt = type('E', (), {'x': int(cx), 'y': int(cy)})()
+                    evt = type('E', (), {'x': int(dx), 'y': int(dy)})()
                     self.resize_canvas(evt, mode=mode, scale_content=False)
                     return
         except Exception:
@@ -218,12 +353,12 @@ class PaintWindow:
 
         if getattr(self, 'shape_mode', 'freehand') != 'freehand':
             try:
-                self.update_shape_preview(cx, cy)
+                self.update_shape_preview(dx, dy)
             except Exception:
                 pass
             return
 
-        self.painter.paint(cx, cy, self.paper_width, self.paper_height, getattr(self, 'is_resizing', False))
+        self.painter.paint(dx, dy, self.paper_width, self.paper_height, getattr(self, 'is_resizing', False))
         try:
             self.canvas.tag_raise(self.paper_outline)
             self.canvas.tag_raise('resizer')
@@ -244,8 +379,47 @@ class PaintWindow:
                 self.finish_shape(event)
         except Exception:
             pass
+        self._end_action()
+        self.update_item_counter()
+
+    def flush_raster(self):
+        """Barrier: wait until every queued stroke segment has reached the buffer."""
+        try:
+            self.rasterizer.flush()
+        except Exception:
+            pass
+
+    def _on_raster_drained(self):
+        # called on the raster thread; the refresh itself runs on the Tk thread
+        if self.bg_loaded and not self.is_closed:
+            try:
+                self.window.after(0, self.request_bg_refresh)
+            except Exception:
+                pass
+
+    def _on_raster_stroke(self):
+        """Soft brush strokes only exist in the buffer, so show it as the background."""
+        self.bg_loaded = True
+        self.request_bg_refresh()
+
+    def canvas_item_count(self):
+        """Number of live drawing items (strokes, shapes, text)."""
+        return len(self.strokes)
+
+    def update_item_counter(self):
+        try:
+            text = f"Items: {self.canvas_item_count()}"
+            stats = self.painter.last_stroke_stats
+            if stats:
+                text += f" | last stroke: {stats['raw']} samples, {stats['kept']} kept, {stats['committed']} committed"
+            text += f" | history: {self.history.memory_bytes() / (1024 * 1024):.1f} MB"
+            self.items_label.configure(text=text)
+        except Exception:
+            pass
 
     def on_button_press(self, event):
+        if self._opening:
+            return
         mode = getattr(self, 'shape_mode', 'freehand')
         try:
             cx = self.canvas.canvasx(event.x)
@@ -260,49 +434,56 @@ class PaintWindow:
                     else:
                         self.active_resize_mode = 'both'
                     self.is_resizing = True
+                    self._begin_action('resize')
                     return
         except Exception:
             pass
 
         if mode == 'freehand':
+            self._begin_action('stroke')
+            if self.painter.tool == 'soft brush':
+                self._flatten_strokes()
             return
 
-        x = int(self.canvas.canvasx(event.x))
-        y = int(self.canvas.canvasy(event.y))
+        x = int(self.canvas.canvasx(event.x) / self.zoom_level)
+        y = int(self.canvas.canvasy(event.y) / self.zoom_level)
         x = max(0, min(int(self.paper_width), x))
         y = max(0, min(int(self.paper_height), y))
 
         if mode == 'text':
             txt = simpledialog.askstring('Text', 'Enter text:', parent=self.window if self.is_toplevel else None)
             if txt:
+                self._mark_changed()
+                self._begin_action('text')
                 try:
+                    self.flush_raster()
                     self.image_buffer.draw_text((x, y), txt, fill=self.painter.color)
-                    self.canvas.create_text(x, y, text=txt, fill=self.painter.color, anchor=NW, tags=('stroke',))
+                    self._add_stroke(Stroke('text', (x, y), fill=self.painter.color, text=txt))
                 except Exception:
                     pass
+                self._end_action()
             return
 
         if mode == 'fill':
+            self._mark_changed()
+            self._begin_action('fill')
             try:
-                w, h = int(self.paper_width), int(self.paper_height)
-                tmp_img = self.build_export_image()
-                tmp_buf = ImageBuffer(w, h)
-                tmp_buf.image = tmp_img
-                tmp_buf.draw = ImageDraw.Draw(tmp_buf.image)
-                tmp_buf.flood_fill(x, y, self.painter.color)
-                try:
-                    self.image_buffer.image = tmp_buf.get_image()
-                    self.image_buffer.draw = ImageDraw.Draw(self.image_buffer.image)
-                except Exception:
-                    pass
+                # the region is found on what the user sees (buffer + strokes),
+                # only the filled pixels are written to the buffer
+                self.image_buffer.flood_fill(x, y, self.painter.color,
+                                             tolerance=self.fill_tolerance,
+                                             connectivity=self.fill_connectivity,
+                                             antialias=self.fill_antialias,
+                                             source=self.build_export_image())
                 self.bg_loaded = True
                 try:
                     self.canvas.itemconfig(self.paper_bg, fill='')
                 except Exception:
                     pass
-                self._refresh_bg_image()
+                self.request_bg_refresh()
             except Exception:
                 pass
+            self._end_action()
             return
 
         self.shape_start = (x, y)
@@ -351,13 +532,14 @@ class PaintWindow:
             ids.append(self.canvas.create_rectangle(*rect, outline=color, dash=(3,5), tags=('preview',)))
             ids.append(self.canvas.create_oval(*bottom, outline=color, dash=(3,5), tags=('preview',)))
             self.shape_preview_id = ids
+        self._to_view('preview')
 
     def finish_shape(self, event=None):
         if not self.shape_start:
             return
         if event is not None:
-            ex = int(self.canvas.canvasx(event.x))
-            ey = int(self.canvas.canvasy(event.y))
+            ex = int(self.canvas.canvasx(event.x) / self.zoom_level)
+            ey = int(self.canvas.canvasy(event.y) / self.zoom_level)
         else:
             coords = None
             if self.shape_preview_id:
@@ -369,7 +551,7 @@ class PaintWindow:
                 except Exception:
                     coords = None
             if coords and len(coords) >= 4:
-                ex, ey = int(coords[2]), int(coords[3])
+                ex, ey = int(coords[2] / self.zoom_level), int(coords[3] / self.zoom_level)
             else:
                 ex, ey = self.shape_start
 
@@ -400,22 +582,25 @@ class PaintWindow:
 
         color = self.painter.color
         width = self.painter.width
+        self._mark_changed()
+        self._begin_action(self.shape_mode)
+        self.flush_raster()
 
         if self.shape_mode == 'line':
-            self.canvas.create_line(x0, y0, x1, y1, fill=color, width=width, capstyle=ROUND, joinstyle=ROUND, tags=('stroke',))
+            self._add_stroke(Stroke('line', (x0, y0, x1, y1), fill=color, width=width))
             try:
                 self.image_buffer.draw_line([x0, y0, x1, y1], fill=color, width=width)
             except Exception:
                 pass
         elif self.shape_mode == 'ellipse':
             if self.fill_shape:
-                self.canvas.create_oval(x0, y0, x1, y1, fill=color, outline=color, tags=('stroke',))
+                self._add_stroke(Stroke('oval', (x0, y0, x1, y1), fill=color, outline=color))
                 try:
                     self.image_buffer.draw_ellipse([x0, y0, x1, y1], fill=color, outline=color)
                 except Exception:
                     pass
             else:
-                self.canvas.create_oval(x0, y0, x1, y1, outline=color, width=width, tags=('stroke',))
+                self._add_stroke(Stroke('oval', (x0, y0, x1, y1), outline=color, width=width))
                 try:
                     self.image_buffer.draw_ellipse([x0, y0, x1, y1], outline=color, width=width)
                 except Exception:
@@ -427,9 +612,9 @@ class PaintWindow:
             bottom_bbox = [x0, int(y1 - ellipse_h), x1, y1]
             rect_bbox = [x0, int(y0 + ellipse_h/2), x1, int(y1 - ellipse_h/2)]
             if self.fill_shape:
-                self.canvas.create_rectangle(*rect_bbox, fill=color, outline=color, tags=('stroke',))
-                self.canvas.create_oval(*top_bbox, fill=color, outline=color, tags=('stroke',))
-                self.canvas.create_oval(*bottom_bbox, fill=color, outline=color, tags=('stroke',))
+                self._add_stroke(Stroke('rectangle', rect_bbox, fill=color, outline=color))
+                self._add_stroke(Stroke('oval', top_bbox, fill=color, outline=color))
+                self._add_stroke(Stroke('oval', bottom_bbox, fill=color, outline=color))
                 try:
                     self.image_buffer.draw_ellipse(top_bbox, fill=color, outline=color)
                     self.image_buffer.fill_rect(rect_bbox, fill=color)
@@ -437,9 +622,9 @@ class PaintWindow:
                 except Exception:
                     pass
             else:
-                self.canvas.create_oval(*top_bbox, outline=color, width=width, tags=('stroke',))
-                self.canvas.create_rectangle(*rect_bbox, outline=color, width=width, tags=('stroke',))
-                self.canvas.create_oval(*bottom_bbox, outline=color, width=width, tags=('stroke',))
+                self._add_stroke(Stroke('oval', top_bbox, outline=color, width=width))
+                self._add_stroke(Stroke('rectangle', rect_bbox, outline=color, width=width))
+                self._add_stroke(Stroke('oval', bottom_bbox, outline=color, width=width))
                 try:
                     self.image_buffer.draw_ellipse(top_bbox, outline=color, width=width)
                     self.image_buffer.draw_ellipse(bottom_bbox, outline=color, width=width)
@@ -448,33 +633,289 @@ class PaintWindow:
                 except Exception:
                     pass
 
+        self._end_action()
         self.shape_start = None
         self.shape_preview_id = None
 
-    def _refresh_bg_image(self):
+    def _to_view(self, tag):
+        """Move items drawn in document coordinates to the current zoom."""
+        if self.zoom_level != 1.0:
+            self.canvas.scale(tag, 0, 0, self.zoom_level, self.zoom_level)
+
+    # --- undo / redo ---
+
+    def _history_state(self):
+        return {'paper_width': self.paper_width, 'paper_height': self.paper_height,
+                'paper_fill': self.paper_fill, 'bg_loaded': self.bg_loaded}
+
+    def _begin_action(self, label):
+        """Open a history entry; buffer writes queued after this belong to it."""
+        self._end_action()
+        entry = HistoryEntry(label)
+        entry.state_before = self._history_state()
+        self._action = entry
+        # through the raster queue, so strokes still being drawn stay in their own entry
+        self.rasterizer.submit(self.history.open, entry)
+        return entry
+
+    def _end_action(self):
+        entry = self._action
+        if entry is None:
+            return
+        self._action = None
+        entry.state_after = self._history_state()
+        self.rasterizer.submit(self.history.close, entry)
+
+    def _on_stroke_end(self, stroke):
+        if self._action is not None:
+            self._action.items_added.append(stroke)
+
+    def _add_stroke(self, stroke):
+        """Put a new Stroke on the canvas and record it in the open history entry."""
+        self.strokes.draw_on(self.canvas, stroke, self.zoom_level)
+        if self._action is not None:
+            self._action.items_added.append(stroke)
+        return stroke
+
+    def _flatten_strokes(self):
+        """Render the strokes into the buffer and drop their canvas items.
+
+        Soft brush dabs only exist in the buffer, which is shown (and
+        exported) below the strokes: flattening first keeps a soft stroke
+        above everything drawn before it. The removal is recorded in the
+        open history entry, so undo brings the strokes back.
+        """
+        box = self.strokes.bbox()
+        if box is None:
+            return
+        w, h = self.image_buffer.size
+        x0, y0 = max(0, int(box[0])), max(0, int(box[1]))
+        x1, y1 = min(w, int(box[2]) + 1), min(h, int(box[3]) + 1)
         try:
-            self.tk_image = ImageTk.PhotoImage(self.image_buffer.get_image())
-            if self.bg_image_id:
-                self.canvas.itemconfig(self.bg_image_id, image=self.tk_image)
-            else:
-                self.bg_image_id = self.canvas.create_image(0, 0, anchor=NW, image=self.tk_image, tags='bg_image')
-                self.canvas.tag_lower('bg_image')
+            if x0 < x1 and y0 < y1:
+                self.flush_raster()
+                with self.rasterizer.lock:
+                    region = self.image_buffer.get_image().crop((x0, y0, x1, y1))
+                self.strokes.render(region, origin=(x0, y0))
+                self.rasterizer.submit(self.image_buffer.paste_region, region, (x0, y0))
+            removed = self.strokes.clear()
+            self.canvas.delete('stroke')
+            if self._action is not None:
+                self._action.items_removed.extend(removed)
+        except Exception:
+            return
+        self.bg_loaded = True
+        try:
+            self.canvas.itemconfig(self.paper_bg, fill='')
+        except Exception:
+            pass
+        self.request_bg_refresh()
+        self.update_item_counter()
+
+    def _restore_state(self, state):
+        self.paper_width, self.paper_height = state['paper_width'], state['paper_height']
+        self.paper_fill = state['paper_fill']
+        self.painter.paper_fill = self.paper_fill
+        self.image_buffer.color = self.paper_fill
+        self.bg_loaded = state['bg_loaded']
+        try:
+            self.canvas.itemconfig(self.paper_bg, fill='' if self.bg_loaded else self.paper_fill)
+        except Exception:
+            pass
+        if self.bg_loaded:
+            self.request_bg_refresh()
+        elif self.bg_image_id:
             try:
-                self.canvas.itemconfig(self.paper_bg, fill='')
+                self.canvas.delete(self.bg_image_id)
             except Exception:
                 pass
+            self.bg_image_id = None
+            self.tk_image = None
+        self.update_resizers()
+
+    def _apply_history(self, remove, add, state):
+        for stroke in remove:
+            self.strokes.remove(stroke.item)
             try:
-                self.canvas.tag_raise(self.paper_outline)
-                self.canvas.tag_raise('resizer')
+                self.canvas.delete(stroke.item)
             except Exception:
                 pass
+        for stroke in add:
+            try:
+                self.strokes.draw_on(self.canvas, stroke, self.zoom_level)
+            except Exception:
+                pass
+        self._restore_state(state)
+        self.request_bg_refresh()
+        self._mark_changed()
+        self.update_item_counter()
+
+    def undo(self, event=None):
+        self._end_action()
+        self.flush_raster()
+        try:
+            entry = self.history.undo(self.image_buffer, self._adopt_image)
+        except Exception:
+            entry = None
+        if entry is not None:
+            self._apply_history(entry.items_added, entry.items_removed, entry.state_before)
+
+    def redo(self, event=None):
+        self._end_action()
+        self.flush_raster()
+        try:
+            entry = self.history.redo(self.image_buffer, self._adopt_image)
+        except Exception:
+            entry = None
+        if entry is not None:
+            self._apply_history(entry.items_removed, entry.items_added, entry.state_after)
+
+    def _new_image_buffer(self, width, height):
+        if int(width) * int(height) >= self.TILED_BUFFER_MIN_PIXELS:
+            return TiledImageBuffer(width, height, color=self.paper_fill)
+        return ImageBuffer(width, height, color=self.paper_fill)
+
+    def _set_image_buffer(self, buffer):
+        buffer.before_write = self.image_buffer.before_write
+        self.image_buffer = buffer
+        if getattr(self, 'painter', None):
+            self.painter.image_buffer = buffer
+
+    def _adopt_image(self, pil_image, borrowed=False):
+        """Load pil_image into the window buffer, switching backend if its size calls for it.
+
+        borrowed: pil_image is shared (e.g. a cached decode) and is copied only when first painted on.
+        """
+        self.flush_raster()
+        w, h = pil_image.size
+        tiled = w * h >= self.TILED_BUFFER_MIN_PIXELS
+        if tiled != isinstance(self.image_buffer, TiledImageBuffer):
+            # the old buffer is about to be dropped: let the history keep it
+            self.image_buffer._will_write(replace=True)
+            self._set_image_buffer(self._new_image_buffer(w, h))
+        self.image_buffer.paste_image(pil_image, borrowed)
+
+    def request_bg_refresh(self):
+        """Schedule a background refresh; requests made before the UI goes idle are drawn once."""
+        if self._bg_refresh_pending:
+            return
+        self._bg_refresh_pending = True
+        try:
+            self.window.after_idle(self._refresh_bg_image)
+        except Exception:
+            self._bg_refresh_pending = False
+
+    def _refresh_bg_image(self):
+        """Bring the background PhotoImage up to date with the buffer.
+
+        The PhotoImage is only rebuilt when the buffer size changes; otherwise
+        the bounding box of the tiles dirtied since the last refresh is
+        converted and copied into it by Tk.
+        """
+        self._bg_refresh_pending = False
+        if self.is_closed:
+            return
+        if self.plugin_preview.get():
+            self._schedule_plugin_preview()  # the view changed: preview it again over the new image
+        if self.zoom_level != 1.0:
+            self._render_viewport()
+            return
+        try:
+            buf = self.image_buffer
+            # the raster thread may be drawing: read the buffer under its lock
+            with self.rasterizer.lock:
+                dirty = buf.take_dirty('display')
+                img = buf.get_image(load_pending=False)  # streamed tiles are patched in as they arrive
+                if self.tk_image is None or (self.tk_image.width(), self.tk_image.height()) != img.size:
+                    self.tk_image = ImageTk.PhotoImage(img)
+                    if self.bg_image_id:
+                        self.canvas.itemconfig(self.bg_image_id, image=self.tk_image)
+                elif dirty:
+                    boxes = [buf.tile_bbox(t) for t in dirty]
+                    x0, y0 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+                    x1, y1 = max(b[2] for b in boxes), max(b[3] for b in boxes)
+                    patch = ImageTk.PhotoImage(img.crop((x0, y0, x1, y1)))
+                    self.canvas.tk.call(str(self.tk_image), 'copy', str(patch), '-to', x0, y0)
+            self._show_bg(self.tk_image, 0, 0)
+        except Exception:
+            pass
+
+    def _show_bg(self, photo, x, y):
+        if self.bg_image_id:
+            self.canvas.itemconfig(self.bg_image_id, image=photo)
+            self.canvas.coords(self.bg_image_id, x, y)
+        else:
+            self.bg_image_id = self.canvas.create_image(x, y, anchor=NW, image=photo, tags='bg_image')
+            self.canvas.tag_lower('bg_image')
+        try:
+            self.canvas.itemconfig(self.paper_bg, fill='')
+        except Exception:
+            pass
+        try:
+            self.canvas.tag_raise(self.paper_outline)
+            self.canvas.tag_raise('resizer')
+        except Exception:
+            pass
+
+    def _render_viewport(self):
+        """Draw only the visible part of the document at the current zoom, from the mip-map pyramid."""
+        try:
+            z = self.zoom_level
+            buf = self.image_buffer
+            if self._pyramid is None or self._pyramid.buffer is not buf:
+                self._pyramid = ImagePyramid(buf)
+            vx, vy = self.canvas.canvasx(0), self.canvas.canvasy(0)
+            vw, vh = max(1, self.canvas.winfo_width()), max(1, self.canvas.winfo_height())
+            w, h = buf.size
+            x0, y0 = max(0, int(vx / z)), max(0, int(vy / z))
+            x1, y1 = min(w, int((vx + vw) / z) + 1), min(h, int((vy + vh) / z) + 1)
+            if x0 >= x1 or y0 >= y1:
+                return
+            with self.rasterizer.lock:
+                view = self._pyramid.render((x0, y0, x1, y1), z)
+            self._view_photo = ImageTk.PhotoImage(view)
+            self._view_box = (x0, y0, x1, y1)
+            self._show_bg(self._view_photo, x0 * z, y0 * z)
+        except Exception:
+            pass
+
+    def _show_plugin_tile(self, box, tile):
+        """Paint a finished plugin tile straight onto the displayed image; the buffer gets the whole result at the end."""
+        if self.is_closed:
+            return
+        try:
+            x0, y0, x1, y1 = box
+            z = self.zoom_level
+            if z == 1.0:
+                if self.tk_image is not None and (self.tk_image.width(), self.tk_image.height()) == self.image_buffer.size:
+                    patch = ImageTk.PhotoImage(tile)
+                    self.canvas.tk.call(str(self.tk_image), 'copy', str(patch), '-to', x0, y0)
+                return
+            view, photo = self._view_box, self._view_photo
+            if view is None or photo is None:
+                return
+            ix0, iy0, ix1, iy1 = max(x0, view[0]), max(y0, view[1]), min(x1, view[2]), min(y1, view[3])
+            if ix0 >= ix1 or iy0 >= iy1:
+                return
+            dx, dy = int(round((ix0 - view[0]) * z)), int(round((iy0 - view[1]) * z))
+            pw = min(photo.width(), int(round((ix1 - view[0]) * z))) - dx
+            ph = min(photo.height(), int(round((iy1 - view[1]) * z))) - dy
+            if pw <= 0 or ph <= 0:
+                return
+            part = tile.crop((ix0 - x0, iy0 - y0, ix1 - x0, iy1 - y0)).resize((pw, ph))
+            patch = ImageTk.PhotoImage(part)
+            self.canvas.tk.call(str(photo), 'copy', str(patch), '-to', dx, dy)
         except Exception:
             pass
 
     def update_resizers(self):
-        w, h = self.paper_width, self.paper_height
+        """Place the paper, its outline and the resize handles at the current zoom."""
+        w, h = self.paper_width * self.zoom_level, self.paper_height * self.zoom_level
         s = self.resizer_size
         try:
+            self.canvas.coords(self.paper_bg, 0, 0, w, h)
+            self.canvas.coords(self.paper_outline, 0, 0, w, h)
+            self.canvas.configure(scrollregion=(0, 0, w + 2 * s, h + 2 * s))
             self.canvas.coords(self.right_resizer, w, h/2 - s, w + s, h/2 + s)
             self.canvas.coords(self.bottom_resizer, w/2 - s, h, w/2 + s, h + s)
             self.canvas.coords(self.corner_resizer, w, h, w + s, h + s)
@@ -489,17 +930,14 @@ class PaintWindow:
 
     def resize_canvas(self, event, mode='both', scale_content=True):
         self.is_resizing = True
+        self._mark_changed()
+        self.flush_raster()
         old_w, old_h = float(self.paper_width), float(self.paper_height)
         if mode in ('both', 'width'):
             self.paper_width = max(10, event.x)
         if mode in ('both', 'height'):
             self.paper_height = max(10, event.y)
         new_w, new_h = float(self.paper_width), float(self.paper_height)
-        try:
-            self.canvas.coords(self.paper_bg, 0, 0, self.paper_width, self.paper_height)
-            self.canvas.coords(self.paper_outline, 0, 0, self.paper_width, self.paper_height)
-        except Exception:
-            pass
         try:
             if scale_content:
                 try:
@@ -507,21 +945,13 @@ class PaintWindow:
                 except Exception:
                     pass
                 if self.bg_loaded:
-                    self._refresh_bg_image()
+                    self.request_bg_refresh()
                 try:
                     sx = new_w / old_w if old_w else 1.0
                     sy = new_h / old_h if old_h else 1.0
-                    for item in self.canvas.find_withtag('stroke'):
-                        coords = self.canvas.coords(item)
-                        if not coords:
-                            continue
-                        new_coords = []
-                        for i, v in enumerate(coords):
-                            if i % 2 == 0:
-                                new_coords.append(v * sx)
-                            else:
-                                new_coords.append(v * sy)
-                        self.canvas.coords(item, *new_coords)
+                    self.strokes.scale(sx, sy)
+                    for stroke in self.strokes:
+                        self.canvas.coords(stroke.item, *[v * self.zoom_level for v in stroke.coords])
                 except Exception:
                     pass
             else:
@@ -538,10 +968,9 @@ class PaintWindow:
                             new_img.paste(cropped, (0, 0))
                         except Exception:
                             pass
-                    self.image_buffer.image = new_img
-                    self.image_buffer.draw = ImageDraw.Draw(self.image_buffer.image)
+                    self.image_buffer.set_image(new_img)
                     if self.bg_loaded:
-                        self._refresh_bg_image()
+                        self.request_bg_refresh()
                 except Exception:
                     pass
         except Exception:
@@ -549,22 +978,28 @@ class PaintWindow:
         self.update_resizers()
 
     def zoom(self, factor: float):
+        """Change the view scale; the document pixels and stroke data are left untouched."""
         try:
-            new_w = max(10, int(self.paper_width * factor))
-            new_h = max(10, int(self.paper_height * factor))
-            evt = type('E', (), {'x': int(new_w), 'y': int(new_h)})()
-            self.resize_canvas(evt, mode='both')
-            self.zoom_level *= factor
+            new_zoom = max(1.0 / 64, min(32.0, self.zoom_level * factor))
+            if abs(new_zoom - 1.0) < 1e-6:
+                new_zoom = 1.0
+            f = new_zoom / self.zoom_level
+            self.canvas.scale('stroke', 0, 0, f, f)
+            self.zoom_level = new_zoom
+            self.painter.view_scale = new_zoom
+            self.update_resizers()
+            if self.bg_loaded:
+                self.request_bg_refresh()
         except Exception:
             pass
 
     def reset_zoom(self):
-        try:
-            evt = type('E', (), {'x': int(self.base_paper_width), 'y': int(self.base_paper_height)})()
-            self.resize_canvas(evt, mode='both')
-            self.zoom_level = 1.0
-        except Exception:
-            pass
+        self.zoom(1.0 / self.zoom_level)
+
+    def pan(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        if self.bg_loaded and self.zoom_level != 1.0:
+            self.request_bg_refresh()
 
     def resize_pillow_image(self):
         w, h = int(self.paper_width), int(self.paper_height)
@@ -574,7 +1009,7 @@ class PaintWindow:
             if (w, h) != self.image_buffer.get_image().size:
                 self.image_buffer.resize(w, h)
             if self.bg_loaded:
-                self._refresh_bg_image()
+                self.request_bg_refresh()
             else:
                 if self.bg_image_id:
                     try:
@@ -582,12 +1017,13 @@ class PaintWindow:
                     except Exception:
                         pass
                     self.bg_image_id = None
+                    self.tk_image = None
         except Exception:
             pass
 
     def update_oval(self, event):
         x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
-        r = max(1, int(self.painter.width / 2))
+        r = max(1, int(self.painter.width * self.zoom_level / 2))
         try:
             self.canvas.coords(self.cursor, x - r, y - r, x + r, y + r)
             self.canvas.tag_raise('cursor')
@@ -602,6 +1038,9 @@ class PaintWindow:
     def change_paper_color(self):
         chosen = colorchooser.askcolor(parent=self.window if self.is_toplevel else None)[1]
         if chosen:
+            self._mark_changed()
+            self._begin_action('paper color')
+            self.flush_raster()
             self.paper_fill = chosen
             self.bg_loaded = False
             if self.bg_image_id:
@@ -610,15 +1049,26 @@ class PaintWindow:
                 except Exception:
                     pass
                 self.bg_image_id = None
-            self.painter = Painter(self.canvas, self.image_buffer, self.paper_fill)
+                self.tk_image = None
+            self.painter.paper_fill = self.paper_fill
+            # raster-only content is dropped with the old background; canvas strokes stay
+            self.image_buffer.color = self.paper_fill
+            try:
+                self.image_buffer.fill_rect([0, 0, int(self.paper_width), int(self.paper_height)], fill=self.paper_fill)
+            except Exception:
+                pass
             try:
                 self.canvas.itemconfig(self.paper_bg, fill=self.paper_fill)
             except Exception:
                 pass
+            self._end_action()
 
     def clear_canvas(self):
-        self.is_updated = True
+        self._mark_changed()
+        self._begin_action('clear')
+        self.flush_raster()
         try:
+            self._action.items_removed.extend(self.strokes.clear())
             self.canvas.delete('stroke')
         except Exception:
             pass
@@ -626,6 +1076,8 @@ class PaintWindow:
             self.image_buffer.fill_rect([0, 0, int(self.paper_width), int(self.paper_height)], fill=self.paper_fill)
         except Exception:
             pass
+        self._end_action()
+        self.update_item_counter()
 
     def toggle_dock(self):
         try:
@@ -648,6 +1100,7 @@ class PaintWindow:
                     self.app.detach_tab(self)
                 except Exception:
                     pass
+                self._stop_background()
             except Exception:
                 pass
         elif self.is_toplevel and getattr(self, 'app', None):
@@ -661,40 +1114,17 @@ class PaintWindow:
     def save_image_as(self, event=None):
         if self.is_closed:
             return
-        final_save = self.build_export_image()
-        default_name = f"paint_{time.strftime('%Y%m%d_%H%M%S')}"
-        file_path = filedialog.asksaveasfilename(defaultextension="", initialfile=default_name,
-                                                 filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("BMP files", "*.bmp"), ("All files", "*.*")],
-                                                 parent=self.window if self.is_toplevel else None)
+        file_path = self._ask_save_path()
         if file_path:
-            try:
-                self.changes = False
-                to_save = final_save
-                ext = os.path.splitext(file_path)[1].lower()
-                if ext in ['.jpg', '.jpeg']:
-                    save_img = to_save.convert('RGB')
-                else:
-                    save_img = to_save
-                save_img.save(file_path)
-                self.file_path = file_path
-                self.is_saved = True
-                try:
-                    if getattr(self, 'changes_label', None):
-                        try:
-                            self.changes_label.destroy()
-                        except Exception:
-                            pass
-                        self.changes_label = None
-                except Exception:
-                    pass
-                if self.is_toplevel:
-                    try:
-                        self.window.title(f"Paint Window - {os.path.basename(file_path)}")
-                    except Exception:
-                        pass
-                messagebox.showinfo('Success', f'Image saved successfully:\n{file_path}', parent=self.window if self.is_toplevel else None)
-            except Exception as e:
-                messagebox.showerror('Error', f'Failed to save image:\n{e}', parent=self.window if self.is_toplevel else None)
+            self._save_in_background(file_path)
+
+    def _ask_save_path(self):
+        default_name = f"paint_{time.strftime('%Y%m%d_%H%M%S')}"
+        return filedialog.asksaveasfilename(defaultextension="", initialfile=default_name,
+                                            filetypes=[("PNG files", "*.png"), ("JPEG files", "*.jpg"), ("BMP files", "*.bmp"),
+                                                       ("WebP files", "*.webp"), ("TIFF files", "*.tif *.tiff"),
+                                                       ("Paint project", "*" + ProjectFile.EXTENSION), ("All files", "*.*")],
+                                            parent=self.window if self.is_toplevel else None)
 
     def save_image(self, event=None):
         if self.is_closed:
@@ -705,14 +1135,182 @@ class PaintWindow:
             self.save_image_as()
 
     def saving(self):
+        self._save_in_background(self.file_path)
+
+    def _save_in_background(self, file_path):
+        """Snapshot the document and hand it to the saver; editing can go on meanwhile."""
+        is_project = file_path.lower().endswith(ProjectFile.EXTENSION)
+        try:
+            if is_project:
+                snapshot = self._project_snapshot()
+            else:
+                ImageSaver.format_for(file_path)
+                snapshot = self.build_export_image()
+        except Exception as e:
+            messagebox.showerror('Save Error', f'Could not save file:\n{e}', parent=self.window if self.is_toplevel else None)
+            return
+        generation = self._edit_generation
+        self._show_save_status(f"Saving {os.path.basename(file_path)}...", busy=True)
+
+        def progress(written):
+            self._after_from_thread(lambda: self._show_save_status(
+                f"Saving {os.path.basename(file_path)}... {written / (1024 * 1024):.1f} MB", busy=True))
+
+        def done(path, error, stats):
+            self._after_from_thread(lambda: self._on_save_done(path, error, stats, generation))
+
+        if is_project:
+            self.saver.save_with(file_path, lambda on_progress: self._write_project(file_path, snapshot, on_progress),
+                                 on_progress=progress, on_done=done)
+        else:
+            self.saver.save(snapshot, file_path, profile=self.save_profile, on_progress=progress, on_done=done)
+
+    def _project_settings(self):
+        painter = self.painter
+        selected = [f for f, var in self.plugin_vars.items() if var.get()]
+        return {'bg_loaded': self.bg_loaded, 'save_profile': self.save_profile,
+                'brush': {'color': painter.color, 'width': painter.width, 'tool': painter.tool,
+                          'hardness': painter.hardness, 'opacity': painter.opacity},
+                'allowed_plugins': self.allowed_plugins, 'selected_plugins': selected,
+                'plugins_in_process': self.plugins_in_process.get()}
+
+    def _project_snapshot(self):
+        """Everything a .pmdi needs, copied on the Tk thread so the save can run in the background."""
+        self.flush_raster()
+        with self.rasterizer.lock:
+            tiles = self.image_buffer.snapshot_tiles()
+        return {'tiles': tiles, 'size': self.image_buffer.size, 'tile_size': self.image_buffer.TILE_SIZE,
+                'paper_fill': self.paper_fill, 'strokes': [s.copy() for s in self.strokes],
+                'settings': self._project_settings()}
+
+    @staticmethod
+    def _write_project(file_path, snapshot, on_progress=None):
+        t0 = time.perf_counter()
+        written = ImageSaver.write_atomic(file_path, lambda fh: ProjectFile.write(fh, **snapshot), on_progress)
+        return {'format': 'PMDI', 'profile': 'project', 'seconds': time.perf_counter() - t0, 'bytes': written}
+
+    def open_project(self, file_path):
+        """Open a .pmdi: header, strokes and visible tiles now, the remaining tiles in the background."""
+        project = ProjectFile(file_path)
+        self._end_action()
+        self.flush_raster()
+        self._load_generation += 1
+        generation = self._load_generation
+        self._edit_generation += 1  # a save still running was of the previous document
+        self.history.clear()
+
+        w, h = project.size
+        self.paper_fill = project.paper_fill
+        buffer = self._new_image_buffer(w, h)
+        self._set_image_buffer(buffer)
+        self.canvas.delete('stroke')
+        self.strokes.clear()
+        for stroke in project.read_strokes():
+            self.strokes.draw_on(self.canvas, stroke, self.zoom_level)
+
+        settings = project.settings
+        self._apply_project_settings(settings)
+        self._restore_state({'paper_width': w, 'paper_height': h, 'paper_fill': project.paper_fill,
+                             'bg_loaded': settings.get('bg_loaded', True)})
+
+        if not isinstance(buffer, TiledImageBuffer):
+            buffer.paste_image(project.read_image())
+            project.close()
+            self.request_bg_refresh()
+            return
+        buffer.set_tile_source(project.read_tile, project.tile_keys())
+        z = self.zoom_level
+        vx, vy = self.canvas.canvasx(0) / z, self.canvas.canvasy(0) / z
+        vw, vh = max(1, self.canvas.winfo_width()) / z, max(1, self.canvas.winfo_height()) / z
+        for key in buffer.tiles_in((vx, vy, vx + vw, vy + vh)):
+            buffer.load_tile(key)
+        self.request_bg_refresh()
+
+        # nearest tiles first, decoded off the Tk thread and handed to the buffer through the raster queue
+        cx, cy = (vx + vw / 2) / buffer.TILE_SIZE, (vy + vh / 2) / buffer.TILE_SIZE
+        rest = sorted(buffer.pending_tiles(), key=lambda k: (k[0] - cx) ** 2 + (k[1] - cy) ** 2)
+
+        def stream():
+            for key in rest:
+                if self._load_generation != generation or self.is_closed:
+                    break
+                try:
+                    tile = project.read_tile(key)
+                except Exception:
+                    break
+                self.rasterizer.submit(buffer.provide_tile, key, tile)
+            if self._load_generation == generation:
+                self.rasterizer.submit(buffer.load_all)
+            # after the last queued job nothing reads from the file any more
+            self.rasterizer.submit(project.close)
+
+        threading.Thread(target=stream, name='project-loader', daemon=True).start()
+
+    def _apply_project_settings(self, settings):
+        brush = settings.get('brush') or {}
+        try:
+            if 'color' in brush:
+                self.painter.set_color(brush['color'])
+            if 'width' in brush:
+                self.size_scale.set(int(brush['width']))
+                self.painter.set_width(brush['width'])
+            if 'hardness' in brush:
+                self.hardness_scale.set(int(brush['hardness'] * 100))
+            if 'opacity' in brush:
+                self.opacity_scale.set(int(brush['opacity'] * 100))
+            if brush.get('tool') in self.brush_combo['values']:
+                self.brush_combo.set(brush['tool'])
+                self.painter.set_tool(brush['tool'])
+            if settings.get('save_profile') in ImageSaver.PROFILES:
+                self.save_profile = settings['save_profile']
+                self.save_profile_combo.set(self.save_profile)
+        except Exception:
+            pass
+        if settings.get('allowed_plugins') is not None:
+            self.allowed_plugins = settings['allowed_plugins']
+        if 'plugins_in_process' in settings:
+            self.plugins_in_process.set(bool(settings['plugins_in_process']))
+        for fname in settings.get('selected_plugins') or []:
+            var = self.plugin_vars.get(fname)
+            if var is not None:
+                var.set(True)
+
+    def _after_from_thread(self, fn):
+        try:
+            self.window.after(0, fn)
+        except Exception:
+            pass
+
+    def _save_before_close(self):
+        """Save synchronously, so the window (and its recovery journal) only goes away once the file is written."""
+        file_path = self.file_path or self._ask_save_path()
+        if not file_path:
+            return False
         try:
-            final_save = self.build_export_image()
-            ext = os.path.splitext(self.file_path)[1].lower() if self.file_path else ''
-            if ext in ['.jpg', '.jpeg']:
-                img_to_write = final_save.convert('RGB')
+            self.saver.wait()  # a background save to the same file must not land after this one
+            if file_path.lower().endswith(ProjectFile.EXTENSION):
+                self._write_project(file_path, self._project_snapshot())
             else:
-                img_to_write = final_save
-            img_to_write.save(self.file_path)
+                self.saver.write(self.build_export_image(), file_path, profile=self.save_profile)
+        except Exception as e:
+            messagebox.showerror('Save Error', f'Could not save file:\n{e}', parent=self.window if self.is_toplevel else None)
+            return False
+        self.file_path = file_path
+        self.is_saved = True
+        return True
+
+    def _on_save_done(self, file_path, error, stats=None, generation=None):
+        if self.is_closed:
+            return
+        if error is not None:
+            self._show_save_status("")
+            messagebox.showerror('Save Error', f'Could not save file:\n{error}', parent=self.window if self.is_toplevel else None)
+            return
+        self.file_path = file_path
+        self.is_saved = True
+        if generation == self._edit_generation:
+            # nothing was drawn while saving: the file matches the document
+            self.changes = False
             try:
                 if getattr(self, 'changes_label', None):
                     try:
@@ -722,21 +1320,56 @@ class PaintWindow:
                     self.changes_label = None
             except Exception:
                 pass
-        except Exception as e:
-            messagebox.showerror('Save Error', f'Could not save file:\n{e}', parent=self.window if self.is_toplevel else None)
+        if self.is_toplevel:
+            try:
+                self.window.title(f"Paint Window - {os.path.basename(file_path)}")
+            except Exception:
+                pass
+        self.last_save_stats = stats
+        text = f"Saved {os.path.basename(file_path)}"
+        if stats:
+            text += f" ({stats['bytes'] / (1024 * 1024):.1f} MB, {stats['seconds']:.2f} s, {stats['profile']})"
+        self._show_save_status(text, clear_after=4000)
+
+    def _show_save_status(self, text, busy=False, clear_after=None):
+        """Non-blocking save notice next to the item counter."""
+        try:
+            if self._save_status_clear is not None:
+                self.window.after_cancel(self._save_status_clear)
+                self._save_status_clear = None
+            if not text:
+                self.save_status.pack_forget()
+                self.save_progress.stop()
+                self.save_progress.pack_forget()
+                return
+            self.save_status.configure(text=text)
+            if not self.save_status.winfo_manager():
+                self.save_status.pack(side=RIGHT, padx=5)
+            if busy:
+                if not self.save_progress.winfo_manager():
+                    self.save_progress.pack(side=RIGHT, padx=5)
+                    self.save_progress.start(50)
+            else:
+                self.save_progress.stop()
+                self.save_progress.pack_forget()
+            if clear_after:
+                self._save_status_clear = self.window.after(clear_after, lambda: self._show_save_status(""))
+        except Exception:
+            pass
 
     def close_window(self, event=None):
         if self.is_updated and not self.is_saved:
             ans = messagebox.askyesnocancel('Unsaved Changes', 'You have unsaved changes. Do you want to save before exiting?', parent=self.window if self.is_toplevel else None)
             if ans is True:
-                self.save_image()
+                if not self._save_before_close():
+                    return  # save cancelled or failed: keep the window and its journal
             elif ans is None:
                 return
         try:
             WindowCounter().reduce_count()
         except Exception:
             pass
-        self.is_closed = True
+        self._stop_background()
         try:
             if self.is_toplevel:
                 self.window.destroy()
@@ -753,6 +1386,8 @@ class PaintWindow:
         self.visible_height = event.height
         self.visible_x = self.canvas.canvasx(0)
         self.visible_y = self.canvas.canvasy(0)
+        if self.bg_loaded and self.zoom_level != 1.0:
+            self.request_bg_refresh()
 
     def change_size(self, new_size):
         try:
@@ -761,51 +1396,91 @@ class PaintWindow:
             pass
 
     def open_image(self):
-        file_path = filedialog.askopenfilename(filetypes=[('Image files', '*.png *.jpg *.jpeg *.bmp *.gif'), ('All files', '*.*')], parent=self.window if self.is_toplevel else None)
-        if file_path:
+        file_path = filedialog.askopenfilename(filetypes=[('Image files', '*.png *.jpg *.jpeg *.bmp *.gif *.webp *.tif *.tiff'),
+                                                          ('Paint project', '*' + ProjectFile.EXTENSION), ('All files', '*.*')],
+                                               parent=self.window if self.is_toplevel else None)
+        if file_path and file_path.lower().endswith(ProjectFile.EXTENSION):
             try:
-                opened_image = Image.open(file_path)
-                # Store original image for plugins (without stretching)
-                self.original_loaded_image = opened_image.convert('RGB').copy()
-                self.image_buffer.paste_image(opened_image.convert('RGB'))
-                self.paper_width, self.paper_height = self.image_buffer.get_image().size
-                self.bg_loaded = True
-                self._refresh_bg_image()
-                self.canvas.coords(self.paper_bg, 0, 0, self.paper_width, self.paper_height)
-                self.canvas.coords(self.paper_outline, 0, 0, self.paper_width, self.paper_height)
-                self.update_resizers()
+                self.open_project(file_path)
                 self.file_path = file_path
+                self.is_saved = True
+                self.is_updated = False
                 if self.is_toplevel:
                     try:
                         self.window.title(f'Paint Window - {os.path.basename(file_path)}')
                     except Exception:
                         pass
             except Exception as e:
-                messagebox.showerror('Error', f'Could not open image:\n{e}', parent=self.window if self.is_toplevel else None)
-
-    def _load_plugin_module(self, path: str):
-        """Dynamically import a plugin module from a file path and return the module or None."""
-        name = os.path.splitext(os.path.basename(path))[0]
-        mod_name = f'paint_plugin_{name}_{int(time.time()*1000)}'
-        spec = importlib.util.spec_from_file_location(mod_name, path)
-        if spec is None:
-            return None
-        module = importlib.util.module_from_spec(spec)
-        loader = spec.loader
-        if loader is None:
-            return None
+                messagebox.showerror('Error', f'Could not open project:\n{e}', parent=self.window if self.is_toplevel else None)
+        elif file_path:
+            self.open_image_file(file_path)
+
+    def open_image_file(self, file_path, image=None):
+        """Load an image file into the window; image: its already decoded (shared, read-only) frame."""
+        if image is None:
+            image = ImageCache.shared().peek(file_path)
+        if image is not None:
+            self._opening = file_path
+            self._finish_open(file_path, image, None)
+            return
         try:
-            loader.exec_module(module)
-            return module
+            preview, full_size = ImageDecoder.preview(file_path)
         except Exception as e:
-            # capture the traceback for reporting
-            tb = traceback.format_exc()
-            fname = os.path.basename(path)
-            try:
-                self.plugins_failed[fname] = tb
-            except Exception:
-                pass
-            return None
+            messagebox.showerror('Error', f'Could not open image:\n{e}', parent=self.window if self.is_toplevel else None)
+            return
+        # the full decode runs in the background; a reduced preview stands in until it lands
+        self._opening = file_path
+        if preview is not None:
+            self._show_preview(preview, full_size)
+        ImageDecoder.decode_async(file_path, lambda image, error: self._after_from_thread(
+            lambda: self._finish_open(file_path, image, error)), decode=ImageCache.shared().get)
+
+    def _show_preview(self, preview, full_size):
+        """Show the visible part of a reduced decode stretched to the document's full size."""
+        try:
+            z = self.zoom_level
+            fw, fh = full_size
+            sx, sy = preview.width / float(fw), preview.height / float(fh)
+            vx, vy = self.canvas.canvasx(0), self.canvas.canvasy(0)
+            vw, vh = max(1, self.canvas.winfo_width()), max(1, self.canvas.winfo_height())
+            x0, y0 = max(0, int(vx / z)), max(0, int(vy / z))
+            x1, y1 = min(fw, int((vx + vw) / z) + 1), min(fh, int((vy + vh) / z) + 1)
+            if x0 >= x1 or y0 >= y1:
+                return
+            px0, py0 = int(x0 * sx), int(y0 * sy)
+            crop = preview.crop((px0, py0, max(px0 + 1, int(x1 * sx)), max(py0 + 1, int(y1 * sy))))
+            view = crop.resize((max(1, int((x1 - x0) * z)), max(1, int((y1 - y0) * z))), Image.BILINEAR)
+            self._view_photo = ImageTk.PhotoImage(view)
+            self._show_bg(self._view_photo, x0 * z, y0 * z)
+        except Exception:
+            pass
+
+    def _finish_open(self, file_path, image, error):
+        if self.is_closed or self._opening != file_path:
+            return  # window closed or another open superseded this one
+        self._opening = None
+        if error is not None:
+            self.request_bg_refresh()  # drop the preview
+            messagebox.showerror('Error', f'Could not open image:\n{error}', parent=self.window if self.is_toplevel else None)
+            return
+        try:
+            self._edit_generation += 1  # a save still running was of the previous document
+            self._begin_action('open image')
+            # the decoded frame is shared through ImageCache: the buffer copies it on first write
+            self._adopt_image(image, borrowed=True)
+            self.paper_width, self.paper_height = image.size
+            self.bg_loaded = True
+            self._end_action()
+            self.request_bg_refresh()
+            self.update_resizers()
+            self.file_path = file_path
+            if self.is_toplevel:
+                try:
+                    self.window.title(f'Paint Window - {os.path.basename(file_path)}')
+                except Exception:
+                    pass
+        except Exception as e:
+            messagebox.showerror('Error', f'Could not open image:\n{e}', parent=self.window if self.is_toplevel else None)
 
     def _read_plugins_config(self, plugins_dir: str):
         cfg_path = os.path.join(plugins_dir, 'plugins_config.json')
@@ -833,7 +1508,8 @@ class PaintWindow:
             plugins_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'plugins'))
             if not os.path.isdir(plugins_dir):
                 return
-            files = [f for f in os.listdir(plugins_dir) if f.endswith('.py') and not f.startswith('__')]
+            registry = PluginRegistry.shared()
+            files = registry.files(plugins_dir)
 
             # read or create config
             cfg, cfg_path = self._read_plugins_config(plugins_dir)
@@ -889,10 +1565,12 @@ class PaintWindow:
             self.plugin_display_by_file.clear()
             for fname in files_to_load:
                 fpath = os.path.join(plugins_dir, fname)
-                module = self._load_plugin_module(fpath)
+                # imported once per process and again only when the file changes
+                module, error = registry.module(fpath)
                 if module is None:
+                    self.plugins_failed[fname] = error
                     continue
-                display = getattr(module, 'PLUGIN_NAME', None) or getattr(module, 'NAME', None) or os.path.splitext(fname)[0]
+                display = getattr(module, 'PLUGIN_NAME', None) or getattr(module, 'NAME', None) or registry.display_name(fpath)
                 if hasattr(module, 'process_image') and callable(getattr(module, 'process_image')):
                     self.plugins[str(display)] = module
                     try:
@@ -951,6 +1629,8 @@ class PaintWindow:
             if not getattr(self, 'plugins_config', None):
                 return
             self.plugins_config.setdefault('plugins', {})[fname] = bool(var.get())
+            if self.plugin_preview.get():
+                self._schedule_plugin_preview()
             # switch to manual mode when user changes selection
             try:
                 if self.plugins_config.get('mode') != 'manual':
@@ -1015,51 +1695,53 @@ class PaintWindow:
         except Exception:
             pass
 
-        # Use original loaded image for plugins (without canvas stretching)
-        original_img = self.original_loaded_image.copy() if self.original_loaded_image else self.image_buffer.get_image().copy()
+        self.flush_raster()
+        use_process = self.plugins_in_process.get()
+        stages = self._plugin_stages([name for name, _ in to_apply])
+        # the full-resolution run is the commit: stop previewing on top of its result
+        self.plugin_preview.set(False)
+        self._preview_generation += 1
 
         def worker(img_copy, procs):
-            result = img_copy
-            total = len(procs)
-            count = 0
-            cancelled = False
-            for name, proc in procs:
+            # plugins may report many times a second: keep the latest value, update the bar at most every 50 ms
+            latest = [0.0]
+            pending = [False]
+
+            def show_progress():
+                pending[0] = False
                 try:
-                    if getattr(self, '_plugins_cancel_requested', False):
-                        cancelled = True
-                        break
-                    maybe = proc(result)
-                    if maybe is not None:
-                        result = maybe
-                    # CHECK CANCEL FLAG AFTER EACH PLUGIN COMPLETES
-                    if getattr(self, '_plugins_cancel_requested', False):
-                        cancelled = True
-                        break
-                    count += 1
-                    # update progress
-                    try:
-                        pct = (count / total) * 100.0 if total else 100.0
-                        self.window.after(1, lambda p=pct: self.plugin_progress_var.set(p))
-                    except Exception:
-                        pass
+                    self.plugin_progress_var.set(latest[0])
                 except Exception:
-                    # store error so user can inspect later
-                    try:
-                        self.plugins_failed[name] = traceback.format_exc()
-                    except Exception:
-                        pass
-            
+                    pass
+
+            def report(done, total):
+                latest[0] = (done / total) * 100.0 if total else 100.0
+                if pending[0]:
+                    return
+                pending[0] = True
+                try:
+                    self.window.after(50, show_progress)
+                except Exception:
+                    pending[0] = False
+
+            # stages run tiled, in a worker process or in this thread; cached prefixes are skipped
+            runner = PluginRunner(use_process=use_process, cache=PluginResultCache.shared())
+            result, cancelled, failed = runner.run(
+                img_copy, stages, on_progress=report,
+                on_tile=lambda box, tile: self._after_from_thread(lambda: self._show_plugin_tile(box, tile)),
+                should_cancel=lambda: getattr(self, '_plugins_cancel_requested', False))
+            try:
+                self.plugins_failed.update(failed)
+            except Exception:
+                pass
+
             # IMMEDIATELY restore or apply image on the main thread
             def apply_or_restore():
                 if cancelled:
-                    # Restore original image immediately
+                    # the buffer was never written: only drop the tiles a tiled run already painted on screen
                     try:
-                        restored = original_img.copy()
-                        self.original_loaded_image = restored.copy()
-                        self.image_buffer.image = restored
-                        self.image_buffer.draw = ImageDraw.Draw(self.image_buffer.image)
-                        self.bg_loaded = True
-                        self._refresh_bg_image()
+                        self.tk_image = None
+                        self.request_bg_refresh()
                     except Exception:
                         pass
                     # Show message
@@ -1069,14 +1751,15 @@ class PaintWindow:
                         pass
                 else:
                     # Apply result only if not cancelled
+                    self._mark_changed()
+                    self._begin_action('plugins')
                     try:
-                        self.original_loaded_image = result.copy()
-                        self.image_buffer.image = result.copy()
-                        self.image_buffer.draw = ImageDraw.Draw(self.image_buffer.image)
+                        self._adopt_image(result)
                         self.bg_loaded = True
-                        self._refresh_bg_image()
+                        self.request_bg_refresh()
                     except Exception:
                         pass
+                    self._end_action()
                 
                 # Re-enable buttons
                 try:
@@ -1102,6 +1785,7 @@ class PaintWindow:
                     self.refresh_plugins_ui()
                 except Exception:
                     pass
+                self._update_plugin_cache_label()
 
             try:
                 self.window.after(0, apply_or_restore)
@@ -1109,7 +1793,8 @@ class PaintWindow:
                 pass
 
         try:
-            img = self.image_buffer.get_image().copy()
+            with self.rasterizer.lock:
+                img = self.image_buffer.get_image().copy()
             # reset cancel flag & progress
             self._plugins_cancel_requested = False
             try:
@@ -1171,6 +1856,10 @@ class PaintWindow:
                     pass
                 self.plugins_window = None
                 self.plugins_list_frame = None
+                self.plugin_cache_label = None
+                if self.plugin_preview.get():
+                    self.plugin_preview.set(False)
+                    self._toggle_plugin_preview()
                 try:
                     if self.plugin_progress_var is not None:
                         self.plugin_progress_var.set(0.0)
@@ -1189,6 +1878,9 @@ class PaintWindow:
             prog = Progressbar(prog_frame, variable=self.plugin_progress_var, maximum=100.0)
             prog.pack(fill=X, expand=True)
             self.plugin_progress = prog
+            self.plugin_cache_label = Label(prog_frame, anchor='w')
+            self.plugin_cache_label.pack(fill=X)
+            self._update_plugin_cache_label()
 
             btns = Frame(pw)
             btns.pack(fill=X, padx=8, pady=4)
@@ -1205,6 +1897,20 @@ class PaintWindow:
             self.plugins_cancel_btn = cancel_b
             close_b = Button(btns, text='Close', command=on_close)
             close_b.pack(side=RIGHT, padx=4)
+            preview_cb = Checkbutton(btns, text='Live preview', variable=self.plugin_preview,
+                                     command=self._toggle_plugin_preview)
+            preview_cb.pack(side=RIGHT, padx=4)
+            ButtonDescription(preview_cb, 'Show the selected plugins on the visible area; Apply runs them at full resolution')
+            process_cb = Checkbutton(btns, text='Separate process', variable=self.plugins_in_process)
+            process_cb.pack(side=RIGHT, padx=4)
+            ButtonDescription(process_cb, 'Run plugins in a worker process (the window stays responsive)')
+            try:
+                # warm the worker processes while the user picks plugins
+                if self.plugins_in_process.get():
+                    PluginProcessPool.shared().start()
+                    TiledPluginRunner.shared().start()
+            except Exception:
+                pass
 
             try:
                 self.load_plugins()
@@ -1214,6 +1920,100 @@ class PaintWindow:
         except Exception:
             pass
 
+    def _plugin_stages(self, names):
+        """(name, path, module) of the named plugin files, for PluginRunner."""
+        plugins_dir = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'plugins'))
+        return [(name, os.path.join(plugins_dir, name), self.plugin_file_map[name])
+                for name in names if name in self.plugin_file_map]
+
+    def _toggle_plugin_preview(self):
+        if self.plugin_preview.get():
+            self._schedule_plugin_preview(0)
+        else:
+            self._preview_generation += 1
+            self._preview_photo = None
+            self.request_bg_refresh()
+
+    def _schedule_plugin_preview(self, delay=30):
+        """Debounced: rapid selection changes or view updates produce one preview."""
+        if self._preview_after is not None:
+            try:
+                self.window.after_cancel(self._preview_after)
+            except Exception:
+                pass
+        try:
+            self._preview_after = self.window.after(delay, self._run_plugin_preview)
+        except Exception:
+            self._preview_after = None
+
+    def _run_plugin_preview(self):
+        """Run the selected chain on the visible region at view resolution, capped at PREVIEW_MAX_PIXELS."""
+        self._preview_after = None
+        self._preview_generation += 1
+        generation = self._preview_generation
+        if self.is_closed or not self.plugin_preview.get() or not self.bg_loaded:
+            return
+        stages = self._plugin_stages([f for f, var in self.plugin_vars.items() if var.get()])
+        if getattr(self.image_buffer, 'pending_tiles', None) and self.image_buffer.pending_tiles():
+            return  # a project is still streaming in; the refresh after its last tile previews again
+        if not stages:
+            if self._preview_photo is not None:
+                self._preview_photo = None  # nothing selected any more: back to the image itself
+                self.request_bg_refresh()
+            return
+        try:
+            z = self.zoom_level
+            buf = self.image_buffer
+            if self._pyramid is None or self._pyramid.buffer is not buf:
+                self._pyramid = ImagePyramid(buf)
+            vx, vy = self.canvas.canvasx(0), self.canvas.canvasy(0)
+            vw, vh = max(1, self.canvas.winfo_width()), max(1, self.canvas.winfo_height())
+            w, h = buf.size
+            x0, y0 = max(0, int(vx / z)), max(0, int(vy / z))
+            x1, y1 = min(w, int((vx + vw) / z) + 1), min(h, int((vy + vh) / z) + 1)
+            if x0 >= x1 or y0 >= y1:
+                return
+            view_size = (max(1, int(round((x1 - x0) * z))), max(1, int(round((y1 - y0) * z))))
+            scale = z * min(1.0, (self.PREVIEW_MAX_PIXELS / float(view_size[0] * view_size[1])) ** 0.5)
+            with self.rasterizer.lock:
+                proxy = self._pyramid.render((x0, y0, x1, y1), scale)
+        except Exception:
+            return
+
+        def worker():
+            try:
+                result, cancelled, _ = PluginRunner(use_process=False).run(
+                    proxy, stages, should_cancel=lambda: generation != self._preview_generation)
+            except Exception:
+                return
+            if not cancelled and result is not None:
+                self._after_from_thread(lambda: self._show_plugin_preview(generation, result, view_size, x0 * z, y0 * z))
+
+        threading.Thread(target=worker, name='plugin-preview', daemon=True).start()
+
+    def _show_plugin_preview(self, generation, image, view_size, x, y):
+        if generation != self._preview_generation or self.is_closed or not self.plugin_preview.get():
+            return  # superseded by a newer preview, or preview turned off
+        try:
+            if image.size != view_size:
+                image = image.resize(view_size, Image.BILINEAR)
+            self._preview_photo = ImageTk.PhotoImage(image)
+            self._show_bg(self._preview_photo, x, y)
+        except Exception:
+            pass
+
+    def _update_plugin_cache_label(self):
+        label = getattr(self, 'plugin_cache_label', None)
+        if label is None:
+            return
+        try:
+            st = PluginResultCache.shared().stats()
+            label.configure(text=f"Result cache: {st['hits']} hits / {st['misses']} runs ({st['hit_rate']:.0%}), "
+                                 f"saved {st['saved_seconds']:.1f} s, {st['bytes'] / (1024 * 1024):.0f} MB in memory, "
+                                 f"{st['disk_bytes'] / (1024 * 1024):.0f} MB on disk")
+        except Exception:
+            pass
+
     def _show_plugin_template(self):
         """Открывает окно с примером кода плагина для сохранения"""
         try:
@@ -1232,6 +2032,7 @@ class PaintWindow:
             messagebox.showerror('Error', f'Could not open plugin editor: {str(e)}')
 
     def build_export_image(self):
+        self.flush_raster()
         w, h = int(self.paper_width), int(self.paper_height)
         if w <= 0 or h <= 0:
             return Image.new('RGB', (1, 1), 'white')
@@ -1239,7 +2040,9 @@ class PaintWindow:
         try:
             if self.bg_loaded and self.image_buffer:
                     try:
-                        buf = self.image_buffer.get_image()
+                        # pending tiles of a project still streaming in are loaded by get_image()
+                        with self.rasterizer.lock:
+                            buf = self.image_buffer.get_image().copy()
                         if buf.size != (w, h):
                             bw, bh = buf.size
                             if bw <= w and bh <= h:
@@ -1256,25 +2059,6 @@ class PaintWindow:
         except Exception:
             pass
 
-        draw = ImageDraw.Draw(bg)
-        try:
-            for item in self.canvas.find_withtag('stroke'):
-                itype = self.canvas.type(item)
-                coords = self.canvas.coords(item)
-                if not coords:
-                    continue
-                pts = tuple(int(round(c)) for c in coords)
-                fill = self.canvas.itemcget(item, 'fill') or 'black'
-                width = int(float(self.canvas.itemcget(item, 'width') or 1))
-                if itype == 'line':
-                    draw.line(pts, fill=fill, width=width)
-                elif itype == 'oval':
-                    draw.ellipse(pts, fill=fill, outline=fill)
-                else:
-                    try:
-                        draw.line(pts, fill=fill, width=width)
-                    except Exception:
-                        pass
-        except Exception:
-            pass
+        # vector content comes from the retained stroke list, not from Tk
+        self.strokes.render(bg)
         return bg
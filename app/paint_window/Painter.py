@@ -1,6 +1,9 @@
 from tkinter import *
 from .ImageBuffer import ImageBuffer
+from .BrushEngine import BrushEngine
+from .StrokeStore import Stroke
 from PIL import Image
+from array import array
 import math
 
 
@@ -13,10 +16,44 @@ class Painter:
         self.color = "black"
         self.width = 5
         self.tool = "brush"  
+        # canvas items are drawn at document coords * view_scale (zoom)
+        self.view_scale = 1.0
 
         self.last_x = None
         self.last_y = None
 
+        # the stroke in progress is a single canvas item: a dot for the first
+        # sample, replaced by one polyline that grows until the button is released
+        self._stroke_item = None
+        self._stroke_is_dot = False
+        self._stroke = None  # Stroke record of the item in progress
+        self.items_created = 0
+        # StrokeStore that finished strokes are added to (set by the window)
+        self.strokes = None
+
+        # input pipeline: samples closer than min_distance screen pixels to the
+        # last kept one are dropped; the kept points are simplified with
+        # Ramer-Douglas-Peucker (simplify_tolerance, document pixels) on commit
+        self.min_distance = 2.0
+        self.simplify_tolerance = 0.75
+        self._stroke_points = []
+        self._raw_samples = 0
+        self.last_stroke_stats = None  # {'raw': n, 'kept': n, 'committed': n}
+
+        # "soft brush" strokes are stamped into the buffer only (no canvas items);
+        # on_raster_change lets the window refresh the background image
+        self.hardness = 0.5
+        self.opacity = 1.0
+        self.brush_engine = BrushEngine()
+        self.on_raster_change = None
+
+        # optional RasterWorker: buffer drawing is queued to it instead of
+        # running on the Tk thread; the canvas preview stays synchronous
+        self.rasterizer = None
+
+        # on_stroke_end(stroke) is called with each finished Stroke record
+        self.on_stroke_end = None
+
     def set_tool(self, new_tool):
         self.tool = new_tool
 
@@ -26,9 +63,116 @@ class Painter:
     def set_width(self, new_width):
         self.width = int(new_width)
 
+    def _raster(self, fn, *args, **kwargs):
+        if self.rasterizer is not None:
+            self.rasterizer.submit(fn, *args, **kwargs)
+        else:
+            fn(*args, **kwargs)
+
+    def set_hardness(self, hardness):
+        self.hardness = max(0.0, min(1.0, float(hardness)))
+
+    def set_opacity(self, opacity):
+        self.opacity = max(0.01, min(1.0, float(opacity)))
+
+    def set_input_filter(self, min_distance=None, simplify_tolerance=None):
+        if min_distance is not None:
+            self.min_distance = max(0.0, float(min_distance))
+        if simplify_tolerance is not None:
+            self.simplify_tolerance = max(0.0, float(simplify_tolerance))
+
     def reset_coords(self):
         self.last_x = None
         self.last_y = None
+        self.end_stroke()
+
+    def end_stroke(self):
+        """Finalize the stroke in progress and return its canvas item (or None).
+
+        The polyline is replaced by its simplified version, the stroke is
+        added to `strokes` and its raw/kept/committed point counts are
+        stored in last_stroke_stats.
+        """
+        item = self._stroke_item
+        points = self._stroke_points
+        if self.tool == "soft brush" and points:
+            self._raster(self.brush_engine.end_stroke)
+            self.last_stroke_stats = {'raw': self._raw_samples, 'kept': len(points) // 2,
+                                      'committed': len(points) // 2}
+        if item is not None:
+            committed = points
+            if not self._stroke_is_dot and len(points) > 4 and self.simplify_tolerance > 0:
+                committed = self.simplify(points, self.simplify_tolerance)
+                if len(committed) < len(points):
+                    try:
+                        s = self.view_scale
+                        self.canvas.coords(item, *[v * s for v in committed])
+                    except Exception:
+                        committed = points
+            self.last_stroke_stats = {'raw': self._raw_samples,
+                                      'kept': len(points) // 2,
+                                      'committed': len(committed) // 2}
+            stroke = self._stroke
+            if stroke is not None:
+                if not self._stroke_is_dot:
+                    stroke.coords = array('f', committed)
+                stroke.item = item
+                if self.strokes is not None:
+                    self.strokes.add(stroke)
+                if self.on_stroke_end:
+                    try:
+                        self.on_stroke_end(stroke)
+                    except Exception:
+                        pass
+        self._stroke_item = None
+        self._stroke_is_dot = False
+        self._stroke = None
+        self._stroke_points = []
+        self._raw_samples = 0
+        return item
+
+    @staticmethod
+    def simplify(points, tolerance):
+        """Ramer-Douglas-Peucker on a flat [x0, y0, x1, y1, ...] list."""
+        n = len(points) // 2
+        if n < 3:
+            return list(points)
+        keep = [False] * n
+        keep[0] = keep[-1] = True
+        tol2 = tolerance * tolerance
+        stack = [(0, n - 1)]
+        while stack:
+            first, last = stack.pop()
+            ax, ay = points[2 * first], points[2 * first + 1]
+            bx, by = points[2 * last], points[2 * last + 1]
+            dx, dy = bx - ax, by - ay
+            seg2 = dx * dx + dy * dy
+            worst, worst_d2 = -1, tol2
+            for i in range(first + 1, last):
+                px, py = points[2 * i] - ax, points[2 * i + 1] - ay
+                if seg2:
+                    cross = px * dy - py * dx
+                    d2 = cross * cross / seg2
+                else:
+                    d2 = px * px + py * py
+                if d2 > worst_d2:
+                    worst, worst_d2 = i, d2
+            if worst >= 0:
+                keep[worst] = True
+                stack.append((first, worst))
+                stack.append((worst, last))
+        out = []
+        for i in range(n):
+            if keep[i]:
+                out.extend((points[2 * i], points[2 * i + 1]))
+        return out
+
+    def _extend_stroke(self, x, y):
+        try:
+            # Tk 8.6 appends to a line item in place
+            self.canvas.insert(self._stroke_item, 'end', (x, y))
+        except Exception:
+            self.canvas.coords(self._stroke_item, *self.canvas.coords(self._stroke_item), x, y)
 
     def _clamp_to_paper(self, x, y, paper_w, paper_h):
         x = int(x)
@@ -52,31 +196,67 @@ class Painter:
 
         x = int(x)
         y = int(y)
+        self._raw_samples += 1
+
+        if self.last_x is not None and self.last_y is not None:
+            ddx, ddy = (x - self.last_x) * self.view_scale, (y - self.last_y) * self.view_scale
+            if ddx * ddx + ddy * ddy < self.min_distance * self.min_distance:
+                return
 
         color = self.paper_fill if self.tool == "eraser" else self.color
+        s = self.view_scale
+
+        if self.tool == "soft brush":
+            self._paint_soft(x, y, color)
+            return
 
         if self.last_x is None or self.last_y is None:
             r = max(1, self.width / 2)
-            self.canvas.create_oval(x - r, y - r, x + r, y + r,
-                                    fill=color, outline=color, tags=("stroke",))
+            self._stroke_item = self.canvas.create_oval((x - r) * s, (y - r) * s, (x + r) * s, (y + r) * s,
+                                                        fill=color, outline=color, tags=("stroke",))
+            self._stroke = Stroke('oval', (x - r, y - r, x + r, y + r), fill=color, outline=color)
+            self._stroke_is_dot = True
+            self._stroke_points = [x, y]
+            self.items_created += 1
             try:
-                self.image_buffer.draw_ellipse([x - r, y - r, x + r, y + r], fill=color, outline=color)
+                self._raster(self.image_buffer.draw_ellipse, [x - r, y - r, x + r, y + r], fill=color, outline=color)
             except Exception:
                 pass
             self.last_x, self.last_y = x, y
             return
 
-        self.canvas.create_line(self.last_x, self.last_y, x, y,
-                                fill=color, width=self.width,
-                                capstyle=ROUND, joinstyle=ROUND, smooth=True,
-                                tags=("stroke",))
+        if self._stroke_item is None or self._stroke_is_dot:
+            if self._stroke_item is not None:
+                self.canvas.delete(self._stroke_item)
+            self._stroke_item = self.canvas.create_line(self.last_x * s, self.last_y * s, x * s, y * s,
+                                                        fill=color, width=self.width,
+                                                        capstyle=ROUND, joinstyle=ROUND,
+                                                        tags=("stroke",))
+            self._stroke = Stroke('line', (), fill=color, width=self.width)
+            self._stroke_is_dot = False
+            self.items_created += 1
+        else:
+            self._extend_stroke(x * s, y * s)
+        self._stroke_points.extend((x, y))
 
         try:
-            self.image_buffer.draw_line([self.last_x, self.last_y, x, y], fill=color, width=self.width)
+            self._raster(self.image_buffer.draw_line, [self.last_x, self.last_y, x, y], fill=color, width=int(self.width))
         except Exception:
-            try:
-                self.image_buffer.draw_line([self.last_x, self.last_y, x, y], fill=color, width=int(self.width))
-            except Exception:
-                pass
+            pass
 
         self.last_x, self.last_y = x, y
+
+    def _paint_soft(self, x, y, color):
+        if self.last_x is None or self.last_y is None:
+            self._raster(self.brush_engine.begin_stroke)
+            self.last_x, self.last_y = x, y
+            self._stroke_points = []
+        try:
+            self._raster(self.brush_engine.stamp_segment, self.image_buffer, self.last_x, self.last_y, x, y, color,
+                         self.width, self.hardness, self.opacity)
+        except Exception:
+            pass
+        self._stroke_points.extend((x, y))
+        self.last_x, self.last_y = x, y
+        if self.on_raster_change:
+            self.on_raster_change()
@@ -0,0 +1,67 @@
+import inspect
+import time
+
+
+class PluginContext:
+    """Handed to process_image by the host, for plugins that ask for it.
+
+    A plugin asks by naming a parameter 'context' (or 'ctx'):
+
+        def process_image(img, context=None):
+            for i, row in enumerate(rows):
+                if context and context.cancelled():
+                    return img
+                ...
+                if context:
+                    context.report((i + 1) / len(rows))
+
+    report(fraction) is cheap to call per row: updates are forwarded at
+    most every REPORT_INTERVAL seconds. cancelled() turns true as soon as
+    the user cancels; the host throws away whatever the plugin returns
+    then. scratch_bytes is a hint of how much temporary memory the plugin
+    may use, e.g. to size the bands it works in; a tile of a tiled run gets
+    a share of it.
+    """
+    PARAM_NAMES = ('context', 'ctx')
+    REPORT_INTERVAL = 0.05
+    DEFAULT_SCRATCH_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, on_report=None, should_cancel=None, scratch_bytes=DEFAULT_SCRATCH_BYTES):
+        self._on_report = on_report
+        self._should_cancel = should_cancel
+        self.scratch_bytes = scratch_bytes
+        self._last_report = 0.0
+
+    @classmethod
+    def parameter(cls, process_image):
+        """Name of the parameter process_image takes the context in, or None for plugins without one."""
+        try:
+            params = inspect.signature(process_image).parameters
+        except (TypeError, ValueError):
+            return None
+        for name in cls.PARAM_NAMES:
+            param = params.get(name)
+            if param is not None and param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY):
+                return name
+        return None
+
+    @classmethod
+    def call(cls, process_image, image, context):
+        """process_image(image), with context if the plugin takes one."""
+        name = cls.parameter(process_image)
+        if name is None:
+            return process_image(image)
+        return process_image(image, **{name: context})
+
+    def report(self, fraction):
+        """Progress of the plugin's own work, 0.0 to 1.0."""
+        if self._on_report is None:
+            return
+        now = time.monotonic()
+        if fraction < 1.0 and now - self._last_report < self.REPORT_INTERVAL:
+            return
+        self._last_report = now
+        self._on_report(min(1.0, max(0.0, float(fraction))))
+
+    def cancelled(self):
+        return bool(self._should_cancel is not None and self._should_cancel())
@@ -13,8 +13,22 @@ class PluginEditor:
         self.template = '''from PIL import Image
 
 PLUGIN_NAME = "Plugin"
+# Необязательное описание плагина: по нему выбирается способ запуска
+# (в том же потоке, по тайлам в потоках, в отдельном процессе).
+# PLUGIN_MANIFEST = {
+#     'kind': 'local',        # 'pointwise', 'local' (пиксель зависит от соседей
+#                             # не дальше radius) или 'global'
+#     'radius': 1,
+#     'cost_per_mp': 0.05,    # секунд на мегапиксель на одном ядре
+#     'in_place_safe': True,  # не изменяет входное изображение
+#     'modes': ('RGB',),      # допустимые режимы, первый - предпочтительный
+#     'thread_safe': True,
+#     'process_safe': True,
+# }
 
-def process_image(img: Image.Image) -> Image.Image:
+# Параметр context необязателен: context.report(доля от 0 до 1) двигает
+# индикатор прогресса, context.cancelled() становится True после отмены.
+def process_image(img: Image.Image, context=None) -> Image.Image:
     """Обработка изображения"""
     return img
 '''
@@ -0,0 +1,67 @@
+class PluginManifest:
+    """What a plugin declares about itself, from an optional PLUGIN_MANIFEST dict.
+
+        PLUGIN_MANIFEST = {
+            'kind': 'local',          # 'pointwise', 'local' or 'global'
+            'radius': 1,              # neighbourhood of a 'local' plugin, in pixels
+            'cost_per_mp': 0.08,      # seconds per megapixel on one core
+            'preserves_size': True,   # the result has the size of the input
+            'in_place_safe': True,    # never modifies its input image
+            'modes': ('RGB', 'L'),    # accepted input modes, the first one is preferred
+            'thread_safe': True,      # may run on several tiles at once in one process
+            'process_safe': True,     # may run in a worker process
+        }
+
+    Every key is optional. A plugin without a manifest is treated as a
+    global filter of unknown (so: high) cost that may modify its input;
+    the older PLUGIN_LOCAL_RADIUS constant still marks a local filter.
+    """
+    KINDS = ('pointwise', 'local', 'global')
+
+    def __init__(self, kind='global', radius=None, cost_per_mp=None, preserves_size=None,
+                 in_place_safe=False, modes=None, thread_safe=False, process_safe=True):
+        if kind not in self.KINDS:
+            raise ValueError(f'unknown plugin kind {kind!r}, expected one of {self.KINDS}')
+        if kind == 'pointwise':
+            radius = 0
+        if kind == 'local' and (not isinstance(radius, int) or isinstance(radius, bool) or radius < 0):
+            raise ValueError('a local plugin needs a non-negative integer radius')
+        self.kind = kind
+        self.radius = radius if kind != 'global' else None
+        self.cost_per_mp = float(cost_per_mp) if cost_per_mp is not None else None
+        self.preserves_size = (kind != 'global') if preserves_size is None else bool(preserves_size)
+        self.in_place_safe = bool(in_place_safe)
+        self.modes = tuple(modes) if modes else None
+        self.thread_safe = bool(thread_safe)
+        self.process_safe = bool(process_safe)
+
+    @classmethod
+    def from_module(cls, module):
+        """Manifest of a plugin module; an invalid manifest falls back to the defaults."""
+        declared = getattr(module, 'PLUGIN_MANIFEST', None)
+        if isinstance(declared, dict):
+            try:
+                return cls(**declared)
+            except (TypeError, ValueError):
+                pass
+        radius = getattr(module, 'PLUGIN_LOCAL_RADIUS', None)
+        if isinstance(radius, int) and not isinstance(radius, bool) and radius >= 0:
+            return cls(kind='local', radius=radius)
+        return cls()
+
+    @property
+    def tileable(self):
+        """Every output pixel depends only on a bounded neighbourhood, so tiles with a halo give the exact result."""
+        return self.kind != 'global' and self.preserves_size
+
+    def estimate(self, size):
+        """Expected run time in seconds on an image of size, or None if the plugin does not say."""
+        if self.cost_per_mp is None:
+            return None
+        return self.cost_per_mp * size[0] * size[1] / 1e6
+
+    def prepare(self, image):
+        """image in a mode the plugin accepts."""
+        if self.modes and image.mode not in self.modes:
+            return image.convert(self.modes[0])
+        return image
@@ -0,0 +1,229 @@
+import importlib.util
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from multiprocessing import shared_memory
+from PIL import Image
+from .PluginContext import PluginContext
+
+
+def load_plugin(path, cache):
+    """process_image of the plugin file at path, re-imported when the file changes."""
+    mtime = os.path.getmtime(path)
+    entry = cache.get(path)
+    if entry is None or entry[0] != mtime:
+        name = 'paint_plugin_' + os.path.splitext(os.path.basename(path))[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        entry = cache[path] = (mtime, module.process_image)
+    return entry[1]
+
+
+def share_image(image):
+    """Copy image's pixels into a new shared memory block (the caller unlinks it)."""
+    data = image.tobytes()
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+    shm.buf[:len(data)] = data
+    return shm
+
+
+def _read_shared(name, mode, size):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return Image.frombuffer(mode, size, shm.buf, 'raw', mode, 0, 1).copy()
+    finally:
+        shm.close()
+
+
+def _worker_main(tasks, results, cancel):
+    """Worker process loop: run plugin chains on images handed over in shared memory."""
+    modules = {}
+    while True:
+        job = tasks.get()
+        if job is None:
+            break
+        name, mode, size, plugins = job
+        try:
+            image = _read_shared(name, mode, size)
+            errors = {}
+            for i, (plugin, path) in enumerate(plugins):
+                if cancel.is_set():
+                    break
+                # fractions the plugin reports arrive as progress within its step of the chain
+                context = PluginContext(on_report=lambda f, i=i: results.put(('progress', i + f, len(plugins))),
+                                        should_cancel=cancel.is_set)
+                try:
+                    out = PluginContext.call(load_plugin(path, modules), image, context)
+                    if out is not None:
+                        image = out
+                except Exception:
+                    errors[plugin] = traceback.format_exc()
+                results.put(('progress', i + 1, len(plugins)))
+            if cancel.is_set():
+                results.put(('cancelled', errors))
+                continue
+            if image.mode not in ('L', 'RGB', 'RGBA'):
+                image = image.convert('RGB')
+            shm = share_image(image)
+            results.put(('done', shm.name, image.mode, image.size, errors))
+            shm.close()
+        except Exception:
+            results.put(('error', traceback.format_exc()))
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.cancel = ctx.Event()
+        self.process = ctx.Process(target=_worker_main, args=(self.tasks, self.results, self.cancel),
+                                   name='paint-plugin-worker', daemon=True)
+        self.process.start()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def stop(self):
+        try:
+            self.tasks.put(None)
+        except Exception:
+            pass
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        except Exception:
+            pass
+
+
+class PluginProcessPool:
+    """Warm pool of worker processes that run plugin chains off the GIL.
+
+    Images travel both ways through multiprocessing.shared_memory, only the
+    block name, mode and size are pickled. Each worker has its own task and
+    result queues: run() hands a chain to an idle worker and reads progress
+    and the result back on the calling thread (block it on a background
+    thread, never the Tk one). Plugins are imported by file path inside the
+    worker and kept while the file is unchanged.
+
+    Cancelling asks the worker to stop between plugins, and plugins that take
+    a PluginContext see it in context.cancelled(); a worker stuck inside a
+    plugin is killed after KILL_AFTER seconds and replaced. A worker that
+    dies inside a plugin (crash, os._exit) is replaced too and reported as
+    that plugin's error: its code is never retried in this process.
+    """
+    KILL_AFTER = 2.0
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, size=None):
+        self.size = size or max(1, min(2, (os.cpu_count() or 2) - 1))
+        self._ctx = multiprocessing.get_context('spawn')  # fork is unsafe with Tk and our threads
+        self._idle = []
+        self._count = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def start(self):
+        """Spawn the workers now so the first run does not pay for process start-up."""
+        with self._cond:
+            while self._count < self.size:
+                self._idle.append(_Worker(self._ctx))
+                self._count += 1
+
+    def shutdown(self):
+        with self._cond:
+            for worker in self._idle:
+                worker.stop()
+            self._idle = []
+            self._count = 0
+
+    def _acquire(self):
+        with self._cond:
+            while not self._idle and self._count >= self.size:
+                self._cond.wait()
+            if self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+                self._count -= 1
+            self._count += 1
+        return _Worker(self._ctx)
+
+    def _release(self, worker, broken=False):
+        with self._cond:
+            if broken:
+                self._count -= 1
+            else:
+                self._idle.append(worker)
+            self._cond.notify()
+        if broken:
+            worker.kill()
+
+    def run(self, image, plugins, on_progress=None, should_cancel=None):
+        """Run plugins [(name, path)] over image in a worker process.
+
+        Returns (result image or None, cancelled, {plugin name: traceback}).
+        on_progress(done, total) is called on this thread. Raises if no
+        worker process can be started.
+        """
+        plugins = list(plugins)
+        worker = self._acquire()
+        shm = share_image(image)
+        broken = False
+        try:
+            worker.cancel.clear()
+            worker.tasks.put((shm.name, image.mode, image.size, plugins))
+            deadline = None
+            done = 0  # plugins finished so far: the next one is running
+            while True:
+                if deadline is None and should_cancel is not None and should_cancel():
+                    worker.cancel.set()
+                    deadline = time.monotonic() + self.KILL_AFTER
+                if deadline is not None and time.monotonic() > deadline:
+                    broken = True  # stuck inside a plugin
+                    return None, True, {}
+                try:
+                    msg = worker.results.get(timeout=0.1)
+                except queue.Empty:
+                    if not worker.alive():
+                        broken = True
+                        if deadline is not None:
+                            return None, True, {}
+                        name = plugins[min(done, len(plugins) - 1)][0]
+                        return None, False, {name: f'plugin worker process exited (exit code {worker.process.exitcode})'}
+                    continue
+                kind = msg[0]
+                if kind == 'progress':
+                    done = int(msg[1])
+                    if on_progress is not None:
+                        on_progress(msg[1], msg[2])
+                elif kind == 'cancelled':
+                    return None, True, msg[1]
+                elif kind == 'done':
+                    _, name, mode, size, errors = msg
+                    out = shared_memory.SharedMemory(name=name)
+                    try:
+                        result = Image.frombuffer(mode, size, out.buf, 'raw', mode, 0, 1).copy()
+                    finally:
+                        out.close()
+                        out.unlink()
+                    return result, False, errors
+                else:
+                    # the worker failed around the plugins (reading the image, sharing the result)
+                    return None, False, {plugins[-1][0]: msg[1]}
+        finally:
+            shm.close()
+            shm.unlink()
+            self._release(worker, broken)
@@ -0,0 +1,127 @@
+import ast
+import importlib.util
+import os
+import sys
+import threading
+import traceback
+
+
+def read_metadata(path):
+    """What a plugin file declares, read from its syntax tree without running it.
+
+    Returns {'name': PLUGIN_NAME or None, 'params': process_image argument
+    names or None if it is not defined with def, 'constants': other
+    upper-case literal assignments}. Raises OSError or SyntaxError. This is
+    for listing only: process_image may also be bound by assignment or
+    import, so whether a file is a plugin is decided on the imported module.
+    """
+    with open(path, 'rb') as fh:
+        tree = ast.parse(fh.read(), filename=path)
+    meta = {'name': None, 'params': None, 'constants': {}}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == 'process_image':
+            args = node.args
+            meta['params'] = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if not isinstance(target, ast.Name) or not target.id.isupper() or node.value is None:
+                    continue
+                try:
+                    value = ast.literal_eval(node.value)
+                except ValueError:
+                    continue  # computed at import time: only the module knows it
+                if target.id in ('PLUGIN_NAME', 'NAME'):
+                    meta['name'] = meta['name'] or str(value)
+                else:
+                    meta['constants'][target.id] = value
+    return meta
+
+
+class PluginRegistry:
+    """Process-wide registry of plugin files, shared by every window.
+
+    Metadata (display name, process_image signature, literal constants) is
+    read statically, so listing plugins never imports them. Modules are
+    imported on first use under a stable name and kept until the file's
+    mtime or size changes; an import error is kept the same way, so a
+    broken file is not re-run on every refresh.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self._meta = {}  # abspath -> (signature, metadata or None, error or None)
+        self._modules = {}  # abspath -> (signature, module or None, traceback or None)
+        self._lock = threading.RLock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def files(plugins_dir):
+        """Plugin file names in plugins_dir."""
+        return sorted(f for f in os.listdir(plugins_dir) if f.endswith('.py') and not f.startswith('__'))
+
+    def metadata(self, path):
+        """(metadata dict or None, error text or None) of the plugin file at path."""
+        path = os.path.abspath(path)
+        try:
+            sig = self._signature(path)
+        except OSError as e:
+            return None, str(e)
+        with self._lock:
+            entry = self._meta.get(path)
+            if entry is None or entry[0] != sig:
+                try:
+                    entry = (sig, read_metadata(path), None)
+                except Exception:
+                    entry = (sig, None, traceback.format_exc())
+                self._meta[path] = entry
+            return entry[1], entry[2]
+
+    def display_name(self, path):
+        meta, _ = self.metadata(path)
+        return (meta and meta['name']) or os.path.splitext(os.path.basename(path))[0]
+
+    def module(self, path):
+        """(module or None, traceback or None) of the plugin file at path, imported only if it changed."""
+        path = os.path.abspath(path)
+        try:
+            sig = self._signature(path)
+        except OSError:
+            return None, traceback.format_exc()
+        with self._lock:
+            entry = self._modules.get(path)
+            if entry is None or entry[0] != sig:
+                entry = (sig,) + self._import(path)
+                self._modules[path] = entry
+            return entry[1], entry[2]
+
+    @staticmethod
+    def _import(path):
+        name = 'paint_plugin_' + os.path.splitext(os.path.basename(path))[0]
+        try:
+            spec = importlib.util.spec_from_file_location(name, path)
+            if spec is None or spec.loader is None:
+                return None, f'{path} is not an importable module'
+            module = importlib.util.module_from_spec(spec)
+            # reloading replaces the previous module of this file instead of adding one
+            sys.modules[name] = module
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                sys.modules.pop(name, None)
+                raise
+            return module, None
+        except Exception:
+            return None, traceback.format_exc()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from PIL import Image
+
+
+class PluginResultCache:
+    """Content-addressed cache of plugin chain results, one entry per chain prefix.
+
+    The key of stage i is hash(key of stage i-1, hash of plugin i's file);
+    stage 0 is the hash of the input pixels and of the app's own code
+    (engine_digest), which plugins may import: entries spilled to disk by
+    an older version of the app are never served. Toggling a plugin or
+    editing its file only invalidates the stages from that plugin on.
+    Entries live in a byte-bounded LRU; evicted entries are spilled to
+    spill_dir (if given), itself bounded by disk_budget_bytes, and promoted
+    back on a hit. Cached images are shared: treat them as read-only.
+
+    Each entry also keeps the run time of its whole prefix. Statistics:
+    hits (lookups served from the cache), misses (stages that had to run)
+    and saved_seconds (prefix run time of the hits).
+    """
+    DEFAULT_BUDGET = 256 * 1024 * 1024
+    DEFAULT_DISK_BUDGET = 1024 * 1024 * 1024
+    SPILL_EXT = '.pmdc'
+    _shared = None
+    _shared_lock = threading.Lock()
+    _engine_digest = None
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET, spill_dir=None, disk_budget_bytes=DEFAULT_DISK_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.spill_dir = spill_dir
+        self.disk_budget_bytes = disk_budget_bytes
+        self._entries = OrderedDict()  # key -> (image, nbytes, seconds), least recently used first
+        self._disk = OrderedDict()  # key -> file size, oldest first
+        self._digests = {}  # (path, mtime_ns, size) -> file hash
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if spill_dir:
+            self._scan_spill_dir()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(spill_dir=os.path.join(os.path.expanduser('~'), '.paint_mdi', 'plugin_cache'))
+            return cls._shared
+
+    # --- keys ---
+
+    @classmethod
+    def engine_digest(cls):
+        """Hash of the app's Python sources except the plugins (hashed one by one in plugin_digest)."""
+        if cls._engine_digest is None:
+            root = os.path.normpath(os.path.join(os.path.dirname(__file__), '..'))
+            plugins = os.path.join(root, 'plugins')
+            h = hashlib.sha256()
+            for directory, dirs, files in os.walk(root):
+                dirs[:] = sorted(d for d in dirs if d != '__pycache__' and os.path.join(directory, d) != plugins)
+                for name in sorted(f for f in files if f.endswith('.py')):
+                    path = os.path.join(directory, name)
+                    h.update(os.path.relpath(path, root).encode('utf-8') + b'\0')
+                    try:
+                        with open(path, 'rb') as fh:
+                            h.update(fh.read())
+                    except OSError:
+                        pass
+            cls._engine_digest = h.hexdigest()
+        return cls._engine_digest
+
+    @classmethod
+    def image_key(cls, image):
+        h = hashlib.blake2b(digest_size=20)
+        h.update(cls.engine_digest().encode('ascii'))
+        h.update(f'{image.mode}:{image.width}x{image.height}:'.encode('ascii'))
+        h.update(image.tobytes())
+        return h.hexdigest()
+
+    def plugin_digest(self, path):
+        st = os.stat(path)
+        sig = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        digest = self._digests.get(sig)
+        if digest is None:
+            with open(path, 'rb') as fh:
+                digest = self._digests[sig] = hashlib.sha256(fh.read()).hexdigest()
+        return digest
+
+    @staticmethod
+    def stage_key(prev_key, plugin_digest):
+        return hashlib.blake2b((prev_key + plugin_digest).encode('ascii'), digest_size=20).hexdigest()
+
+    # --- lookup ---
+
+    def get(self, key):
+        """(cached result, prefix run time) for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                entry = self._load_spilled(key)
+                if entry is None:
+                    return None
+                self._insert(key, entry)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0], entry[2]
+
+    def put(self, key, image, seconds):
+        """Store the result of a stage that just ran (a miss); seconds: run time of its whole prefix."""
+        nbytes = len(image.getbands()) * image.width * image.height
+        with self._lock:
+            self.misses += 1
+            self._insert(key, (image, nbytes, seconds))
+
+    def _insert(self, key, entry):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        if entry[1] > self.budget_bytes:
+            self._spill(key, entry)
+            return
+        self._entries[key] = entry
+        self.bytes += entry[1]
+        while self.bytes > self.budget_bytes and self._entries:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self.bytes -= old_entry[1]
+            self._spill(old_key, old_entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.bytes, 'disk_entries': len(self._disk),
+                    'disk_bytes': self.disk_bytes, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': (self.hits / total) if total else 0.0, 'saved_seconds': self.saved_seconds}
+
+    # --- disk spill ---
+
+    def _spill_path(self, key):
+        return os.path.join(self.spill_dir, key + self.SPILL_EXT)
+
+    def _scan_spill_dir(self):
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            names = [n for n in os.listdir(self.spill_dir) if n.endswith(self.SPILL_EXT)]
+            paths = sorted((os.path.join(self.spill_dir, n) for n in names), key=os.path.getmtime)
+        except OSError:
+            return
+        for path in paths:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            self._disk[os.path.basename(path)[:-len(self.SPILL_EXT)]] = size
+            self.disk_bytes += size
+        self._trim_disk()
+
+    def _spill(self, key, entry):
+        if not self.spill_dir or key in self._disk:
+            return
+        image, _, seconds = entry
+        header = json.dumps({'mode': image.mode, 'size': list(image.size), 'seconds': seconds}).encode('utf-8')
+        path = self._spill_path(key)
+        try:
+            with open(path + '.tmp', 'wb') as fh:
+                fh.write(header + b'\n')
+                fh.write(zlib.compress(image.tobytes(), 1))
+            os.replace(path + '.tmp', path)
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self._disk[key] = size
+        self.disk_bytes += size
+        self._trim_disk()
+
+    def _trim_disk(self):
+        while self.disk_bytes > self.disk_budget_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self.disk_bytes -= size
+            try:
+                os.unlink(self._spill_path(key))
+            except OSError:
+                pass
+
+    def _load_spilled(self, key):
+        if key not in self._disk:
+            return None
+        try:
+            with open(self._spill_path(key), 'rb') as fh:
+                header = json.loads(fh.readline().decode('utf-8'))
+                image = Image.frombytes(header['mode'], tuple(header['size']), zlib.decompress(fh.read()))
+        except Exception:
+            self.disk_bytes -= self._disk.pop(key)
+            return None
+        self._disk.move_to_end(key)
+        return (image, len(image.getbands()) * image.width * image.height, header.get('seconds', 0.0))
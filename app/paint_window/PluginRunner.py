@@ -0,0 +1,141 @@
+import threading
+import time
+import traceback
+from .PluginContext import PluginContext
+from .PluginManifest import PluginManifest
+from .PluginProcessPool import PluginProcessPool
+from .TiledPluginRunner import TiledPluginRunner
+
+
+class PluginRunner:
+    """Runs a plugin chain stage by stage for a window.
+
+    Every stage result is memoised in a PluginResultCache, so a rerun
+    resumes after the longest cached prefix of the chain. Each stage runs
+    with the strategy its manifest and the image size call for (choose()):
+
+        'inline'   in the calling thread; plugins expected to take under
+                   INLINE_SECONDS never pay for threads or processes
+        'thread'   tile by tile on a thread pool (thread-safe local filters)
+        'process'  in a warm worker process
+        'tiled'    tile by tile on the worker processes (local filters)
+
+    Processes are used for plugins expected to take PROCESS_MIN_SECONDS or
+    more (or of unknown cost) when use_process is on, and for any plugin
+    that is not cheap when run() is called on the Tk (main) thread. A
+    strategy that is not available falls back to the next one down the
+    list, and finally to inline. run() blocks: call it from a background
+    thread. strategies maps each plugin that ran to the strategy it got.
+    """
+    INLINE_SECONDS = 0.02
+    PROCESS_MIN_SECONDS = 0.5
+
+    def __init__(self, use_process=True, cache=None):
+        self.use_process = use_process
+        self.cache = cache
+        self.strategies = {}
+
+    def choose(self, manifest, size, on_ui_thread=False):
+        """Strategy for a plugin with manifest on an image of size."""
+        estimate = manifest.estimate(size)
+        if estimate is not None and estimate <= self.INLINE_SECONDS:
+            return 'inline'
+        several_tiles = size[0] * size[1] > TiledPluginRunner.TILE_SIZE ** 2
+        heavy = estimate is None or estimate >= self.PROCESS_MIN_SECONDS
+        if manifest.process_safe and ((heavy and self.use_process) or on_ui_thread):
+            return 'tiled' if manifest.tileable and several_tiles else 'process'
+        if manifest.tileable and manifest.thread_safe and several_tiles:
+            return 'thread'
+        return 'inline'
+
+    def run(self, image, stages, on_progress=None, on_tile=None, should_cancel=None):
+        """Run stages [(name, path, module)] over image.
+
+        Returns (result, cancelled, {plugin name: traceback}). The result is
+        a new image the caller may modify; None if cancelled.
+        """
+        should_cancel = should_cancel or (lambda: False)
+        n = len(stages)
+        keys = self._keys(image, stages)
+        start, current, seconds = 0, image, 0.0
+        if keys is not None:
+            for i in range(n, 0, -1):
+                hit = self.cache.get(keys[i])
+                if hit is not None:
+                    start, (current, seconds) = i, hit
+                    break
+        failed = {}
+        for i in range(start, n):
+            if should_cancel():
+                return None, True, failed
+            name, path, module = stages[i]
+            progress = None
+            if on_progress is not None:
+                progress = lambda done, total, i=i: on_progress(i + (done / total if total else 1.0), n)
+            t0 = time.perf_counter()
+            out, cancelled, errors = self._run_stage(name, path, module, current, progress, on_tile, should_cancel)
+            if cancelled:
+                return None, True, failed
+            failed.update(errors)
+            seconds += time.perf_counter() - t0
+            # a key covers the whole prefix: once a stage failed, later results would hide its error on a hit
+            if keys is not None and not failed:
+                self.cache.put(keys[i + 1], out, seconds)
+            current = out
+            if on_progress is not None:
+                on_progress(i + 1, n)
+        return current.copy(), False, failed
+
+    def _keys(self, image, stages):
+        if self.cache is None:
+            return None
+        try:
+            keys = [self.cache.image_key(image)]
+            for _, path, _ in stages:
+                keys.append(self.cache.stage_key(keys[-1], self.cache.plugin_digest(path)))
+            return keys
+        except OSError:
+            return None  # a plugin file is gone: run uncached
+
+    def _run_stage(self, name, path, module, image, on_progress, on_tile, should_cancel):
+        manifest = PluginManifest.from_module(module)
+        image = manifest.prepare(image)
+        strategy = self.choose(manifest, image.size, threading.current_thread() is threading.main_thread())
+        self.strategies[name] = strategy
+        if strategy == 'tiled':
+            try:
+                out, cancelled, errors = TiledPluginRunner.shared().run(
+                    image, [(name, path)], manifest.radius, on_tile=on_tile, on_progress=on_progress,
+                    should_cancel=should_cancel)
+                # on a plugin error the whole-image run below reports it as usual
+                if out is not None or cancelled:
+                    return out, cancelled, errors
+            except Exception:
+                pass
+        if strategy in ('tiled', 'process'):
+            try:
+                out, cancelled, errors = PluginProcessPool.shared().run(
+                    image, [(name, path)], on_progress=on_progress, should_cancel=should_cancel)
+                # a plugin that crashed its worker is reported, never retried in this process
+                return (out if out is not None else image), cancelled, errors
+            except Exception:
+                pass  # no worker process could be started: run in this thread
+        if strategy == 'thread':
+            try:
+                out, cancelled, errors = TiledPluginRunner.shared().run_threads(
+                    image, name, module.process_image, manifest.radius, on_tile=on_tile,
+                    on_progress=on_progress, should_cancel=should_cancel)
+                if out is not None or cancelled:
+                    return out, cancelled, errors
+            except Exception:
+                pass
+        context = PluginContext(on_report=(lambda f: on_progress(f, 1.0)) if on_progress else None,
+                                should_cancel=should_cancel)
+        # the input may be a cached result: copy it unless the plugin promises not to modify it
+        work = image if manifest.in_place_safe else image.copy()
+        try:
+            out = PluginContext.call(module.process_image, work, context)
+            # None: the plugin edited its argument in place
+            return (out if out is not None else work), should_cancel(), {}
+        except Exception:
+            return image, False, {name: traceback.format_exc()}
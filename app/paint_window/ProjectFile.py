@@ -0,0 +1,142 @@
+import json
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from PIL import Image
+from .StrokeStore import Stroke
+
+
+class ProjectFile:
+    """Native project file (.pmdi): raster tiles, stroke log and window settings.
+
+    Layout: a fixed preamble (magic, version, offset and length of the
+    index), then the chunks, then the index. The index is zlib-compressed
+    JSON holding the document size, tile size, settings and the offset and
+    length of every chunk, so a reader only has to load the index and can
+    fetch tiles one by one afterwards. Tiles are zlib-compressed raw RGB;
+    tiles that are plain paper colour are not stored. Strokes are two
+    chunks: their properties as JSON and all coordinates as one packed
+    little-endian float32 array.
+    """
+    MAGIC = b'PMDI'
+    VERSION = 1
+    EXTENSION = '.pmdi'
+    _PREAMBLE = struct.Struct('<4sHHQI')
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, 'rb')
+        self._lock = threading.Lock()
+        try:
+            magic, version, _, index_offset, index_length = self._PREAMBLE.unpack(self._fh.read(self._PREAMBLE.size))
+            if magic != self.MAGIC:
+                raise ValueError('not a Paint-MDI project file')
+            if version > self.VERSION:
+                raise ValueError(f'project file version {version} is newer than this program')
+            index = json.loads(zlib.decompress(self._read(index_offset, index_length)).decode('utf-8'))
+        except Exception:
+            self._fh.close()
+            raise
+        self.width = index['width']
+        self.height = index['height']
+        self.tile_size = index['tile_size']
+        self.paper_fill = index['paper_fill']
+        self.settings = index.get('settings', {})
+        self._chunks = index.get('chunks', {})
+        self._tiles = {(tx, ty): (offset, length) for tx, ty, offset, length in index.get('tiles', [])}
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def close(self):
+        with self._lock:
+            self._fh.close()
+
+    def _read(self, offset, length):
+        self._fh.seek(offset)
+        return self._fh.read(length)
+
+    def tile_keys(self):
+        """Keys of the stored (non-paper) tiles."""
+        return list(self._tiles)
+
+    def read_tile(self, key):
+        """Decoded tile image, or None if the tile is plain paper. Safe to call from any thread."""
+        entry = self._tiles.get(key)
+        if entry is None:
+            return None
+        with self._lock:
+            data = self._read(*entry)
+        x0, y0 = key[0] * self.tile_size, key[1] * self.tile_size
+        w, h = min(self.width, x0 + self.tile_size) - x0, min(self.height, y0 + self.tile_size) - y0
+        return Image.frombytes('RGB', (w, h), zlib.decompress(data))
+
+    def read_image(self):
+        """The whole raster at once."""
+        image = Image.new('RGB', self.size, self.paper_fill)
+        for key in self._tiles:
+            image.paste(self.read_tile(key), (key[0] * self.tile_size, key[1] * self.tile_size))
+        return image
+
+    def read_strokes(self):
+        if 'strokes' not in self._chunks:
+            return []
+        with self._lock:
+            meta = json.loads(zlib.decompress(self._read(*self._chunks['strokes'])).decode('utf-8'))
+            coords = array('f', zlib.decompress(self._read(*self._chunks['stroke_coords'])))
+        if sys.byteorder == 'big':
+            coords.byteswap()
+        strokes, pos = [], 0
+        for kind, fill, outline, width, text, n in meta:
+            strokes.append(Stroke(kind, coords[pos:pos + n], fill=fill, outline=outline, width=width, text=text))
+            pos += n
+        return strokes
+
+    @classmethod
+    def write(cls, fh, tiles, size, tile_size, paper_fill, strokes, settings):
+        """Write a project to the seekable binary file fh.
+
+        tiles: {(tx, ty): RGB tile image}; tiles missing from it, or plain
+        paper_fill, are stored as paper.
+        """
+        paper = Image.new('RGB', (1, 1), paper_fill).getpixel((0, 0))
+        paper_extrema = tuple((v, v) for v in paper)
+        fh.write(cls._PREAMBLE.pack(cls.MAGIC, cls.VERSION, 0, 0, 0))
+        offset = cls._PREAMBLE.size
+
+        def chunk(data):
+            nonlocal offset
+            fh.write(data)
+            start, offset = offset, offset + len(data)
+            return [start, len(data)]
+
+        tile_index = []
+        for key in sorted(tiles, key=lambda k: (k[1], k[0])):
+            tile = tiles[key]
+            if tile.getextrema() == paper_extrema:
+                continue
+            tile_index.append([key[0], key[1]] + chunk(zlib.compress(tile.convert('RGB').tobytes(), 1)))
+
+        chunks = {}
+        if strokes:
+            meta, coords = [], array('f')
+            for s in strokes:
+                meta.append([s.kind, s.fill, s.outline, s.width, s.text, len(s.coords)])
+                coords.extend(s.coords)
+            if sys.byteorder == 'big':
+                coords.byteswap()
+            chunks['strokes'] = chunk(zlib.compress(json.dumps(meta).encode('utf-8'), 6))
+            chunks['stroke_coords'] = chunk(zlib.compress(coords.tobytes(), 6))
+
+        index = zlib.compress(json.dumps({
+            'width': size[0], 'height': size[1], 'tile_size': tile_size, 'paper_fill': paper_fill,
+            'settings': settings, 'chunks': chunks, 'tiles': tile_index,
+        }).encode('utf-8'), 6)
+        index_offset = offset
+        fh.write(index)
+        fh.seek(0)
+        fh.write(cls._PREAMBLE.pack(cls.MAGIC, cls.VERSION, 0, index_offset, len(index)))
+        fh.seek(0, 2)
@@ -0,0 +1,60 @@
+import queue
+import threading
+
+
+class RasterWorker:
+    """Background thread that applies queued raster jobs to the image buffer, in order.
+
+    The Tk thread only queues work (`submit`). Anything that reads or
+    rewrites the buffer as a whole must call `flush()` first; short reads
+    that don't need the queue drained (display refresh) hold `lock` instead.
+    `on_drained` is called from the worker thread whenever the queue empties.
+    """
+    def __init__(self, on_drained=None):
+        self.lock = threading.RLock()
+        self.on_drained = on_drained
+        self._queue = queue.Queue()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='raster-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        if self._stopped:
+            with self.lock:
+                fn(*args, **kwargs)
+            return
+        self._queue.put((fn, args, kwargs))
+
+    def flush(self):
+        """Block until every job submitted so far has been drawn."""
+        if threading.current_thread() is self._thread:
+            return
+        self._queue.join()
+
+    def pending(self):
+        return self._queue.unfinished_tasks
+
+    def stop(self):
+        if not self._stopped:
+            self._stopped = True
+            self._queue.put(None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                break
+            fn, args, kwargs = job
+            try:
+                with self.lock:
+                    fn(*args, **kwargs)
+            except Exception:
+                pass
+            finally:
+                self._queue.task_done()
+            if self.on_drained and self._queue.empty():
+                try:
+                    self.on_drained()
+                except Exception:
+                    pass
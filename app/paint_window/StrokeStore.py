@@ -0,0 +1,121 @@
+from array import array
+from PIL import Image, ImageDraw
+
+
+class Stroke:
+    """One piece of vector content (freehand line, shape or text) in document coordinates."""
+    __slots__ = ('kind', 'coords', 'fill', 'outline', 'width', 'text', 'item')
+
+    def __init__(self, kind, coords, fill='', outline='', width=1, text=None):
+        self.kind = kind  # 'line', 'oval', 'rectangle' or 'text'
+        self.coords = array('f', coords)
+        self.fill = fill
+        self.outline = outline
+        self.width = width
+        self.text = text
+        self.item = None  # canvas item id while the stroke is on the canvas
+
+    def copy(self):
+        return Stroke(self.kind, self.coords, self.fill, self.outline, self.width, self.text)
+
+    def canvas_options(self):
+        if self.kind == 'line':
+            return {'fill': self.fill, 'width': self.width, 'capstyle': 'round', 'joinstyle': 'round'}
+        if self.kind == 'text':
+            return {'text': self.text, 'fill': self.fill, 'anchor': 'nw'}
+        return {'fill': self.fill, 'outline': self.outline, 'width': self.width}
+
+
+class StrokeStore:
+    """Retained list of the window's vector content, in stacking order.
+
+    This is the source of truth for strokes: export and undo read it
+    instead of querying the Tk canvas item by item. The canvas only mirrors
+    it (at view scale) for display.
+    """
+    def __init__(self):
+        self._strokes = {}  # canvas item -> Stroke, oldest first
+
+    def __len__(self):
+        return len(self._strokes)
+
+    def __iter__(self):
+        return iter(list(self._strokes.values()))
+
+    def add(self, stroke):
+        self._strokes[stroke.item] = stroke
+        return stroke
+
+    def get(self, item):
+        return self._strokes.get(item)
+
+    def remove(self, item):
+        return self._strokes.pop(item, None)
+
+    def clear(self):
+        """Drop every stroke and return them (oldest first)."""
+        removed = list(self._strokes.values())
+        self._strokes.clear()
+        return removed
+
+    def scale(self, sx, sy):
+        for stroke in self._strokes.values():
+            c = stroke.coords
+            for i in range(0, len(c) - 1, 2):
+                c[i] *= sx
+                c[i + 1] *= sy
+
+    def draw_on(self, canvas, stroke, scale=1.0):
+        """Create the canvas item for stroke at view scale and register it."""
+        coords = [v * scale for v in stroke.coords]
+        create = getattr(canvas, 'create_' + stroke.kind)
+        stroke.item = create(*coords, tags=('stroke',), **stroke.canvas_options())
+        return self.add(stroke)
+
+    def bbox(self):
+        """(x0, y0, x1, y1) document pixels covered by the strokes, or None if there are none."""
+        box = None
+        measure = None
+        for stroke in self._strokes.values():
+            c = stroke.coords
+            if len(c) < 2:
+                continue
+            if stroke.kind == 'text':
+                if measure is None:
+                    measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+                try:
+                    b = measure.textbbox((c[0], c[1]), stroke.text or '')
+                except Exception:
+                    continue
+            else:
+                pad = int(stroke.width) // 2 + 2
+                xs, ys = c[0::2], c[1::2]
+                b = (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+            box = b if box is None else (min(box[0], b[0]), min(box[1], b[1]), max(box[2], b[2]), max(box[3], b[3]))
+        return box
+
+    def render(self, image, origin=(0, 0)):
+        """Draw every stroke onto a PIL image (document pixels); origin: document position of its top-left."""
+        draw = ImageDraw.Draw(image)
+        ox, oy = origin
+        for stroke in self._strokes.values():
+            try:
+                pts = tuple(int(round(v)) - (oy if i % 2 else ox) for i, v in enumerate(stroke.coords))
+                if not pts:
+                    continue
+                if stroke.kind == 'line':
+                    width = int(stroke.width)
+                    draw.line(pts, fill=stroke.fill, width=width, joint='curve' if len(pts) > 4 else None)
+                    if width > 2:
+                        # lines are drawn with round caps on the canvas
+                        r = width / 2
+                        for ex, ey in (pts[:2], pts[-2:]):
+                            draw.ellipse([ex - r, ey - r, ex + r, ey + r], fill=stroke.fill)
+                elif stroke.kind == 'text':
+                    draw.text(pts[:2], stroke.text, fill=stroke.fill)
+                else:
+                    shape = draw.ellipse if stroke.kind == 'oval' else draw.rectangle
+                    shape([min(pts[0], pts[2]), min(pts[1], pts[3]), max(pts[0], pts[2]), max(pts[1], pts[3])],
+                          fill=stroke.fill or None, outline=stroke.outline or None, width=int(stroke.width))
+            except Exception:
+                pass
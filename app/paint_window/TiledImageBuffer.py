@@ -0,0 +1,293 @@
+from PIL import Image, ImageDraw
+from .ImageBuffer import ImageBuffer
+from .FloodFill import FloodFill
+
+
+class TiledImageBuffer(ImageBuffer):
+    """ImageBuffer stored as TILE_SIZE x TILE_SIZE tiles.
+
+    Tiles that were never painted are not allocated at all (they read back
+    as the paper colour). Drawing calls only touch the tiles under the
+    operation's bbox, and the full-size image returned by `get_image()` is
+    kept as a composite that is patched with the tiles changed since it
+    was last requested instead of being rebuilt.
+
+    A tile source (set_tile_source) makes loading lazy: listed tiles are
+    fetched from it the first time they are needed, or streamed in with
+    provide_tile(). `get_image()` loads whatever is still pending first, so
+    a whole-image read never sees paper in place of an unloaded tile; only
+    the display passes load_pending=False and shows paper until a tile
+    arrives.
+    """
+    def __init__(self, width: int, height: int, color="white"):
+        self.color = color
+        self._size = (max(1, int(width)), max(1, int(height)))
+        self._tiles = {}  # (tx, ty) -> Image, only for tiles that were written
+        self._composite = None
+        self._stale = set()  # tiles changed since _composite was patched
+        self._dirty = {}
+        self.before_write = None
+        self._source = None  # key -> Image, for tiles not loaded yet
+        self._pending = set()
+        self._source_in_composite = False  # pending tiles already hold their pixels in _composite
+        self._borrowed = False  # _composite belongs to someone else: copy before patching it
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def image(self):
+        return self.get_image()
+
+    @image.setter
+    def image(self, pil_image):
+        self.set_image(pil_image)
+
+    def allocated_tiles(self):
+        return len(self._tiles)
+
+    def _tile(self, key):
+        tile = self._tiles.get(key)
+        if tile is None:
+            if key in self._pending:
+                self._pending.discard(key)
+                try:
+                    tile = self._source(key)
+                except Exception:
+                    tile = None  # unreadable tile: fall back to paper
+                if tile is not None:
+                    self._tiles[key] = tile
+                    self._touched([key])
+                    return tile
+            x0, y0, x1, y1 = self.tile_bbox(key)
+            tile = Image.new("RGB", (x1 - x0, y1 - y0), self.color)
+            self._tiles[key] = tile
+        return tile
+
+    # --- lazy loading ---
+
+    def set_tile_source(self, source, keys):
+        """Load the tiles in keys from source(key) on first use instead of now."""
+        self._source = source
+        self._pending = set(keys)
+        self._source_in_composite = False
+
+    def _drop_source(self):
+        self._source = None
+        self._pending = set()
+        self._source_in_composite = False
+
+    def pending_tiles(self):
+        return set(self._pending)
+
+    def load_tile(self, key):
+        """Fetch a pending tile from the source now (no-op for loaded tiles)."""
+        if key in self._pending:
+            self._tile(key)
+
+    def provide_tile(self, key, tile_image):
+        """Hand in a pending tile decoded elsewhere; ignored if it was loaded or replaced meanwhile."""
+        if key in self._pending:
+            self._pending.discard(key)
+            self._tiles[key] = tile_image
+            self._touched([key])
+
+    def load_all(self):
+        for key in list(self._pending):
+            self._tile(key)
+
+    def get_tile(self, tile):
+        return self._tile(tile).copy()
+
+    def copy_tiles(self, keys):
+        out = {}
+        for key in keys:
+            if key in self._tiles:
+                out[key] = self._tiles[key].copy()
+            elif key in self._pending:
+                # read through without keeping the tile: copies must not double the resident size
+                try:
+                    out[key] = self._source(key)
+                except Exception:
+                    out[key] = None
+            else:
+                out[key] = None
+        return out
+
+    def snapshot_tiles(self):
+        """Copies of the allocated tiles only; the others are plain paper."""
+        self.load_all()
+        return {key: tile.copy() for key, tile in self._tiles.items()}
+
+    def put_tile(self, tile, tile_image):
+        self._will_write(self.tile_bbox(tile))
+        self._pending.discard(tile)
+        self._tiles[tile] = tile_image.copy()
+        self._touched([tile])
+
+    def paste_region(self, region_image, xy):
+        x, y = int(xy[0]), int(xy[1])
+        tiles = self.tiles_in((x, y, x + region_image.width - 1, y + region_image.height - 1))
+        if self.before_write is not None:
+            self.before_write(self, tiles)
+        for key in tiles:
+            tx0, ty0 = self.tile_bbox(key)[:2]
+            self._tile(key).paste(region_image, (x - tx0, y - ty0))
+        self._touched(tiles)
+
+    def _touched(self, tiles):
+        self._stale.update(tiles)
+        for channel in self._dirty.values():
+            channel.update(tiles)
+
+    def _own_image(self):
+        pass  # tiles are always private copies; only the composite can be borrowed
+
+    def mark_dirty(self, bbox=None):
+        self._touched(self.all_tiles() if bbox is None else self.tiles_in(bbox))
+
+    def _mark_whole_image(self):
+        self._composite = None
+        self._borrowed = False
+        self._stale = set()
+        super()._mark_whole_image()
+
+    def _each_tile(self, bbox, paint):
+        """Call paint(ImageDraw, dx, dy) for every tile under bbox, in tile-local coordinates."""
+        tiles = self.tiles_in(bbox)
+        if self.before_write is not None:
+            self.before_write(self, tiles)
+        for key in tiles:
+            x0, y0 = self.tile_bbox(key)[:2]
+            paint(ImageDraw.Draw(self._tile(key)), -x0, -y0)
+        self._touched(tiles)
+
+    @staticmethod
+    def _shift(coords, dx, dy):
+        flat = []
+        for c in coords:
+            if isinstance(c, (tuple, list)):
+                flat.extend(c)
+            else:
+                flat.append(c)
+        return [v + (dx if i % 2 == 0 else dy) for i, v in enumerate(flat)]
+
+    # --- raster operations ---
+
+    def set_image(self, pil_image, borrowed=False):
+        """Adopt pil_image (RGB: without copying) as the composite; tiles are cut from it on first use.
+
+        With borrowed=True the composite is copied before the first painted
+        tile is patched into it.
+        """
+        self._will_write(replace=True)
+        src = pil_image if pil_image.mode == "RGB" else pil_image.convert("RGB")
+        self._size = src.size
+        self._tiles = {}
+        self._mark_whole_image()
+        # pending tiles still hold their original pixels in the composite
+        self._composite = src
+        self._borrowed = borrowed and pil_image.mode == "RGB"
+        self.set_tile_source(lambda key: src.crop(self.tile_bbox(key)), self.all_tiles())
+        self._source_in_composite = True
+
+    def resize(self, width: int, height: int, resample=None):
+        self.load_all()
+        src = self.get_image()
+        w, h = max(1, int(width)), max(1, int(height))
+        try:
+            resized = src.resize((w, h), Image.LANCZOS if resample is None else resample)
+        except Exception:
+            resized = src.resize((w, h))
+        self.set_image(resized)
+
+    def paste_image(self, pil_image, borrowed=False):
+        try:
+            if pil_image.size != self.size:
+                self.set_image(pil_image, borrowed)
+                return
+            src = pil_image.convert("RGB")
+            self._will_write()
+            self._drop_source()  # every tile is replaced below: nothing left to load
+            for key in self.all_tiles():
+                self._tiles[key] = src.crop(self.tile_bbox(key))
+            self.mark_dirty()
+        except Exception:
+            pass
+
+    def get_image(self, load_pending=True):
+        if load_pending and self._pending and (self._composite is None or not self._source_in_composite):
+            self.load_all()
+        if self._composite is None:
+            self._composite = Image.new("RGB", self._size, self.color)
+            self._stale = set(self._tiles)
+        if self._borrowed and any(key in self._tiles for key in self._stale):
+            self._composite = self._composite.copy()
+            self._borrowed = False
+        for key in self._stale:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._composite.paste(tile, self.tile_bbox(key)[:2])
+        self._stale = set()
+        return self._composite
+
+    def draw_line(self, coords, fill, width=1):
+        width = int(width)
+        self._each_tile(self._coords_bbox(coords, width // 2 + 1),
+                        lambda d, dx, dy: d.line(self._shift(coords, dx, dy), fill=fill, width=width))
+
+    def draw_ellipse(self, bbox, fill=None, outline=None, width=1):
+        def paint(d, dx, dy):
+            box = self._shift(bbox, dx, dy)
+            if outline is not None and fill is None:
+                d.ellipse(box, outline=outline, width=int(width))
+            else:
+                d.ellipse(box, fill=fill, outline=outline)
+        self._each_tile(self._coords_bbox(bbox, 1), paint)
+
+    def fill_rect(self, bbox, fill="white"):
+        self._each_tile(self._coords_bbox(bbox),
+                        lambda d, dx, dy: d.rectangle(self._shift(bbox, dx, dy), fill=fill))
+
+    def text_bbox(self, position, text, font=None):
+        try:
+            if font is None:
+                from PIL import ImageFont
+                font = ImageFont.load_default()
+            return ImageDraw.Draw(Image.new("RGB", (1, 1))).textbbox(position, text, font=font)
+        except Exception:
+            return None
+
+    def draw_text(self, position, text, fill="black", font=None):
+        if font is None:
+            from PIL import ImageFont
+            font = ImageFont.load_default()
+        bbox = self.text_bbox(position, text, font)
+        if bbox is None:
+            return
+        self._each_tile(bbox, lambda d, dx, dy: d.text((position[0] + dx, position[1] + dy), text, fill=fill, font=font))
+
+    def flood_fill(self, x, y, fill_color, tolerance=0, connectivity=4, antialias=False, source=None):
+        """The fill region is global, so it runs on the composite; only the tiles it touched are written back."""
+        try:
+            self.load_all()
+            composite = self.get_image()
+            engine = FloodFill(tolerance, connectivity, antialias)
+            probe = composite if source is None else source
+            if tolerance == 0 and engine._same_color(probe, x, y, fill_color):
+                return None
+            mask, bbox = engine.region(probe, x, y)
+            if mask is None:
+                return None
+            tiles = self.tiles_in(engine.paint_bbox(composite, bbox))
+            if self.before_write is not None:
+                self.before_write(self, tiles)
+            bbox = engine.paint(composite, mask, bbox, fill_color)
+            for key in tiles:
+                self._tiles[key] = composite.crop(self.tile_bbox(key))
+            for channel in self._dirty.values():
+                channel.update(tiles)
+            return bbox
+        except Exception:
+            return None
@@ -0,0 +1,243 @@
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from PIL import Image
+from .PluginContext import PluginContext
+from .PluginManifest import PluginManifest
+from .PluginProcessPool import load_plugin, share_image
+
+_modules = {}  # per worker process: plugin path -> (mtime, process_image)
+
+
+def _crop_rows(buf, mode, size, box):
+    # only the rows of box: Pillow unpacks RGB to 4 bytes per pixel, so wrapping the whole block copies all of it
+    w = size[0]
+    x0, y0, x1, y1 = box
+    row = w * len(mode)  # 'L' or 'RGB'
+    band = Image.frombuffer(mode, (w, y1 - y0), bytes(buf[y0 * row:y1 * row]), 'raw', mode, 0, 1)
+    return band.crop((x0, 0, x1, y1 - y0))
+
+
+def _crop_shared(name, mode, size, box):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        return _crop_rows(shm.buf, mode, size, box)
+    finally:
+        shm.close()
+
+
+def _halo(box, size, radius):
+    x0, y0, x1, y1 = box
+    return max(0, x0 - radius), max(0, y0 - radius), min(size[0], x1 + radius), min(size[1], y1 + radius)
+
+
+def _run_tile(src_name, out_name, mode, size, box, radius, plugins, scratch_bytes):
+    """Worker: run the chain on box grown by radius, write the box back into the output block."""
+    w, h = size
+    x0, y0, x1, y1 = box
+    hx0, hy0, hx1, hy1 = _halo(box, size, radius)
+    tile = _crop_shared(src_name, mode, size, (hx0, hy0, hx1, hy1))
+    context = PluginContext(scratch_bytes=scratch_bytes)  # tiles are short: progress and cancel go per tile
+    for name, path in plugins:
+        try:
+            out = PluginContext.call(load_plugin(path, _modules), tile, context)
+        except Exception:
+            return {name: traceback.format_exc()}
+        if out is not None:
+            tile = out
+    if tile.size != (hx1 - hx0, hy1 - hy0):
+        return {plugins[-1][0]: 'plugin changed the tile size: it is not a local filter'}
+    if tile.mode != mode:
+        tile = tile.convert(mode)
+    core = tile.crop((x0 - hx0, y0 - hy0, x1 - hx0, y1 - hy0)).tobytes()
+    bpp = len(mode)  # 'L' or 'RGB'
+    row = (x1 - x0) * bpp
+    shm = shared_memory.SharedMemory(name=out_name)
+    try:
+        for i in range(y1 - y0):
+            offset = ((y0 + i) * w + x0) * bpp
+            shm.buf[offset:offset + row] = core[i * row:(i + 1) * row]
+    finally:
+        shm.close()
+    return {}
+
+
+class TiledPluginRunner:
+    """Runs chains of local-filter plugins tile by tile on every core.
+
+    A plugin opts in through its manifest (kind 'pointwise' or 'local' with
+    a radius, see PluginManifest): every output pixel depends only on input
+    pixels at most that far away. The image is
+    cut into TILE_SIZE tiles, each processed with a halo of the chain's
+    total radius, and only the tile itself is written back, so the result
+    matches a whole-image run exactly. Tiles are read from and written to
+    shared memory by a warm spawn-context process pool; finished tiles are
+    handed to on_tile(box, image) as they complete. run_threads() does the
+    same for a single thread-safe plugin on a thread pool in this process,
+    which skips the shared-memory copies for plugins that are cheap per tile.
+    """
+    TILE_SIZE = 512
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._threads = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def chain_radius(modules):
+        """Total halo for a chain of plugin modules, or None if any of them is not a local filter."""
+        total = 0
+        for module in modules:
+            manifest = PluginManifest.from_module(module)
+            if not manifest.tileable:
+                return None
+            total += manifest.radius
+        return total
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def _discard(self, pool):
+        """Drop a pool whose worker died, so the next run starts a fresh one."""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _thread_executor(self):
+        with self._lock:
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='plugin-tile')
+            return self._threads
+
+    def start(self):
+        """Spawn the worker processes now."""
+        pool = self._executor()
+        for _ in range(self.workers):
+            pool.submit(os.getpid)
+
+    def tiles(self, size):
+        w, h = size
+        ts = self.TILE_SIZE
+        return [(x, y, min(w, x + ts), min(h, y + ts)) for y in range(0, h, ts) for x in range(0, w, ts)]
+
+    def run(self, image, plugins, radius, on_tile=None, on_progress=None, should_cancel=None):
+        """Run plugins [(name, path)] over image tile by tile; blocks the calling thread.
+
+        Returns (result image or None, cancelled, {plugin name: error}). On
+        an error the result is None: the caller should rerun the chain on
+        the whole image, where failing plugins are handled as usual. A
+        worker that dies takes the pool with it; it is replaced on the next
+        run.
+        """
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        mode, size = image.mode, image.size
+        src = share_image(image)
+        out = shared_memory.SharedMemory(create=True, size=max(1, size[0] * size[1] * len(mode)))
+        pool = self._executor()
+        pending = {}
+        try:
+            for box in self.tiles(size):
+                pending[pool.submit(_run_tile, src.name, out.name, mode, size, box, radius, list(plugins),
+                                    PluginContext.DEFAULT_SCRATCH_BYTES // self.workers)] = box
+            total, done = len(pending), 0
+            while pending:
+                finished, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                if should_cancel is not None and should_cancel():
+                    for future in pending:
+                        future.cancel()
+                    wait(pending)  # running tiles still write into the blocks
+                    return None, True, {}
+                for future in finished:
+                    box = pending.pop(future)
+                    errors = future.result()  # BrokenProcessPool if a worker died
+                    if errors:
+                        for other in pending:
+                            other.cancel()
+                        wait(pending)
+                        return None, False, errors
+                    done += 1
+                    if on_tile is not None:
+                        on_tile(box, _crop_rows(out.buf, mode, size, box))
+                    if on_progress is not None:
+                        on_progress(done, total)
+            return Image.frombuffer(mode, size, out.buf, 'raw', mode, 0, 1).copy(), False, {}
+        except BrokenProcessPool:
+            self._discard(pool)
+            return None, False, {plugins[-1][0]: 'plugin worker process exited'}
+        finally:
+            for shm in (src, out):
+                shm.close()
+                shm.unlink()
+
+    def run_threads(self, image, name, process_image, radius, on_tile=None, on_progress=None, should_cancel=None):
+        """Run one thread-safe local plugin over image tile by tile on threads; blocks the calling thread.
+
+        Same contract as run(). Pillow releases the GIL inside its filters,
+        so the tiles of a plugin built on them run in parallel.
+        """
+        if image.mode not in ('L', 'RGB'):
+            image = image.convert('RGB')
+        image.load()
+        size = image.size
+        result = Image.new(image.mode, size)
+        context = PluginContext(should_cancel=should_cancel,
+                                scratch_bytes=PluginContext.DEFAULT_SCRATCH_BYTES // self.workers)
+
+        def work(box):
+            hx0, hy0, hx1, hy1 = _halo(box, size, radius)
+            tile = image.crop((hx0, hy0, hx1, hy1))
+            try:
+                out = PluginContext.call(process_image, tile, context)
+            except Exception:
+                return None, traceback.format_exc()
+            if out is not None:
+                tile = out
+            if tile.size != (hx1 - hx0, hy1 - hy0):
+                return None, 'plugin changed the tile size: it is not a local filter'
+            if tile.mode != image.mode:
+                tile = tile.convert(image.mode)
+            return tile.crop((box[0] - hx0, box[1] - hy0, box[2] - hx0, box[3] - hy0)), None
+
+        pool = self._thread_executor()
+        pending = {pool.submit(work, box): box for box in self.tiles(size)}
+        total, done = len(pending), 0
+        while pending:
+            finished, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            if should_cancel is not None and should_cancel():
+                for future in pending:
+                    future.cancel()
+                return None, True, {}  # running tiles finish on their own and are dropped
+            for future in finished:
+                box = pending.pop(future)
+                core, error = future.result()
+                if error is not None:
+                    for other in pending:
+                        other.cancel()
+                    return None, False, {name: error}
+                result.paste(core, box[:2])
+                done += 1
+                if on_tile is not None:
+                    on_tile(box, core)
+                if on_progress is not None:
+                    on_progress(done, total)
+        return result, False, {}
@@ -1,6 +1,14 @@
 from PIL import Image, ImageFilter, ImageOps
 
 PLUGIN_NAME = "Blur"
+PLUGIN_MANIFEST = {
+    'kind': 'local',
+    'radius': 2,
+    'cost_per_mp': 0.1,
+    'in_place_safe': True,
+    'modes': ('RGB', 'L'),
+    'thread_safe': True,
+}
 
 def process_image(img: Image.Image) -> Image.Image:
     ImageOps.grayscale(img)
@@ -1,13 +1,16 @@
 from PIL import Image, ImageDraw
 
 PLUGIN_NAME = "Add Border"
+PLUGIN_MANIFEST = {
+    'kind': 'global',
+    'cost_per_mp': 0.005,
+    'preserves_size': True,
+    'in_place_safe': True,
+    'modes': ('RGB',),
+}
 
-def process_image(input_image: Image.Image, cancel_context=None) -> Image.Image:
+def process_image(input_image: Image.Image, context=None) -> Image.Image:
     try:
-        if cancel_context and callable(cancel_context.get('cancelled')):
-            if cancel_context['cancelled']():
-                return input_image
-        
         border_width = 15
         border_color = (255, 0, 0)  
         
@@ -16,13 +19,15 @@ def process_image(input_image: Image.Image, cancel_context=None) -> Image.Image:
         
         draw = ImageDraw.Draw(img)
         for i in range(border_width):
-            if cancel_context and callable(cancel_context.get('cancelled')) and cancel_context['cancelled']():
+            if context and context.cancelled():
                 return input_image
             draw.rectangle(
                 [(i, i), (width - 1 - i, height - 1 - i)],
                 outline=border_color,
                 fill=None
             )
+            if context:
+                context.report((i + 1) / border_width)
         
         return img
     except Exception:
@@ -1,34 +1,22 @@
 from PIL import Image
+from app.paint_window.Convolution import Convolution
 
 PLUGIN_NAME = "Matrix convolution"
+PLUGIN_MANIFEST = {
+    'kind': 'local',
+    'radius': 1,
+    'cost_per_mp': 0.08,
+    'in_place_safe': True,
+    'modes': ('RGB',),
+    'thread_safe': True,
+}
+
+KERNEL = [[-1, -1, -1],
+          [-1, 9, -1],
+          [-1, -1, -1]]
 
 def process_image(input_image: Image.Image) -> Image.Image:
     try:
-        kernel = [[-1, -1, -1],
-                  [-1, 9, -1],
-                  [-1, -1, -1]]
-        img = input_image.convert('RGB')
-        pixels = img.load()
-        width, height = img.size
-        new_img = Image.new('RGB', (width, height))
-        new_pixels = new_img.load()
-        k_size = len(kernel)
-        offset = k_size // 2
-        for x in range(offset, width - offset):
-            for y in range(offset, height - offset):
-                r_sum = g_sum = b_sum = 0
-                for kx in range(k_size):
-                    for ky in range(k_size):
-                        px = pixels[x + kx - offset, y + ky - offset]
-                        w = kernel[kx][ky]
-                        r_sum += px[0] * w
-                        g_sum += px[1] * w
-                        b_sum += px[2] * w
-                new_pixels[x, y] = (
-                    max(0, min(255, int(r_sum))),
-                    max(0, min(255, int(g_sum))),
-                    max(0, min(255, int(b_sum)))
-                )
-        return new_img
+        return Convolution(KERNEL, scale=1, edge='extend').apply(input_image.convert('RGB'))
     except Exception:
-        return input_image
\ No newline at end of file
+        return input_image
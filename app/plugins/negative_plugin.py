@@ -1,6 +1,13 @@
 from PIL import Image, ImageOps
 
 PLUGIN_NAME = "Negative"
+PLUGIN_MANIFEST = {
+    'kind': 'pointwise',
+    'cost_per_mp': 0.01,
+    'in_place_safe': True,
+    'modes': ('RGB',),
+    'thread_safe': True,
+}
 
 def process_image(pil_image: Image.Image) -> Image.Image:
     try:
@@ -0,0 +1,138 @@
+"""Convolution benchmark: ms per megapixel, the old per-pixel matrix_plugin loop vs the Convolution engine.
+
+First checks that every path (one-pass 3x3/5x5, float 7x7+) matches a per-pixel reference
+on vertically asymmetric kernels.
+
+Run from the repository root:  python -m benchmarks.convolution_bench [WxH ...]
+"""
+import sys
+import time
+
+from PIL import Image, ImageChops
+
+from app.paint_window import Convolution as convolution_module
+from app.paint_window.Convolution import Convolution
+
+
+SHARPEN = [[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]]
+BOX5 = [[1] * 5 for _ in range(5)]
+GAUSS7 = [[a * b for b in (1, 6, 15, 20, 15, 6, 1)] for a in (1, 6, 15, 20, 15, 6, 1)]
+EMBOSS7 = [[(j - i) for j in range(7)] for i in range(7)]
+SOBEL_Y = [[-1, -2, -1], [0, 0, 0], [1, 2, 1]]
+SKEW5 = [[(i * 5 + j) % 7 - 3 for j in range(5)] for i in range(5)]
+
+
+def legacy_convolve(input_image, kernel=SHARPEN):
+    """The four nested loops matrix_plugin used before the engine."""
+    img = input_image.convert('RGB')
+    pixels = img.load()
+    width, height = img.size
+    new_img = Image.new('RGB', (width, height))
+    new_pixels = new_img.load()
+    k_size = len(kernel)
+    offset = k_size // 2
+    for x in range(offset, width - offset):
+        for y in range(offset, height - offset):
+            r_sum = g_sum = b_sum = 0
+            for kx in range(k_size):
+                for ky in range(k_size):
+                    px = pixels[x + kx - offset, y + ky - offset]
+                    w = kernel[kx][ky]
+                    r_sum += px[0] * w
+                    g_sum += px[1] * w
+                    b_sum += px[2] * w
+            new_pixels[x, y] = (max(0, min(255, int(r_sum))),
+                                max(0, min(255, int(g_sum))),
+                                max(0, min(255, int(b_sum))))
+    return new_img
+
+
+def reference_convolve(image, kernel, scale, offset):
+    """Correlation with extended edges, pixel by pixel: what Convolution promises."""
+    img = image.convert('RGB')
+    pixels = img.load()
+    width, height = img.size
+    r = len(kernel) // 2
+    out = Image.new('RGB', (width, height))
+    out_pixels = out.load()
+    for y in range(height):
+        for x in range(width):
+            acc = [0.0, 0.0, 0.0]
+            for i, row in enumerate(kernel):
+                for j, w in enumerate(row):
+                    px = pixels[min(width - 1, max(0, x + j - r)), min(height - 1, max(0, y + i - r))]
+                    for c in range(3):
+                        acc[c] += px[c] * w
+            out_pixels[x, y] = tuple(max(0, min(255, int(v / scale + offset + 0.5))) for v in acc)
+    return out
+
+
+def padded(kernel, n):
+    """kernel centred in an n x n kernel of zeros (forces the float path)."""
+    p = (n - len(kernel)) // 2
+    out = [[0] * n for _ in range(n)]
+    for i, row in enumerate(kernel):
+        out[i + p][p:p + len(row)] = row
+    return out
+
+
+def max_diff(a, b):
+    return max(hi for _, hi in ImageChops.difference(a, b).getextrema())
+
+
+def parity_check():
+    """Vertically asymmetric kernels must give the same result on every path and match the reference."""
+    photo = make_photo(40, 30)
+    ok = True
+    for name, kernel, scale, offset in (('3x3 sobel-y', SOBEL_Y, 1, 128), ('5x5 skewed', SKEW5, 9, 128)):
+        reference = reference_convolve(photo, kernel, scale, offset)
+        fast = Convolution(kernel, scale=scale, offset=offset).apply(photo)
+        float_path = Convolution(padded(kernel, 7), scale=scale, offset=offset).apply(photo)
+        diffs = (max_diff(fast, reference), max_diff(float_path, reference))
+        ok = ok and max(diffs) == 0
+        print(f"parity {name:>12}: fast path {diffs[0]}, float path {diffs[1]} (max diff vs reference)")
+    return ok
+
+
+def make_photo(w, h):
+    return Image.effect_mandelbrot((w, h), (-2.2, -1.2, 0.8, 1.2), 120).convert('RGB')
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def main(sizes=((640, 480), (2000, 1500), (4000, 3000)), legacy_limit=400_000):
+    backend = 'numpy' if convolution_module.np is not None else 'imagemath'
+    print(f"float backend for kernels > 5x5: {backend}")
+    if not parity_check():
+        raise SystemExit('Convolution paths disagree')
+    print(f"{'size':>11} {'kernel':>18} {'ms':>10} {'ms/MP':>10} {'speedup':>9}")
+    # the legacy loop is only timed on small images; its ms/MP is the baseline for every size
+    legacy_per_mp = None
+    for w, h in sizes:
+        mp = w * h / 1e6
+        photo = make_photo(w, h)
+        if w * h <= legacy_limit:
+            ms = timed(legacy_convolve, photo)
+            legacy_per_mp = ms / mp
+            print(f"{w:>5}x{h:<5} {'legacy 3x3 loop':>18} {ms:>10.1f} {ms / mp:>10.1f} {'1.0x':>9}")
+        runs = [
+            ('3x3 sharpen', Convolution(SHARPEN, scale=1)),
+            ('5x5 box', Convolution(BOX5)),
+            ('7x7 gauss (sep)', Convolution(GAUSS7)),
+            ('7x7 emboss', Convolution(EMBOSS7, scale=1, offset=128)),
+        ]
+        for name, conv in runs:
+            ms = timed(conv.apply, photo)
+            speedup = f"{legacy_per_mp / (ms / mp):.0f}x" if legacy_per_mp and name == '3x3 sharpen' else ''  # same kernel
+            print(f"{w:>5}x{h:<5} {name:>18} {ms:>10.1f} {ms / mp:>10.1f} {speedup:>9}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(sizes=[tuple(int(v) for v in arg.split('x')) for arg in sys.argv[1:]])
+    else:
+        main()
@@ -0,0 +1,60 @@
+"""Export profile benchmark: encode time and output size per format and profile.
+
+Run from the repository root:  python -m benchmarks.encoder_profiles_bench [WxH ...]
+"""
+import io
+import sys
+import time
+
+from PIL import Image, ImageDraw, ImageFilter, features
+
+from app.paint_window.ImageSaver import ImageSaver
+
+
+def make_drawing(w, h):
+    """Flat paper with strokes and shapes, like a typical canvas export."""
+    img = Image.new('RGB', (w, h), 'white')
+    draw = ImageDraw.Draw(img)
+    step = max(20, w // 40)
+    for i in range(0, w, step):
+        draw.line([i, 0, w - i, h], fill=(i % 255, 40, 200), width=5)
+    draw.ellipse([w // 4, h // 4, w * 3 // 4, h * 3 // 4], fill='orange', outline='black', width=8)
+    draw.rectangle([w // 10, h // 10, w // 3, h // 3], fill='green')
+    return img
+
+
+def make_photo(w, h):
+    """Noisy, smooth gradients: stands in for an opened photograph."""
+    noise = Image.effect_noise((w, h), 40).filter(ImageFilter.GaussianBlur(2))
+    grad = Image.linear_gradient('L').resize((w, h))
+    return Image.merge('RGB', (grad, noise, grad.transpose(Image.FLIP_LEFT_RIGHT)))
+
+
+def encode(image, fmt, profile):
+    out = io.BytesIO()
+    params = ImageSaver.params_for(fmt, profile)
+    t0 = time.perf_counter()
+    ImageSaver.prepare(image, fmt).save(out, format=fmt, **params)
+    return (time.perf_counter() - t0) * 1000.0, out.tell()
+
+
+def main(sizes=((1920, 1080), (4000, 3000))):
+    formats = ['PNG', 'JPEG', 'BMP', 'TIFF']
+    if features.check('webp'):
+        formats.append('WEBP')
+    print(f"{'image':>16} {'format':>6} {'profile':>9} {'ms':>9} {'KB':>9} {'MB/s':>8}")
+    for w, h in sizes:
+        raw_mb = w * h * 3 / 1e6
+        for name, image in (('drawing', make_drawing(w, h)), ('photo', make_photo(w, h))):
+            label = f"{name} {w}x{h}"
+            for fmt in formats:
+                for profile in ImageSaver.PROFILES:
+                    ms, size = encode(image, fmt, profile)
+                    print(f"{label:>16} {fmt:>6} {profile:>9} {ms:>9.1f} {size / 1024:>9.0f} {raw_mb / (ms / 1000.0):>8.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(sizes=[tuple(int(v) for v in arg.split('x')) for arg in sys.argv[1:]])
+    else:
+        main()
@@ -0,0 +1,74 @@
+"""Flood fill benchmark: ms per megapixel, legacy stack fill vs scanline engine.
+
+Run from the repository root:  python -m benchmarks.flood_fill_bench
+"""
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from app.paint_window.FloodFill import FloodFill
+
+
+def legacy_flood_fill(image, x, y, fill):
+    """The per-pixel stack fill ImageBuffer used before the scanline engine."""
+    px = image.load()
+    w, h = image.size
+    target = px[x, y]
+    if target == fill:
+        return
+    stack = [(x, y)]
+    while stack:
+        sx, sy = stack.pop()
+        if px[sx, sy] != target:
+            continue
+        px[sx, sy] = fill
+        if sx > 0:
+            stack.append((sx-1, sy))
+        if sx < w-1:
+            stack.append((sx+1, sy))
+        if sy > 0:
+            stack.append((sx, sy-1))
+        if sy < h-1:
+            stack.append((sx, sy+1))
+
+
+def make_scene(w, h):
+    img = Image.new('RGB', (w, h), 'white')
+    draw = ImageDraw.Draw(img)
+    # a few open strokes the fill has to flow around, plus a closed ellipse
+    step = max(40, w // 12)
+    for i in range(step, w, step):
+        draw.line([i, h // 8, i + h // 6, h * 7 // 8], fill='black', width=3)
+    draw.ellipse([w // 4, h // 4, w * 3 // 4, h * 3 // 4], outline='black', width=5)
+    return img
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def main(sizes=((800, 600), (2000, 1500), (4000, 3000)), legacy_limit=3_000_000):
+    print(f"{'size':>11} {'engine':>16} {'ms':>10} {'ms/MP':>10}")
+    for w, h in sizes:
+        mp = w * h / 1e6
+        scene = make_scene(w, h)
+        runs = [
+            ('scanline 4-way', lambda img: FloodFill().fill(img, 1, 1, (255, 0, 0))),
+            ('scanline 8-way', lambda img: FloodFill(connectivity=8).fill(img, 1, 1, (255, 0, 0))),
+            ('scanline tol+aa', lambda img: FloodFill(tolerance=32, antialias=True).fill(img, 1, 1, (255, 0, 0))),
+        ]
+        if w * h <= legacy_limit:
+            runs.insert(0, ('legacy stack', lambda img: legacy_flood_fill(img, 1, 1, (255, 0, 0))))
+        for name, fn in runs:
+            ms = timed(fn, scene.copy())
+            print(f"{w:>5}x{h:<5} {name:>16} {ms:>10.1f} {ms / mp:>10.1f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(sizes=[tuple(int(v) for v in arg.split('x')) for arg in sys.argv[1:]])
+    else:
+        main()
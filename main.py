@@ -8,7 +8,6 @@ if __name__ == "__main__":
     
     
 #TODO
-    # 9) Добавить возможность отмены/повтора действий
     # 14) Инкапсуляцию покрутить
     # 15) Пофиксить овал который появляется когда выбираешь кисть
     # 17) Обработчик ошибок ???
@@ -29,4 +28,5 @@ if __name__ == "__main__":
     # 7) Добавить возможность рисовать фигуры (линия,эллипс) - при нажатии на кнопку фигуры, пользователь выбирает фигуру, 
     # затем кликает и тянет мышью для рисования, фигуры должна быть либо закрашенной, либо с прозрачным фоном, в зависимости от выбора пользователя
     # 13) Масштаб +-, инструмент текст, заливка, рисование цилиндра
-    # 19) Сделать вкладки на инструментах
\ No newline at end of file
+    # 19) Сделать вкладки на инструментах
+    # 9) Добавить возможность отмены/повтора действий
\ No newline at end of file